@@ -14,7 +14,7 @@ from matplotlib.patches import FancyArrowPatch
 sys.path.append('../')
 import python_codes.theme as theme
 from python_codes.general import cosd, sind
-from python_codes.linear_theory import Cisaillement_basal_rotated_wind, coeffA0, coeffB0
+from python_codes.linear_theory import Cisaillement_basal_rotated_wind_batch, coeffA0, coeffB0
 
 
 def perturb(x, z, amp, lamb, shift):
@@ -182,8 +182,9 @@ for c in cnt.collections:
     c.set_edgecolor("face")
     c.set_rasterized(True)
 
-for i, (theta, A0, B0, color) in enumerate(zip(Theta_list, A0_list, B0_list, colors)):
-    TAU = Cisaillement_basal_rotated_wind(X, Y, alpha, A0, B0, AR, theta)
+TAUx, TAUy = Cisaillement_basal_rotated_wind_batch(X, Y, alpha, A0_list, B0_list, AR, Theta_list)
+for i, (taux, tauy, color) in enumerate(zip(TAUx, TAUy, colors)):
+    TAU = (taux, tauy)
     ustar = np.sqrt(np.linalg.norm(np.array(TAU), axis=0))
     theta = np.arctan2(TAU[1], TAU[0])
     # ax.quiver(X[skip], Y[skip], TAU[0][skip], TAU[1][skip], color='grey')
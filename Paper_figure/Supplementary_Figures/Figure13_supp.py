@@ -13,7 +13,7 @@ sys.path.append('../../')
 import python_codes.theme as theme
 from python_codes.general import cosd, sind
 from python_codes.plot_functions import plot_regime_diagram
-from python_codes.linear_theory import Cisaillement_basal_rotated_wind
+from python_codes.linear_theory import Cisaillement_basal_rotated_wind_batch
 
 
 def topo(x, y, alpha, k, xi):
@@ -114,9 +114,10 @@ mask4 = (Data[station]['kH'] < 0.5) & (Data[station]['Froude'] < 0.3) & (modulus
 
 indexes = [2808, 35785, 6231, 11308]
 #
-for i, (m, A0, B0) in enumerate(sorted(zip(modulus[indexes], Hydro_coeffs_time[station][0][indexes], Hydro_coeffs_time[station][1][indexes]))):
-    # print(Data[station]['time'][indexes[i]], Data[station]['kH'][indexes[i]], Data[station]['Froude'][indexes[i]], Data[station]['kLB'][indexes[i]], A0, B0, np.sqrt(A0**2 + B0**2))
-    TAU = Cisaillement_basal_rotated_wind(X, Y, alpha, A0, B0, AR, 190)
+_, A0_list, B0_list = zip(*sorted(zip(modulus[indexes], Hydro_coeffs_time[station][0][indexes], Hydro_coeffs_time[station][1][indexes])))
+TAUx, TAUy = Cisaillement_basal_rotated_wind_batch(X, Y, alpha, A0_list, B0_list, AR, 190)
+for i, (taux, tauy) in enumerate(zip(TAUx, TAUy)):
+    TAU = (taux, tauy)
     ustar = np.sqrt(np.linalg.norm(np.array(TAU), axis=0))
     theta = np.arctan2(TAU[1], TAU[0])
     # ax.quiver(X[skip], Y[skip], TAU[0][skip], TAU[1][skip], color='grey')
@@ -11,8 +11,10 @@ Note that this script takes a certain amount of times to run, and as such is not
 import numpy as np
 import os
 import sys
+from functools import partial
 sys.path.append('../')
-from python_codes.linear_theory import calculate_solution
+from python_codes.hydro_coeff_time_series import compute_hydro_coeffs
+from python_codes.solution_cache import cached_solve_many
 
 # Paths
 path_outputdata = '../static/data/processed_data/'
@@ -26,24 +28,23 @@ Data_pattern = np.load(os.path.join(path_outputdata, 'Data_DEM.npy'), allow_pick
 
 # Parameters
 Kappa = 0.4  # Von Kàrmàn constant
-k = np.concatenate([np.zeros(Data[station]['Froude'].shape) + 2*np.pi/(Data_pattern[station]['wavelength']*1e3) for station in Stations])  # vector of wavelength [m]
 z0 = 1e-3  # hydrodynamic roughness, [m]
-eta_0_vals = k*1e-3
-eta = 0  # non dimensional position where to calculate the solution (bottom)
 
-hydro_Coeffs = {}
-for station in Stations:
-    hydro_Coeffs[station] = np.zeros((2, Data[station]['kH'].size))
-    k = 2*np.pi/(Data_pattern[station]['wavelength']*1e3)
-    #
-    for i, (eta_0, eta_H, Froude, eta_B) in enumerate(zip(eta_0_vals, Data[station]['kH'], Data[station]['Froude'], Data[station]['kLB'])):
+path_store = os.path.join(path_outputdata, 'hydro_coeffs_chunks')  # finished chunks, to resume an interrupted run
+path_cache = os.path.join(path_outputdata, 'hydro_coeffs_cache.sqlite')  # coefficients of all previous runs
+rtol_cache = 1e-6  # relative tolerance below which parameters are considered identical
+
+if __name__ == '__main__':  # required by the process pool on platforms that spawn the workers
+    hydro_Coeffs = {}
+    for station in Stations:
+        k = 2*np.pi/(Data_pattern[station]['wavelength']*1e3)  # wavenumber [1/m]
+        eta_0 = k*z0
+        eta_H = Data[station]['kH']
         max_z = 0.9999*eta_H
-        if not np.isnan([eta_H, Froude, eta_B]).any():
-            Sol = calculate_solution(eta, eta_H, eta_0, eta_B, Froude, max_z, Kappa=0.4)
-            #
-            Ax, Bx = np.real(Sol[2]), np.imag(Sol[2])
-        else:
-            Ax, Bx = np.nan, np.nan
-        hydro_Coeffs[station][:, i] = [Ax, Bx]
-#
-np.save(os.path.join(path_outputdata, 'time_series_hydro_coeffs.npy'), hydro_Coeffs)
+        # time steps not already in the cache are solved in parallel by chunks, NaN inputs giving NaN coefficients
+        solver = partial(compute_hydro_coeffs, store=os.path.join(path_store, station))
+        Ax, Bx, _ = cached_solve_many(eta_H, eta_0, Data[station]['kLB'], Data[station]['Froude'], max_z,
+                                      path_cache, rtol=rtol_cache, Kappa=Kappa, solver=solver)
+        hydro_Coeffs[station] = np.array([Ax, Bx])
+    #
+    np.save(os.path.join(path_outputdata, 'time_series_hydro_coeffs.npy'), hydro_Coeffs)
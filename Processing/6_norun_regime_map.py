@@ -0,0 +1,39 @@
+r"""
+================================================
+Regime diagram of the hydrodynamic coefficients
+================================================
+
+Here, we calculate the hydrodynamic coefficients predicted by the linear theory on a grid of the regime diagram
+:math:`(\mathcal{F}, kH, kL_{B})` shown in Figure 8 and in the supplementary figures, at the non-dimensional roughness of
+each station. The grid is then refined in the region where most of the measured time steps lie.
+
+Note that this script takes a certain amount of times to run, and as such is not run during the building of this documentation.
+"""
+
+import numpy as np
+import os
+import sys
+sys.path.append('../')
+from python_codes.regime_map import build_map, refine_map
+
+# Paths
+path_outputdata = '../static/data/processed_data/'
+
+# ##### Loading pattern characteristics
+Data_pattern = np.load(os.path.join(path_outputdata, 'Data_DEM.npy'), allow_pickle=True).item()
+Stations = ['South_Namib_Station', 'Deep_Sea_Station']
+
+# Parameters
+z0 = 1e-3  # hydrodynamic roughness, [m]
+Froude = np.logspace(-2, 2.5, 91)
+kH = np.logspace(-1.5, 1, 51)
+kLB = np.logspace(-2, 1, 61)
+
+path_store = os.path.join(path_outputdata, 'regime_maps')
+
+if __name__ == '__main__':  # required by the process pool on platforms that spawn the workers
+    for station in Stations:
+        k = 2*np.pi/(Data_pattern[station]['wavelength']*1e3)  # wavenumber [1/m]
+        store = os.path.join(path_store, station)
+        build_map(store, Froude, kH, kLB, kz0=k*z0)
+        refine_map(store, Froude=(0.1, 10), kH=(0.1, 3), factor=2)
@@ -0,0 +1,46 @@
+r"""
+=====================================
+Monthly sediment flux maps over DEMs
+=====================================
+
+Here, we calculate maps of the monthly averaged sediment flux over the DEM of each station, from the hourly ERA5-Land shear
+velocity and direction, the shear stress perturbation predicted by the linear theory (with the unstratified coefficients
+:math:`\mathcal{A}_{0}(kz_{0})`, :math:`\mathcal{B}_{0}(kz_{0})`) and the quadratic and quartic transport laws. The time
+steps are binned by wind direction and shear velocity, so that each flux field is calculated only once.
+
+Note that this script takes a certain amount of times to run, and as such is not run during the building of this documentation.
+"""
+
+import numpy as np
+import os
+import sys
+sys.path.append('../')
+from python_codes.flux_map import flux_maps
+from python_codes.linear_theory import coeffA0, coeffB0
+from python_codes.meteo_analysis import quadratic_transport_law, quartic_transport_law
+
+# Paths
+path_outputdata = '../static/data/processed_data/'
+
+# ##### Loading meteo data and DEMs
+Data = np.load(os.path.join(path_outputdata, 'Data_final.npy'), allow_pickle=True).item()
+Data_DEM = np.load(os.path.join(path_outputdata, 'Data_DEM.npy'), allow_pickle=True).item()
+Stations = ['South_Namib_Station', 'Deep_Sea_Station']
+
+# Parameters
+z0 = 1e-3  # hydrodynamic roughness, [m]
+transport_laws = {'quadratic': lambda theta: quadratic_transport_law(theta, 0.005, 8),
+                  'quartic': lambda theta: quartic_transport_law(theta, 0.0035)}
+
+Flux_maps = {}
+for station in Stations:
+    months = np.array([t.year*12 + t.month - 1 for t in Data[station]['time']])
+    topo, step = Data_DEM[station]['topo'], Data_DEM[station]['km_step']*1e3
+    Flux_maps[station] = {}
+    for name, law in transport_laws.items():
+        periods, q = flux_maps(topo, step, Data[station]['Orientation_era'], Data[station]['U_star_era'], law,
+                               lambda k: coeffA0(k*z0), lambda k: coeffB0(k*z0), periods=months)
+        Flux_maps[station][name] = q
+    Flux_maps[station]['year'], Flux_maps[station]['month'] = periods//12, periods % 12 + 1
+
+np.save(os.path.join(path_outputdata, 'Flux_maps.npy'), Flux_maps)
@@ -0,0 +1,55 @@
+r"""
+======================================
+Time series of the dune orientations
+======================================
+
+Here, we calculate the dune orientations predicted by the model of Courrech du Pont et al. (2014), for both the bed
+instability and the elongation mechanisms, in 30-day windows shifted by one day, from the in situ and ERA5-Land winds and
+the quadratic and quartic transport laws. The angular distributions of the sediment flux are updated incrementally from
+one window to the next.
+
+Note that this script takes a certain amount of times to run, and as such is not run during the building of this documentation.
+"""
+
+import numpy as np
+import os
+import sys
+sys.path.append('../')
+from python_codes.rolling_orientation import rolling_orientations
+from python_codes.meteo_analysis import quadratic_transport_law, quartic_transport_law
+
+# Paths
+path_outputdata = '../static/data/processed_data/'
+
+# ##### Loading meteo data
+Data = np.load(os.path.join(path_outputdata, 'Data_final.npy'), allow_pickle=True).item()
+Stations = ['South_Namib_Station', 'Deep_Sea_Station']
+
+# Parameters
+rho_g = 2.65e3  # grain density
+rho_f = 1   # fluid density
+g = 9.81  # [m/s2]
+grain_diameter = 180e-6  # grain size [m]
+gamma = 1.6
+window, step = np.timedelta64(30, 'D'), np.timedelta64(1, 'D')
+#
+# Quadratic transport law parameters
+theta_th_quadratic = 0.005  # threshold shield numbers for the quadratic
+Omega = 8
+# Quartic transport law parameters
+theta_th_quartic = 0.0035    # threshold shield numbers for the quartic
+
+Rolling_orientations = {}
+for station in Stations:
+    Rolling_orientations[station] = {}
+    for source in ['insitu', 'era']:
+        # sediment fluxes, shape (transport law, time)
+        theta = (rho_f/((rho_g - rho_f)*g*grain_diameter))*Data[station]['U_star_' + source]**2
+        q = np.array([quadratic_transport_law(theta, theta_th_quadratic, Omega),
+                      quartic_transport_law(theta, theta_th_quartic)])
+        time, alpha_BI, alpha_F = rolling_orientations(Data[station]['time'], Data[station]['Orientation_' + source], q,
+                                                       window=window, step=step, gamma=gamma, min_count=24*15)
+        Rolling_orientations[station][source] = {'time': time, 'alpha_BI': alpha_BI, 'alpha_F': alpha_F,
+                                                 'transport_laws': ['quadratic', 'quartic']}
+
+np.save(os.path.join(path_outputdata, 'Rolling_orientations.npy'), Rolling_orientations)
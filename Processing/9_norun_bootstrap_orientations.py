@@ -0,0 +1,67 @@
+r"""
+==============================================
+Confidence intervals of the dune orientations
+==============================================
+
+Here, we estimate the uncertainty of the dune orientations predicted in Figure 9, for each station, wind source, transport
+law, grain size and flux-up ratio, by a block bootstrap of the hourly wind time series (blocks of one week).
+
+Note that this script takes a certain amount of times to run, and as such is not run during the building of this documentation.
+"""
+
+import numpy as np
+import os
+import sys
+from datetime import datetime
+sys.path.append('../')
+from python_codes.bootstrap import bootstrap_orientations
+from python_codes.meteo_analysis import quadratic_transport_law, quartic_transport_law
+
+# Paths
+path_outputdata = '../static/data/processed_data/'
+
+# ##### Loading meteo data
+Data = np.load(os.path.join(path_outputdata, 'Data_final.npy'), allow_pickle=True).item()
+Stations = ['South_Namib_Station', 'Deep_Sea_Station']
+
+# Parameters, as in Figure 9
+rho_g = 2.65e3  # grain density
+rho_f = 1   # fluid density
+g = 9.81  # [m/s2]
+grain_diameters = np.linspace(100e-6, 400e-6, 30)  # grain size [m]
+#
+# Quadratic transport law parameters
+theta_th_quadratic = 0.005  # threshold shield numbers for the quadratic
+Omega = 8
+# Quartic transport law parameters
+theta_th_quartic = 0.0035    # threshold shield numbers for the quartic
+#
+gamma = np.array(list(np.logspace(-1, 1, 10)) + [1.6])
+#
+time_mask = {'Deep_Sea_Station': [Data['Deep_Sea_Station']['time'].min(), Data['Deep_Sea_Station']['time'].max()],
+             'South_Namib_Station': [datetime(2014, 7, 1), Data['South_Namib_Station']['time'].max()],
+             }
+# Bootstrap parameters
+n_resamples = 1000
+block_length = 24*7  # [h]
+n_workers = os.cpu_count()
+
+if __name__ == '__main__':
+    Bootstrap_orientations = {}
+    for i, station in enumerate(Stations):
+        mask_time = (Data[station]['time'] >= time_mask[station][0]) & (Data[station]['time'] <= time_mask[station][1])
+        Orientations = np.array([Data[station]['Orientation_insitu'][mask_time], Data[station]['Orientation_era'][mask_time]])
+        Shear_vel = np.array([Data[station]['U_star_insitu'][mask_time], Data[station]['U_star_era'][mask_time]])
+        theta = (rho_f/((rho_g - rho_f)*g*grain_diameters[:, None, None]))*Shear_vel[None, :, :]**2
+        # sediment fluxes, shape (transport law, grain size, wind source, time)
+        q = np.array([quadratic_transport_law(theta, theta_th_quadratic, Omega),
+                      quartic_transport_law(theta, theta_th_quartic)])
+        # results of shape (gamma, transport law, grain size, wind source)
+        alpha_BI, alpha_F, CI_BI, CI_F = bootstrap_orientations(Orientations, q, gamma=gamma[:, None, None, None],
+                                                                n_resamples=n_resamples, block_length=block_length,
+                                                                seed=i, n_workers=n_workers)
+        Bootstrap_orientations[station] = {'alpha_BI': alpha_BI, 'alpha_F': alpha_F, 'CI_BI': CI_BI, 'CI_F': CI_F,
+                                           'gamma': gamma, 'grain_diameters': grain_diameters,
+                                           'transport_laws': ['quadratic', 'quartic'], 'sources': ['insitu', 'era']}
+
+    np.save(os.path.join(path_outputdata, 'Bootstrap_orientations.npy'), Bootstrap_orientations)
@@ -0,0 +1,39 @@
+r"""
+===============================================
+Right-hand side evaluations of the linear model
+===============================================
+
+Microbenchmark of the right-hand side functions of the linear theory, in number of calls per second: the original
+functions building the :math:`P` matrix at each call, and the element-wise kernel, in pure python and compiled with numba
+(when it is installed).
+"""
+
+import sys
+import timeit
+import numpy as np
+sys.path.append('../')
+import python_codes.linear_theory as lt
+
+eta_H, eta_0, Kappa = 1.5, 1e-4, 0.4
+eta = 0.3
+n_calls = 20000
+
+X_single = (np.arange(4) + 1j).astype(complex)
+X_augmented = (np.arange(12) + 1j).astype(complex)
+
+functions = {
+    'single solution, _func1': lambda: lt._func1(eta, X_single, eta_H, eta_0, Kappa),
+    'single solution, kernel (python)': lambda f=lt._make_rhs(eta_H, eta_0, Kappa, source=1, jit=False): f(eta, X_single),
+    '3 solutions, _func_augmented': lambda: lt._func_augmented(eta, X_augmented, eta_H, eta_0, Kappa),
+    '3 solutions, kernel (python)': lambda f=lt._make_rhs(eta_H, eta_0, Kappa, n_columns=3, source=1, jit=False): f(eta, X_augmented),
+}
+if lt.njit is not None:
+    functions['single solution, kernel (numba)'] = lambda f=lt._make_rhs(eta_H, eta_0, Kappa, source=1): f(eta, X_single)
+    functions['3 solutions, kernel (numba)'] = lambda f=lt._make_rhs(eta_H, eta_0, Kappa, n_columns=3, source=1): f(eta, X_augmented)
+else:
+    print('numba is not installed, only the pure python kernel is benchmarked.')
+
+for name, function in functions.items():
+    function()  # compilation
+    duration = min(timeit.repeat(function, number=n_calls, repeat=3))
+    print('{:<35s} {:>12.0f} calls/s'.format(name, n_calls/duration))
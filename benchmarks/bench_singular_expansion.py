@@ -0,0 +1,40 @@
+r"""
+=========================================================
+Local expansion at the top of the boundary layer
+=========================================================
+
+Accuracy against runtime of the hydrodynamic coefficients calculated by :func:`calculate_solution
+<python_codes.linear_theory.calculate_solution>`, either by integrating up to `max_z` slightly below `eta_H`, or by
+stopping the integration at a relative distance `t_s` below `eta_H` and applying the boundary conditions exactly at
+`eta_H` with the local expansion of the solutions.
+
+The reference is the expansion with `t_s = 0.01` and the integration tolerances set to 1e-12.
+"""
+
+import sys
+import time
+import numpy as np
+sys.path.append('../')
+import python_codes.linear_theory as lt
+
+parameters = [(1.5, 1e-4, 0.5, 0.8), (6.3, 1.6e-5, 0.37, 12.3), (0.1, 1e-3, 3, 0.05)]  # eta_H, eta_0, eta_B, Fr
+
+
+def hydro_coeff(eta_H, eta_0, eta_B, Fr, max_z, **kwargs):
+    Results = lt._solve_system(eta_0, eta_H, max_z=max_z, **kwargs)
+    To_apply = np.array([X.sol(max_z)[1:] for X in Results]).T
+    b = lt._boundary_vector(max_z, eta_H, eta_0, eta_B, Fr, 0.4)
+    pars = np.linalg.solve(To_apply[:, :-1], b - To_apply[:, -1])
+    return pars[1]/pars[0]
+
+
+for eta_H, eta_0, eta_B, Fr in parameters:
+    print('eta_H = {}, eta_0 = {}, eta_B = {}, Fr = {}'.format(eta_H, eta_0, eta_B, Fr))
+    reference = hydro_coeff(eta_H, eta_0, eta_B, Fr, eta_H, expansion=0.01, atol=1e-12, rtol=1e-12)
+    cases = [('max_z = {} eta_H'.format(ratio), dict(max_z=ratio*eta_H)) for ratio in (0.99, 0.9999, 0.999999)]
+    cases += [('expansion, t_s = {}'.format(t_s), dict(max_z=eta_H, expansion=t_s)) for t_s in (0.3, 0.1, 0.05)]
+    for name, kwargs in cases:
+        start = time.perf_counter()
+        coeff = hydro_coeff(eta_H, eta_0, eta_B, Fr, atol=1e-10, rtol=1e-10, **kwargs)
+        duration = time.perf_counter() - start
+        print('    {:<28s} {:8.3f} s   relative error {:.1e}'.format(name, duration, abs(coeff - reference)/abs(reference)))
@@ -0,0 +1,51 @@
+r"""
+=========================================================
+Ordering of the parameter sets in solve_many
+=========================================================
+
+Number of right-hand side evaluations of the batched integrations of :func:`solve_many
+<python_codes.linear_theory.solve_many>`, with the parameter sets split into chunks in the input (chronological) order,
+and after ordering them along a nearest-neighbour path (`reorder=True`). Each evaluation computes the right-hand side of
+all the members of a chunk.
+
+The station time series are not part of this repository, so that two synthetic hourly series of two months are used:
+a boundary layer height following a daily cycle with noise, and parameter sets scattered over the regime diagram.
+"""
+
+import sys
+import time
+import numpy as np
+sys.path.append('../')
+import python_codes.linear_theory as lt
+
+rng = np.random.default_rng(0)
+n = 24*60
+t = np.arange(n)
+k = 2*np.pi/2500  # wavenumber [1/m]
+H = np.clip(np.exp(np.log(800) + 0.8*np.sin(2*np.pi*t/24) + 0.3*rng.standard_normal(n)), 100, 2000)  # [m]
+eta_B = k*np.exp(np.log(400) + 0.5*rng.standard_normal(n))
+Fr = np.exp(0.5*rng.standard_normal(n))
+series = {'daily cycle': (k*H, np.full(n, k*1e-3)),
+          'scattered': (np.exp(rng.uniform(np.log(0.05), np.log(5), n)), np.exp(rng.uniform(np.log(1e-5), np.log(1e-3), n)))}
+
+# counting the evaluations of the right-hand side of the batched integrations
+n_calls = [0]
+func_batch = lt._func_batch
+
+
+def counted_func_batch(*args):
+    n_calls[0] += 1
+    return func_batch(*args)
+
+
+lt._func_batch = counted_func_batch
+
+for name, (eta_H, eta_0) in series.items():
+    results = {}
+    for reorder in (False, True):
+        n_calls[0] = 0
+        start = time.perf_counter()
+        results[reorder] = lt.solve_many(eta_H, eta_0, eta_B, Fr, 0.9999*eta_H, reorder=reorder)
+        print('{:<12s} reorder={!s:<6} {:>8d} evaluations, {:.1f} s'.format(name, reorder, n_calls[0], time.perf_counter() - start))
+    difference = np.abs(np.array(results[True]) - np.array(results[False])).max()/np.abs(np.array(results[False])).max()
+    print('{:<12s} maximum relative difference between the two orders: {:.1e}'.format(name, difference))
@@ -9,6 +9,8 @@ References
 """
 
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from scipy import fft
 from python_codes.general import Vector_average, cosd, sind
 
 
@@ -116,7 +118,139 @@ def Resultant_flux_perp_crest_at_crest(alpha, theta, Q0, gamma=1.6, axis=-1):
     return RDP*(cosd(alpha_squeezed + 90)*cosd(RDD) + sind(alpha_squeezed + 90)*sind(RDD))
 
 
-def Elongation_direction(theta, Q0, gamma=1.6, alpha_bins=np.linspace(0, 360, 361), axis=-1, **kwargs):
+def _without_axis(x, ndim, axis):
+    # x, broadcastable against arrays with ndim dimensions, without its (singleton) dimension along the negative axis
+    x = np.asarray(x)
+    x = x.reshape((1,)*(ndim - x.ndim) + x.shape)
+    if x.shape[axis] != 1:
+        raise ValueError('With the FFT method, gamma and capture_rate must not vary with the flux orientation.')
+    return np.take(x, 0, axis=axis)
+
+
+def _circular_correlations(theta, Q0, kernels, alpha_bins, axis=-1):
+    r"""Calculate :math:`\sum_{\theta} Q_{0}(\theta) K(\theta - \alpha)` for each kernel :math:`K` and every dune orientation
+    of `alpha_bins`, as circular cross-correlations computed with FFTs along `axis`.
+
+    The flux orientations must be regularly spaced over 360 degrees along `axis`, and `alpha_bins` on the same lattice
+    (modulo 360). The results have the dune orientation as first axis, followed by the other axes of the flux distribution.
+    """
+    shape = np.broadcast_shapes(np.shape(theta), np.shape(Q0))
+    axis = axis - len(shape) if axis >= 0 else axis
+    n = shape[axis]
+    step = 360/n
+    th = np.asarray(theta, dtype=float)
+    th = np.moveaxis(th.reshape((1,)*(len(shape) - th.ndim) + th.shape), axis, -1)
+    th = th.reshape((-1, th.shape[-1]))
+    if th.shape[-1] != n or not np.allclose(th, th[:1]) or not np.allclose(np.diff(th[0]), step):
+        raise ValueError('The FFT method requires flux orientations regularly spaced over 360 degrees along axis {}.'.format(axis))
+    alpha_bins = np.asarray(alpha_bins, dtype=float)
+    shift = (alpha_bins - alpha_bins[0])/step
+    if not np.allclose(shift, np.round(shift)):
+        raise ValueError('With the FFT method, alpha_bins must be spaced by multiples of the flux orientation step.')
+    index = np.round(shift).astype(int) % n
+    #
+    # c(alpha_0 + i step) = sum_j Q0_j k_(j - i), with k_m = K(theta_0 - alpha_0 + m step)
+    phi = th[0, 0] - alpha_bins[0] + step*np.arange(n)
+    Q_hat = fft.rfft(np.broadcast_to(Q0, shape), axis=axis)
+    results = []
+    for kernel in kernels:
+        K_hat = np.conj(fft.rfft(kernel(phi))).reshape((-1,) + (1,)*(-axis - 1))
+        results.append(np.moveaxis(fft.irfft(Q_hat*K_hat, n=n, axis=axis), axis, 0)[index])
+    return results
+
+
+#: Estimated peak memory per output element of the dune orientation models, in bytes per (dune orientation, flux
+#: orientation) pair for the direct method, and per dune or flux orientation for the FFT method.
+BYTES_PER_ELEMENT = {'Bed_Instability_Orientation': {'direct': 16, 'fft': 32},
+                     'Elongation_direction': {'direct': 48, 'fft': 32}}
+
+
+def _broadcast_except_axis(x, shape, axis):
+    # broadcasted view of x, keeping a singleton dimension along axis
+    x = np.asarray(x)
+    x = x.reshape((1,)*(len(shape) - x.ndim) + x.shape)
+    target = list(shape)
+    if x.shape[axis] == 1:
+        target[axis] = 1
+    return np.broadcast_to(x, target)
+
+
+def _apply_in_chunks(func, theta, Q0, gamma, axis, bytes_per_element, max_bytes, n_workers):
+    r"""Apply `func(theta, Q0, gamma)` on blocks of the leading dimensions of the broadcasted inputs, each block using at
+    most about `max_bytes`/`n_workers`, and gather the results in an array of the broadcasted shape without `axis`.
+    """
+    shape = np.broadcast_shapes(np.shape(theta), np.shape(Q0), np.shape(gamma))
+    axis = axis % len(shape)
+    inputs = [_broadcast_except_axis(x, shape, axis) for x in (theta, Q0, gamma)]
+    out_shape = shape[:axis] + shape[axis + 1:]
+    out = np.empty(out_shape)
+    #
+    # the first k - 1 dimensions are iterated over, and the k-th one is split in blocks of the given size
+    budget = max(1, int(max_bytes//(bytes_per_element*n_workers)))
+    k = next(k for k in range(len(out_shape) + 1) if np.prod(out_shape[k:], dtype=int) <= budget)
+    if k == 0:
+        out[...] = np.reshape(func(*inputs), out_shape)
+        return out
+    block = max(1, budget//np.prod(out_shape[k:], dtype=int))
+    blocks = [tuple(slice(i, i + 1) for i in index) + (slice(start, start + block),)
+              for index in np.ndindex(out_shape[:k - 1]) for start in range(0, out_shape[k - 1], block)]
+
+    def _solve_block(out_index):
+        in_index = out_index[:axis] + (slice(None),) + out_index[axis:]
+        target = out[out_index]
+        target[...] = np.reshape(func(*[x[in_index] for x in inputs]), target.shape)
+
+    if n_workers > 1:
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            list(executor.map(_solve_block, blocks))
+    else:
+        for out_index in blocks:
+            _solve_block(out_index)
+    return out
+
+
+def Resultant_flux_perp_crest_at_crest_fft(theta, Q0, gamma=1.6, alpha_bins=np.linspace(0, 360, 361), axis=-1):
+    r"""Same as :func:`Resultant_flux_perp_crest_at_crest <python_codes.CourrechDuPont2014.Resultant_flux_perp_crest_at_crest>`,
+    but for all the dune orientations of `alpha_bins` at once, using FFTs.
+
+    The component perpendicular to the crest of the resultant flux at the crest is the circular cross-correlation of the flux
+    distribution with the kernel :math:`(1 + \gamma\vert\sin\phi\vert)\sin\phi`.
+
+    Parameters
+    ----------
+    theta : numpy array
+        Flux orientations :math:`\theta` in degrees, regularly spaced over 360 degrees along `axis` (e.g. the bin centers
+        of :func:`Make_angular_PDF <python_codes.general.Make_angular_PDF>`).
+    Q0 : numpy array
+        Flux at the bottom of the dune :math:`Q_{0}`.
+    gamma : scalar, numpy array
+        Flux-up ratio :math:`\gamma` (the default is 1.6). It must not vary along `axis`.
+    alpha_bins : numpy array
+        Dune orientations, spaced by multiples of the step of `theta` (the default is np.linspace(0, 360, 361)).
+    axis : int
+        axis over wich the average is done (the default is -1).
+
+    Returns
+    -------
+    numpy array
+        Component of the resultant flux at the crest perpendicular to the crest, with the dune orientation as first axis.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> theta = np.linspace(0.5, 359.5, 360)
+    >>> Q0 = np.random.random((10, 360))*50
+    >>> Qcrest_perp = Resultant_flux_perp_crest_at_crest_fft(theta, Q0)
+
+    """
+    linear, quadratic = _circular_correlations(theta, Q0, [sind, lambda phi: np.abs(sind(phi))*sind(phi)], alpha_bins, axis=axis)
+    n = np.broadcast_shapes(np.shape(theta), np.shape(Q0))[axis]
+    gamma = np.expand_dims(_without_axis(gamma, max(linear.ndim, np.ndim(gamma)), axis), 0)
+    return (linear + gamma*quadratic)/n
+
+
+def Elongation_direction(theta, Q0, gamma=1.6, alpha_bins=np.linspace(0, 360, 361), axis=-1, method='direct', max_bytes=None,
+                         n_workers=1, **kwargs):
     r"""Calculate the elongation direction as the dune orientation for wich the components of the resultant sand flux at the dune crest
     perpendicular to the dune crest cancel each other out.
 
@@ -130,6 +264,15 @@ def Elongation_direction(theta, Q0, gamma=1.6, alpha_bins=np.linspace(0, 360, 36
         Flux-up ratio :math:`\gamma` (the default is 1.6).
     alpha_bins : numpy array
         Bins in dune orientation used to calculate the resultant flux at the crest (the default is np.linspace(0, 360, 361)).
+    method : str
+        'direct' (default) to evaluate the resultant flux for all the dune orientations by broadcasting, or 'fft' to use
+        :func:`Resultant_flux_perp_crest_at_crest_fft <python_codes.CourrechDuPont2014.Resultant_flux_perp_crest_at_crest_fft>`,
+        which requires flux orientations regularly spaced over 360 degrees along `axis` (e.g. an angular PDF).
+    max_bytes : int, None
+        Approximate memory budget of the intermediate arrays [bytes]. If given, the flux distributions are processed in
+        blocks of their leading dimensions fitting in this budget. If None (default), they are processed all at once.
+    n_workers : int
+        Number of threads processing the blocks when `max_bytes` is given, sharing the memory budget (the default is 1).
     **kwargs :
         `kwargs` are optional parameters passed to :func:`Resultant_flux_perp_crest_at_crest <python_codes.CourrechDuPont2014.Resultant_flux_perp_crest_at_crest>`.
 
@@ -149,20 +292,143 @@ def Elongation_direction(theta, Q0, gamma=1.6, alpha_bins=np.linspace(0, 360, 36
     ----------
     [1] Courrech du Pont, S., Narteau, C., & Gao, X. (2014). Two modes for dune orientation. Geology, 42(9), 743-746.
     """
-
-    # Matching dimensions
-    alpha_expanded = np.expand_dims(alpha_bins, tuple(np.arange(1, len(theta.shape) + 1)))
-    th_expanded, N_expanded, gamma_expended = np.expand_dims(theta, 0), np.expand_dims(Q0, 0), np.expand_dims(gamma, 0)
-    #
-    Alpha_F = alpha_bins[np.argmin(np.abs(Resultant_flux_perp_crest_at_crest(alpha_expanded, th_expanded, N_expanded, gamma=gamma_expended, axis=axis, **kwargs)), axis=0)]
-    del alpha_expanded, th_expanded, N_expanded
-    RDD, _ = Vector_average(theta, Q0)  # wind resultant angle
+    if max_bytes is None:
+        return _elongation_direction(theta, Q0, gamma, alpha_bins, axis, method, **kwargs)
+    n = np.broadcast_shapes(np.shape(theta), np.shape(Q0))[axis]
+    n_alpha = np.size(alpha_bins)
+    bytes_per_element = BYTES_PER_ELEMENT['Elongation_direction'][method]*(n_alpha*n if method == 'direct' else n_alpha + n)
+    return _apply_in_chunks(lambda th, N, g: _elongation_direction(th, N, g, alpha_bins, axis, method, **kwargs),
+                            theta, Q0, gamma, axis, bytes_per_element, max_bytes, n_workers)
+
+
+def _elongation_direction(theta, Q0, gamma, alpha_bins, axis, method, **kwargs):
+    if axis >= 0:  # negative axis, unchanged by the dimension of the dune orientations added below
+        axis = axis - len(np.broadcast_shapes(np.shape(theta), np.shape(Q0)))
+    if method == 'fft':
+        Alpha_F = alpha_bins[np.argmin(np.abs(Resultant_flux_perp_crest_at_crest_fft(theta, Q0, gamma=gamma, alpha_bins=alpha_bins, axis=axis)), axis=0)]
+    else:
+        # Matching dimensions
+        alpha_expanded = np.expand_dims(alpha_bins, tuple(np.arange(1, len(theta.shape) + 1)))
+        th_expanded, N_expanded, gamma_expended = np.expand_dims(theta, 0), np.expand_dims(Q0, 0), np.expand_dims(gamma, 0)
+        #
+        Alpha_F = alpha_bins[np.argmin(np.abs(Resultant_flux_perp_crest_at_crest(alpha_expanded, th_expanded, N_expanded, gamma=gamma_expended, axis=axis, **kwargs)), axis=0)]
+        del alpha_expanded, th_expanded, N_expanded
+    RDD, _ = Vector_average(theta, Q0, axis=axis)  # wind resultant angle
     #
     prod = cosd(Alpha_F)*cosd(RDD) + sind(Alpha_F)*sind(RDD)  # check that the orientation goes in the right drirection
     del RDD
     return np.mod(np.where(prod > 0, Alpha_F, Alpha_F + 180), 360)
 
 
+def _perp_flux_and_slope(alpha, cos_theta, sin_theta, weights, gamma, slope=True):
+    # crest-normal resultant flux at the crest, and its derivative with respect to alpha [1/deg], along the last axis
+    sin_phi = sin_theta*cosd(alpha) - cos_theta*sind(alpha)
+    flux = np.sum(weights*(1 + gamma*np.abs(sin_phi))*sin_phi, axis=-1)
+    if not slope:
+        return flux
+    cos_phi = cos_theta*cosd(alpha) + sin_theta*sind(alpha)
+    return flux, -np.sum(weights*(1 + 2*gamma*np.abs(sin_phi))*cos_phi, axis=-1)*np.pi/180
+
+
+def Elongation_direction_roots(theta, Q0, gamma=1.6, axis=-1, coarse_step=1, xtol=1e-3, maxiter=100):
+    r"""Calculate all the elongation directions, as the roots of the component of the resultant sand flux at the crest
+    perpendicular to the crest, with a continuous resolution.
+
+    The crest-normal component being antiperiodic in the dune orientation, its sign changes are first located on a coarse
+    grid spanning 180 degrees, one grid orientation at a time. All the brackets are then refined together by a Newton
+    method with the analytical derivative, safeguarded by bisection. Roots where the component only touches zero, without
+    sign change, are not detected.
+
+    Parameters
+    ----------
+    theta : scalar, numpy array
+        Flux orientation :math:`\theta` in degrees.
+    Q0 : scalar, numpy array
+        Flux at the bottom of the dune :math:`Q_{0}`.
+    gamma : scalar, numpy array
+        Flux-up ratio :math:`\gamma` (the default is 1.6).
+    axis : int
+        axis over wich the average is done (the default is -1).
+    coarse_step : float
+        Step of the coarse grid used to bracket the roots, dividing 180 (the default is 1) [deg].
+    xtol : float
+        Absolute tolerance on the roots (the default is 1e-3) [deg].
+    maxiter : int
+        Maximum number of refinement iterations (the default is 100).
+
+    Returns
+    -------
+    numpy array
+        Elongation directions, oriented with the resultant sand flux as in :func:`Elongation_direction <python_codes.CourrechDuPont2014.Elongation_direction>`,
+        sorted in increasing order along the first axis and padded with NaN, with shape (maximum number of roots, ) followed
+        by the shape of the flux distributions without `axis`.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> theta = np.random.random((1000,))*360
+    >>> Q0 = np.random.random((1000,))*50
+    >>> Alpha_F = Elongation_direction_roots(theta, Q0)
+
+    """
+    n_coarse = int(round(180/coarse_step))
+    if not np.isclose(n_coarse*coarse_step, 180):
+        raise ValueError('coarse_step must divide 180 degrees.')
+    # flux distributions as rows
+    theta, Q0, gamma = [np.moveaxis(x, axis, -1) for x in np.broadcast_arrays(theta, Q0, gamma)]
+    shape = theta.shape[:-1]
+    theta, Q0 = theta.reshape((-1, theta.shape[-1])), Q0.reshape((-1, Q0.shape[-1]))
+    gamma = gamma[..., :1].reshape((-1, 1))
+    # averaging weights, ignoring NaN as Vector_average
+    missing = np.isnan(theta) | np.isnan(Q0)
+    weights = np.where(missing, 0, Q0)/np.sum(~missing, axis=-1, keepdims=True)
+    cos_theta, sin_theta = np.where(missing, 0, cosd(theta)), np.where(missing, 0, sind(theta))
+    #
+    # bracketing on the coarse grid, one orientation at a time
+    alpha_grid = coarse_step*np.arange(n_coarse + 1, dtype=float)
+    flux_grid = np.array([_perp_flux_and_slope(alpha, cos_theta, sin_theta, weights, gamma, slope=False) for alpha in alpha_grid])
+    # roots on the grid, with a sign change around them (the flux at -coarse_step being minus the one at 180 - coarse_step)
+    previous = np.concatenate([-flux_grid[-2:-1], flux_grid[:-2]])
+    row_exact, col_exact = np.nonzero((flux_grid[:-1] == 0) & (previous*flux_grid[1:] < 0))
+    row, col = np.nonzero(flux_grid[:-1]*flux_grid[1:] < 0)
+    a, b, fa = alpha_grid[row], alpha_grid[row + 1], flux_grid[row, col]
+    #
+    # safeguarded Newton refinement of all the brackets
+    x = a - fa*(b - a)/(flux_grid[row + 1, col] - fa)
+    roots = np.empty_like(x)
+    active = np.arange(x.size)
+    for _ in range(maxiter):
+        if active.size == 0:
+            break
+        rows = col[active]
+        f, df = _perp_flux_and_slope(x[active, None], cos_theta[rows], sin_theta[rows], weights[rows], gamma[rows])
+        same = np.sign(f) == np.sign(fa[active])
+        a[active] = np.where(same, x[active], a[active])
+        fa[active] = np.where(same, f, fa[active])
+        b[active] = np.where(same, b[active], x[active])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_new = x[active] - f/df
+        inside = (x_new > a[active]) & (x_new < b[active])
+        x_new = np.where(inside, x_new, (a[active] + b[active])/2)
+        done = (np.abs(x_new - x[active]) < xtol) | (f == 0) | (b[active] - a[active] < xtol)
+        x[active] = x_new
+        roots[active[done]] = x_new[done]
+        active = active[~done]
+    roots[active] = x[active]
+    #
+    # orientation with respect to the resultant sand flux, as in Elongation_direction
+    roots, col = np.concatenate([roots, alpha_grid[row_exact]]), np.concatenate([col, col_exact])
+    RDD, _ = Vector_average(theta[col], Q0[col])
+    roots = np.mod(np.where(cosd(roots - RDD) > 0, roots, roots + 180), 360)
+    #
+    n_roots = np.bincount(col, minlength=theta.shape[0])
+    Alpha_F = np.full((max(n_roots.max(initial=0), 1), theta.shape[0]), np.nan)
+    order = np.lexsort((roots, col))
+    rank = np.arange(col.size) - np.repeat(np.cumsum(n_roots) - n_roots, n_roots)
+    Alpha_F[rank, col[order]] = roots[order]
+    return Alpha_F.reshape((-1,) + shape)
+
+
 def Growth_rate(alpha, theta, Q0, gamma=1.6, axis=-1, capture_rate=1):
     r"""Calculate the dune growth rate using the dimensional analysis from Courrech du Pont et al. 2014.
 
@@ -207,7 +473,54 @@ def Growth_rate(alpha, theta, Q0, gamma=1.6, axis=-1, capture_rate=1):
     return np.squeeze(np.sum(CR*Q0*(np.abs(sind(theta - alpha)) + gamma*sind(theta-alpha)**2), axis=axis))
 
 
-def Bed_Instability_Orientation(theta, Q0, gamma=1.6, alpha_bins=np.linspace(0, 360, 361), **kwargs):
+def Growth_rate_fft(theta, Q0, gamma=1.6, alpha_bins=np.linspace(0, 360, 361), axis=-1, capture_rate=1):
+    r"""Same as :func:`Growth_rate <python_codes.CourrechDuPont2014.Growth_rate>`, but for all the dune orientations of
+    `alpha_bins` at once, using FFTs.
+
+    The growth rate is the circular cross-correlation of the flux distribution with the kernel
+    :math:`\vert\sin\phi\vert + \gamma\sin^{2}\phi`.
+
+    Parameters
+    ----------
+    theta : numpy array
+        Flux orientations :math:`\theta` in degrees, regularly spaced over 360 degrees along `axis` (e.g. the bin centers
+        of :func:`Make_angular_PDF <python_codes.general.Make_angular_PDF>`).
+    Q0 : numpy array
+        Flux at the bottom of the dune :math:`Q_{0}`.
+    gamma : scalar, numpy array
+        Flux-up ratio :math:`\gamma` (the default is 1.6). It must not vary along `axis`.
+    alpha_bins : numpy array
+        Dune orientations, spaced by multiples of the step of `theta` (the default is np.linspace(0, 360, 361)).
+    axis : int
+        axis over wich the sum is done (the default is -1).
+    capture_rate : scalar, numpy array
+        Capture rate of the avalanche slope, not varying with the dune and flux orientations (the default is 1).
+
+    Returns
+    -------
+    numpy array
+        Dune growth rate, with the dune orientation as first axis (singleton dimensions removed, as in :func:`Growth_rate <python_codes.CourrechDuPont2014.Growth_rate>`).
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> theta = np.linspace(0.5, 359.5, 360)
+    >>> Q0 = np.random.random((10, 360))*50
+    >>> G = Growth_rate_fft(theta, Q0)
+
+    """
+    if callable(capture_rate):
+        raise ValueError('With the FFT method, capture_rate must be a scalar or an array.')
+    linear, quadratic = _circular_correlations(theta, Q0, [lambda phi: np.abs(sind(phi)), lambda phi: sind(phi)**2],
+                                               alpha_bins, axis=axis)
+    ndim = max(linear.ndim, np.ndim(gamma), np.ndim(capture_rate))
+    gamma = np.expand_dims(_without_axis(gamma, ndim, axis), 0)
+    CR = np.expand_dims(_without_axis(capture_rate, ndim, axis), 0)
+    return np.squeeze(CR*(linear + gamma*quadratic))
+
+
+def Bed_Instability_Orientation(theta, Q0, gamma=1.6, alpha_bins=np.linspace(0, 360, 361), method='direct', max_bytes=None,
+                                n_workers=1, **kwargs):
     r"""Calculate the dune orientation growing from the flat bed instability as the maximum of the dimensional growth rate calculated in Courrech du Pont at al. 2014.
 
     Parameters
@@ -220,8 +533,19 @@ def Bed_Instability_Orientation(theta, Q0, gamma=1.6, alpha_bins=np.linspace(0,
         Flux-up ratio :math:`\gamma` (the default is 1.6).
     alpha_bins : numpy array
         Bins in dune orientation used to calculate the resultant flux at the crest (the default is np.linspace(0, 360, 361)).
+    method : str
+        'direct' (default) to evaluate the growth rate for all the dune orientations by broadcasting, or 'fft' to use
+        :func:`Growth_rate_fft <python_codes.CourrechDuPont2014.Growth_rate_fft>`, which requires flux orientations regularly
+        spaced over 360 degrees along the summation axis (e.g. an angular PDF).
+    max_bytes : int, None
+        Approximate memory budget of the intermediate arrays [bytes]. If given, the flux distributions are processed in
+        blocks of their leading dimensions fitting in this budget, and `capture_rate` cannot be an array. If None (default),
+        they are processed all at once.
+    n_workers : int
+        Number of threads processing the blocks when `max_bytes` is given, sharing the memory budget (the default is 1).
     **kwargs :
-        `kwargs` are optional parameters passed to :func:`Growth_rate <python_codes.CourrechDuPont2014.Growth_rate>`.
+        `kwargs` are optional parameters passed to :func:`Growth_rate <python_codes.CourrechDuPont2014.Growth_rate>`, or
+        :func:`Growth_rate_fft <python_codes.CourrechDuPont2014.Growth_rate_fft>`.
 
     Returns
     -------
@@ -239,10 +563,28 @@ def Bed_Instability_Orientation(theta, Q0, gamma=1.6, alpha_bins=np.linspace(0,
     ----------
     [1] Courrech du Pont, S., Narteau, C., & Gao, X. (2014). Two modes for dune orientation. Geology, 42(9), 743-746.
     """
-
-    # Matching dimensions
-    alpha_expanded = np.expand_dims(alpha_bins, tuple(np.arange(1, len(theta.shape) + 1)))
-    th_expanded, N_expanded, gamma_expended = np.expand_dims(theta, 0), np.expand_dims(Q0, 0), np.expand_dims(gamma, 0)
-    #
-    G_rate = Growth_rate(alpha_expanded, th_expanded, N_expanded, gamma=gamma_expended, **kwargs)
+    if max_bytes is None:
+        return _bed_instability_orientation(theta, Q0, gamma, alpha_bins, method, **kwargs)
+    if np.ndim(kwargs.get('capture_rate', 1)) > 0:
+        raise ValueError('With max_bytes, capture_rate must be a scalar or a function.')
+    axis = kwargs.get('axis', -1)
+    n = np.broadcast_shapes(np.shape(theta), np.shape(Q0))[axis]
+    n_alpha = np.size(alpha_bins)
+    bytes_per_element = BYTES_PER_ELEMENT['Bed_Instability_Orientation'][method]*(n_alpha*n if method == 'direct' else n_alpha + n)
+    Alpha = _apply_in_chunks(lambda th, N, g: _bed_instability_orientation(th, N, g, alpha_bins, method, **kwargs),
+                             theta, Q0, gamma, axis, bytes_per_element, max_bytes, n_workers)
+    return np.squeeze(Alpha)  # as the growth rate in the unchunked calculation
+
+
+def _bed_instability_orientation(theta, Q0, gamma, alpha_bins, method, **kwargs):
+    if kwargs.get('axis', -1) >= 0:  # negative axis, unchanged by the dimension of the dune orientations added below
+        kwargs['axis'] = kwargs['axis'] - len(np.broadcast_shapes(np.shape(theta), np.shape(Q0)))
+    if method == 'fft':
+        G_rate = Growth_rate_fft(theta, Q0, gamma=gamma, alpha_bins=alpha_bins, **kwargs)
+    else:
+        # Matching dimensions
+        alpha_expanded = np.expand_dims(alpha_bins, tuple(np.arange(1, len(theta.shape) + 1)))
+        th_expanded, N_expanded, gamma_expended = np.expand_dims(theta, 0), np.expand_dims(Q0, 0), np.expand_dims(gamma, 0)
+        #
+        G_rate = Growth_rate(alpha_expanded, th_expanded, N_expanded, gamma=gamma_expended, **kwargs)
     return np.mod(alpha_bins[G_rate.argmax(0)], 180)
@@ -0,0 +1,139 @@
+r"""
+Bootstrap confidence intervals of the predicted dune orientations.
+
+The wind time series is resampled with a moving block bootstrap, i.e. by concatenating blocks of consecutive time steps
+drawn at random, so that the autocorrelation of the wind within a block (daily cycle, weather systems) is preserved. For
+each resample, the angular distributions of the sediment flux and the dune orientations (bed instability and elongation
+mechanisms) are recalculated, with the FFT method of :mod:`python_codes.CourrechDuPont2014`.
+
+The resamples are split into chunks of fixed size, each having its own random generator spawned from a single
+:class:`numpy.random.SeedSequence`. The chunks are processed in a process pool, and the results only depend on the seed,
+not on the number of workers.
+
+Examples
+--------
+>>> import numpy as np
+>>> orientation, flux = np.random.random((8760, ))*360, np.random.random((2, 8760))
+>>> alpha_BI, alpha_F, CI_BI, CI_F = bootstrap_orientations(orientation, flux, n_resamples=200, seed=0, n_workers=4)
+
+"""
+
+import numpy as np
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from python_codes.general import Make_angular_PDF
+from python_codes.CourrechDuPont2014 import Bed_Instability_Orientation, Elongation_direction
+
+
+def _block_indices(rng, n, block_length):
+    # time indices of a moving block bootstrap resample of a series of length n
+    block_length = min(block_length, n)
+    starts = rng.integers(0, n - block_length + 1, size=-(-n//block_length))
+    return (starts[:, None] + np.arange(block_length)).ravel()[:n]
+
+
+def _orientations(orientation, flux, gamma, bin_edges, shape):
+    # dune orientations from the flux angular distributions, NaN when there is no flux
+    with np.errstate(invalid='ignore'):
+        PDF, bin_centers = Make_angular_PDF(orientation, flux, bin_edges=bin_edges)
+    PDF = PDF.reshape((1, )*(len(shape) + 1 - PDF.ndim) + PDF.shape)  # as many dimensions as gamma, as in Figure09
+    g = np.expand_dims(gamma, -1)
+    alpha_BI = np.reshape(Bed_Instability_Orientation(bin_centers, np.nan_to_num(PDF), gamma=g, method='fft'), shape)
+    alpha_F = np.reshape(Elongation_direction(bin_centers, np.nan_to_num(PDF), gamma=g, method='fft'), shape)
+    ok = np.broadcast_to(np.isfinite(PDF).all(axis=-1), shape)
+    return np.where(ok, alpha_BI, np.nan), np.where(ok, alpha_F, np.nan)
+
+
+def _bootstrap_chunk(seed, n_resamples, orientation, flux, gamma, bin_edges, block_length, shape):
+    # dune orientations of n_resamples resamples, with the random generator of the chunk
+    rng = np.random.default_rng(seed)
+    alpha_BI, alpha_F = np.empty((2, n_resamples) + shape)
+    for i in range(n_resamples):
+        index = _block_indices(rng, flux.shape[-1], block_length)
+        alpha_BI[i], alpha_F[i] = _orientations(orientation[..., index], flux[..., index], gamma, bin_edges, shape)
+    return alpha_BI, alpha_F
+
+
+def _init_worker(*args):
+    # inputs shared by all the chunks calculated in a worker process, sent only once
+    global _shared_args
+    _shared_args = args
+
+
+def _bootstrap_task(seed, n_resamples):
+    return _bootstrap_chunk(seed, n_resamples, *_shared_args)
+
+
+def _circular_interval(samples, center, period, confidence):
+    # percentile interval of angles, taken on the deviations from the central value wrapped in [-period/2, period/2)
+    deviation = np.mod(samples - center + period/2, period) - period/2
+    q = 50*(1 - confidence), 50*(1 + confidence)
+    with np.errstate(invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN samples where there is no flux
+        return center + np.nanpercentile(deviation, q, axis=0)
+
+
+def bootstrap_orientations(orientation, flux, gamma=1.6, n_resamples=1000, block_length=24*7, confidence=0.95,
+                           seed=None, n_workers=1, chunk_size=50, bin_edges=np.linspace(0, 360, 361)):
+    r"""Calculate bootstrap confidence intervals of the dune orientations predicted from a wind time series.
+
+    Parameters
+    ----------
+    orientation : numpy array
+        Orientation of the sediment flux of each time step, in degrees, with the time steps along the last axis. It must
+        be broadcastable against `flux` (e.g. different wind sources along a leading dimension).
+    flux : numpy array
+        Sediment flux of each time step, with the time steps along the last axis. Leading dimensions (e.g. transport
+        laws, grain sizes, wind sources) give independent flux series, all resampled with the same time indices.
+    gamma : scalar, numpy array
+        Flux-up ratio :math:`\gamma`, broadcastable against the leading dimensions of `flux` (the default is 1.6).
+    n_resamples : int
+        Number of bootstrap resamples (the default is 1000).
+    block_length : int
+        Number of consecutive time steps in the resampled blocks, which should exceed the autocorrelation time of the
+        wind (the default is 24*7, i.e. one week for hourly data).
+    confidence : float
+        Confidence level of the intervals (the default is 0.95).
+    seed : int, numpy.random.SeedSequence, None
+        Seed of the resampling. The chunks of resamples draw from independent streams spawned from it (the default is None).
+    n_workers : int
+        Number of processes used to calculate the chunks of resamples. If 1 (default), they are calculated in the current
+        process.
+    chunk_size : int
+        Number of resamples calculated by each task (the default is 50).
+    bin_edges : numpy array
+        Bins used to calculate the angular distributions of the sediment flux (the default is np.linspace(0, 360, 361)).
+
+    Returns
+    -------
+    alpha_BI : numpy array
+        Dune orientation of the bed instability calculated from the whole time series, in [0, 180) degrees, of shape the
+        broadcasted leading dimensions of `flux` and `gamma`.
+    alpha_F : numpy array
+        Elongation direction calculated from the whole time series, in [0, 360) degrees, same shape as `alpha_BI`.
+    CI_BI : numpy array
+        Lower and upper bounds of the confidence interval of `alpha_BI`, shape (2, ) + alpha_BI.shape. Angles are
+        unwrapped around `alpha_BI`, so that the bounds may lie outside of [0, 180).
+    CI_F : numpy array
+        Lower and upper bounds of the confidence interval of `alpha_F`, unwrapped around `alpha_F`, shape (2, ) + alpha_F.shape.
+
+    """
+    flux = np.asarray(flux, dtype=float)
+    orientation = np.broadcast_to(np.asarray(orientation, dtype=float), flux.shape)
+    shape = np.broadcast_shapes(flux.shape[:-1], np.shape(gamma))
+    alpha_BI, alpha_F = _orientations(orientation, flux, gamma, bin_edges, shape)
+    #
+    sizes = [min(chunk_size, n_resamples - i) for i in range(0, n_resamples, chunk_size)]
+    seeds = (seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)).spawn(len(sizes))
+    args = (orientation, flux, gamma, bin_edges, block_length, shape)
+    if n_workers == 1:
+        results = [_bootstrap_chunk(s, size, *args) for s, size in zip(seeds, sizes)]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=args) as executor:
+            results = list(executor.map(_bootstrap_task, seeds, sizes))
+    samples_BI = np.concatenate([r[0] for r in results])
+    samples_F = np.concatenate([r[1] for r in results])
+    #
+    CI_BI = _circular_interval(samples_BI, alpha_BI, 180, confidence)
+    CI_F = _circular_interval(samples_F, alpha_F, 360, confidence)
+    return alpha_BI, alpha_F, CI_BI, CI_F
@@ -0,0 +1,135 @@
+r"""
+Inverse estimation of the hydrodynamic coefficients from paired ERA5 and in situ winds.
+
+The ERA5-Land wind is taken as the undisturbed wind above the dunes, and the in situ wind as the wind perturbed by the
+dunes at the station, following the linear theory (:func:`Cisaillement_basal_rotated_wind <python_codes.linear_theory.Cisaillement_basal_rotated_wind>`).
+The shear stress being linear in :math:`(\mathcal{A}_{0}, \mathcal{B}_{0})`, the forward model is evaluated once per time
+step for the basis coefficient sets, and the misfit between the predicted and measured wind directions and shear velocities,
+as well as its gradient, are then simple array operations over the whole series. Coefficients can be fitted for the whole
+series, or separately for groups of time steps (e.g. time or regime bins) within a single minimization.
+
+Examples
+--------
+>>> import numpy as np
+>>> Data = np.load('static/data/processed_data/Data_final.npy', allow_pickle=True).item()['Deep_Sea_Station']
+>>> A0, B0, result = fit_hydro_coeffs(Data['Orientation_era'], Data['U_star_era'], Data['Orientation_insitu'],
+...                                   Data['U_star_insitu'], alpha=-50, AR=0.1)
+
+"""
+
+import numpy as np
+from scipy.optimize import minimize
+from python_codes.linear_theory import Cisaillement_basal_rotated_wind
+
+
+def _basis(theta, x, y, alpha, AR):
+    # shear stress at the station for (A0, B0) = (0, 0), and its derivatives with respect to A0 and B0, shape (2, N)
+    tau_0 = np.array(Cisaillement_basal_rotated_wind(x, y, alpha, 0, 0, AR, theta))
+    tau_A = np.array(Cisaillement_basal_rotated_wind(x, y, alpha, 1, 0, AR, theta)) - tau_0
+    tau_B = np.array(Cisaillement_basal_rotated_wind(x, y, alpha, 0, 1, AR, theta)) - tau_0
+    return tau_0, tau_A, tau_B
+
+
+def _misfit(params, tau_0, tau_A, tau_B, theta_insitu, ratio_u, group, n_groups, sigma_theta, sigma_u):
+    # mean square misfit and its gradient with respect to the coefficients of every group
+    A0, B0 = params[:n_groups][group], params[n_groups:][group]
+    tau = tau_0 + A0*tau_A + B0*tau_B
+    norm2 = tau[0]**2 + tau[1]**2
+    norm = np.sqrt(norm2)
+    #
+    # residuals: wrapped direction difference [rad], and relative shear velocity difference
+    r_theta = np.angle(np.exp(1j*(np.arctan2(tau[1], tau[0]) - theta_insitu)))
+    r_u = np.sqrt(norm) - ratio_u
+    cost = np.mean((r_theta/sigma_theta)**2 + (r_u/sigma_u)**2)
+    #
+    grad = np.empty_like(params)
+    for i, dtau in enumerate((tau_A, tau_B)):
+        dtheta = (tau[0]*dtau[1] - tau[1]*dtau[0])/norm2
+        du = (tau[0]*dtau[0] + tau[1]*dtau[1])/(2*norm*np.sqrt(norm))
+        dcost = 2*(r_theta*dtheta/sigma_theta**2 + r_u*du/sigma_u**2)/theta_insitu.size
+        grad[i*n_groups:(i + 1)*n_groups] = np.bincount(group, weights=dcost, minlength=n_groups)
+    return cost, grad
+
+
+def fit_hydro_coeffs(Orientation_era, U_star_era, Orientation_insitu, U_star_insitu, alpha, AR, x=0, y=0, groups=None,
+                     sigma_theta=10, sigma_u=0.1, A0_init=3.5, B0_init=1.5, **kwargs):
+    r"""Estimate the hydrodynamic coefficients that best explain the deviation of the in situ winds from the ERA5 winds.
+
+    The predicted in situ wind direction is the direction of the basal shear stress at the station, and the predicted in
+    situ shear velocity is :math:`u_{*}^{\rm ERA5}\sqrt{|\boldsymbol{\tau}|}`. The coefficients minimize the mean of
+    :math:`(\delta_{\theta}/\sigma_{\theta})^{2} + (\delta_{u}/\sigma_{u})^{2}` over the time steps, where
+    :math:`\delta_{\theta}` is the angle between the predicted and measured directions and :math:`\delta_{u}` the difference
+    between the predicted and measured shear velocities relative to the ERA5 one.
+
+    Parameters
+    ----------
+    Orientation_era : np.array
+        Time series of the ERA5 wind direction, in degree, in the trigonometric convention.
+    U_star_era : np.array
+        Time series of the ERA5 shear velocity [m/s].
+    Orientation_insitu : np.array
+        Time series of the in situ wind direction, in degree, in the trigonometric convention.
+    U_star_insitu : np.array
+        Time series of the in situ shear velocity [m/s].
+    alpha : scalar
+        Direction perpendicular to the dune crests with respect to the :math:`x`-axis, i.e. the dune orientation minus 90
+        degrees, as in :func:`Cisaillement_basal_rotated_wind <python_codes.linear_theory.Cisaillement_basal_rotated_wind>` (in degree).
+    AR : scalar
+        dune aspect ratio, :math:`k\xi`.
+    x : scalar, optional
+        Position of the station along :math:`x`, non-dimensional (:math:`kx`), the dune crest being at the origin (the default is 0).
+        At the crest, the shear stress does not depend on :math:`\mathcal{B}_{0}`, which is then left to `B0_init`.
+    y : scalar, optional
+        Position of the station along :math:`y`, non-dimensional (:math:`ky`) (the default is 0).
+    groups : np.array, None, optional
+        Label of the group (e.g. time bin) of each time step, the coefficients being fitted separately for each group. If
+        None (default), the coefficients are fitted on the whole series.
+    sigma_theta : float, optional
+        Weight of the direction misfit, as a typical direction uncertainty (the default is 10) [deg].
+    sigma_u : float, optional
+        Weight of the shear velocity misfit, as a typical relative uncertainty (the default is 0.1).
+    A0_init : float, optional
+        Initial value of :math:`\mathcal{A}_{0}` (the default is 3.5).
+    B0_init : float, optional
+        Initial value of :math:`\mathcal{B}_{0}` (the default is 1.5).
+    **kwargs :
+        `kwargs` are passed to :func:`scipy.optimize.minimize` (the default method is 'L-BFGS-B').
+
+    Returns
+    -------
+    A0 : float, np.array
+        Fitted in-phase hydrodynamic coefficient, or array of the coefficients of the sorted groups (NaN for a group without
+        valid time step).
+    B0 : float, np.array
+        Fitted in-quadrature hydrodynamic coefficient, same shape as `A0`.
+    result : OptimizeResult
+        Result of the minimization, see :func:`scipy.optimize.minimize`. If `groups` is given, it also contains the
+        sorted group labels (attribute `groups`) and the number of time steps in each group (attribute `counts`).
+
+    """
+    inputs = [np.asarray(x_, dtype=float) for x_ in (Orientation_era, U_star_era, Orientation_insitu, U_star_insitu)]
+    labels = np.zeros(inputs[0].shape, dtype=int) if groups is None else np.asarray(groups)
+    valid = ~np.any([np.isnan(x_) for x_ in inputs], axis=0) & (inputs[1] > 0)
+    theta_era, u_era, theta_insitu, u_insitu = [x_[valid] for x_ in inputs]
+    unique_labels, group = np.unique(labels[valid], return_inverse=True)
+    group = group.ravel()
+    n_groups = unique_labels.size
+    #
+    tau_0, tau_A, tau_B = _basis(theta_era, x, y, alpha, AR)
+    args = (tau_0, tau_A, tau_B, np.radians(theta_insitu), u_insitu/u_era, group, n_groups,
+            np.radians(sigma_theta), sigma_u)
+    x0 = np.concatenate([np.full(n_groups, A0_init), np.full(n_groups, B0_init)])
+    result = minimize(_misfit, x0, args=args, jac=True, **{'method': 'L-BFGS-B', **kwargs})
+    #
+    counts = np.bincount(group, minlength=n_groups)
+    A0, B0 = result.x[:n_groups], result.x[n_groups:]
+    if groups is None:
+        return A0[0], B0[0], result
+    # groups without valid time steps are reported, but not constrained by the fit
+    all_labels = np.unique(labels)
+    A0_all, B0_all = np.full(all_labels.shape, np.nan), np.full(all_labels.shape, np.nan)
+    found = np.isin(all_labels, unique_labels)
+    A0_all[found], B0_all[found] = A0, B0
+    result.groups, result.counts = all_labels, np.zeros(all_labels.shape, dtype=int)
+    result.counts[found] = counts
+    return A0_all, B0_all, result
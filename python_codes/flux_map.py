@@ -0,0 +1,120 @@
+r"""
+Maps of sediment fluxes over a digital elevation model.
+
+The basal shear stress perturbed by the topography is given by the linear theory (see
+:func:`Cisaillement_basal_fft <python_codes.linear_theory.Cisaillement_basal_fft>`), and the local sediment flux by a
+transport law applied to the local Shields number, in the direction of the local shear stress. Instead of calculating a field
+per time step, the time steps are binned by wind direction and shear velocity: the shear stress field is calculated once per
+direction bin, the flux field once per (direction, velocity) bin, and the fluxes are accumulated with the number of time steps
+of each bin in each period (e.g. month). The memory used, apart from the output, does not depend on the length of the time series.
+
+Examples
+--------
+>>> import numpy as np
+>>> from python_codes.meteo_analysis import quadratic_transport_law
+>>> topo = 20*np.random.random((256, 256))
+>>> orientation, shear_velocity = 360*np.random.random((5000, )), 0.4*np.random.random((5000, ))
+>>> month = np.random.randint(0, 12, 5000)
+>>> periods, q = flux_maps(topo, 50, orientation, shear_velocity, lambda theta: quadratic_transport_law(theta, 0.005, 8), 3.5, 1.5, periods=month)
+
+"""
+
+import numpy as np
+from python_codes.linear_theory import Cisaillement_basal_fft
+
+
+def flux_maps(topo, dx, orientation, shear_velocity, transport_law, A0, B0, periods=None, grain_diameter=180e-6,
+              rho_g=2.65e3, rho_f=1, g=9.81, direction_bin=5, n_speed_bins=32, direction_chunk=8, dy=None, out=None):
+    r"""Calculate the average sediment flux over a topography, for each period of a time series of wind.
+
+    Parameters
+    ----------
+    topo : np.array
+        Detrended topography, shape (ny, nx), see :func:`Cisaillement_basal_fft <python_codes.linear_theory.Cisaillement_basal_fft>` [m].
+    dx : float
+        Grid spacing along :math:`x` [m].
+    orientation : np.array
+        Time series of the wind direction, in degree, in the trigonometric convention (with respect to the :math:`x`-axis).
+    shear_velocity : np.array
+        Time series of the shear velocity over a flat bed [m/s].
+    transport_law : function
+        Function returning the non-dimensional saturated flux :math:`q_{\rm sat}/Q` for an array of Shields numbers, e.g.
+        built from :func:`quadratic_transport_law <python_codes.meteo_analysis.quadratic_transport_law>` or
+        :func:`quartic_transport_law <python_codes.meteo_analysis.quartic_transport_law>`.
+    A0 : scalar, function
+        In-phase hydrodynamic coefficient, see :func:`Cisaillement_basal_fft <python_codes.linear_theory.Cisaillement_basal_fft>`.
+    B0 : scalar, function
+        In-quadrature hydrodynamic coefficient, see :func:`Cisaillement_basal_fft <python_codes.linear_theory.Cisaillement_basal_fft>`.
+    periods : np.array, None, optional
+        Label of the period of each time step (e.g. year*12 + month). If None (default), all time steps belong to the same period.
+    grain_diameter : float, optional
+        Grain diameter (the default is 180e-6) [m].
+    rho_g : float, optional
+        Grain density (the default is 2.65e3) [kg/m3].
+    rho_f : float, optional
+        Fluid density (the default is 1) [kg/m3].
+    g : float, optional
+        Gravitational acceleration (the default is 9.81) [m/s2].
+    direction_bin : float, optional
+        Width of the direction bins, centered on the multiples of `direction_bin` (the default is 5) [deg].
+    n_speed_bins : int, optional
+        Number of bins of shear velocity, regularly spaced between 0 and the maximum shear velocity (the default is 32).
+        The flux of a bin is calculated with the mean square shear velocity of its time steps.
+    direction_chunk : int, optional
+        Number of direction bins whose shear stress fields are calculated together, sharing the Fourier transform of the
+        topography (the default is 8).
+    dy : float, None, optional
+        Grid spacing along :math:`y`. If None (default), equal to `dx` [m].
+    out : np.array, optional
+        Array of shape (number of periods, 2, ny, nx) where the result is written, for instance a :class:`numpy.memmap`.
+
+    Returns
+    -------
+    periods : np.array
+        Sorted labels of the periods.
+    q : np.array
+        Average sediment flux vector (:math:`x` and :math:`y` components) over each period, shape (number of periods, 2, ny, nx).
+        Time steps with NaN values are ignored, and periods without any valid time step are filled with NaN [m2/s].
+
+    """
+    orientation, shear_velocity = np.asarray(orientation, dtype=float), np.asarray(shear_velocity, dtype=float)
+    periods = np.zeros(orientation.shape, dtype=int) if periods is None else np.asarray(periods)
+    valid = ~(np.isnan(orientation) | np.isnan(shear_velocity))
+    labels, period_index = np.unique(periods, return_inverse=True)
+    period_index = period_index.ravel()[valid.ravel()]
+    #
+    # binning of the time steps
+    n_directions = int(round(360/direction_bin))
+    direction_index = np.floor((orientation[valid] % 360)/direction_bin + 0.5).astype(int) % n_directions
+    speed_edges = np.linspace(0, shear_velocity[valid].max(initial=0), n_speed_bins + 1)
+    speed_index = np.clip(np.digitize(shear_velocity[valid], speed_edges) - 1, 0, n_speed_bins - 1)
+    counts = np.zeros((labels.size, n_directions, n_speed_bins))
+    np.add.at(counts, (period_index, direction_index, speed_index), 1)
+    square_speed = np.zeros((n_directions, n_speed_bins))
+    np.add.at(square_speed, (direction_index, speed_index), shear_velocity[valid]**2)
+    square_speed /= np.maximum(counts.sum(axis=0), 1)
+    #
+    Q = np.sqrt((rho_g - rho_f)*g*grain_diameter/rho_f)*grain_diameter  # characteristic flux [m2/s]
+    shields_scale = rho_f/((rho_g - rho_f)*g*grain_diameter)
+    q = np.zeros((labels.size, 2) + topo.shape) if out is None else out
+    if out is not None:
+        q[...] = 0
+    directions = np.flatnonzero(counts.sum(axis=(0, 2)))
+    for start in range(0, directions.size, direction_chunk):
+        chunk = directions[start:start + direction_chunk]
+        Taux, Tauy = Cisaillement_basal_fft(topo, dx, chunk*direction_bin, A0, B0, dy=dy)
+        for taux, tauy, d in zip(Taux, Tauy, chunk):
+            tau = np.hypot(taux, tauy)
+            ex, ey = taux/tau, tauy/tau
+            for s in np.flatnonzero(counts[:, d, :].sum(axis=0)):
+                flux = Q*transport_law(shields_scale*square_speed[d, s]*tau)
+                if not flux.any():  # below the transport threshold everywhere
+                    continue
+                qx, qy = flux*ex, flux*ey
+                weights = counts[:, d, s]
+                for m in np.flatnonzero(weights):
+                    q[m, 0] += weights[m]*qx
+                    q[m, 1] += weights[m]*qy
+    with np.errstate(invalid='ignore'):  # periods without valid time steps
+        q /= counts.sum(axis=(1, 2))[:, None, None, None]
+    return labels, q
@@ -0,0 +1,169 @@
+r"""
+Precomputed lookup table of the hydrodynamic coefficients over the regime diagram.
+
+The coefficients :math:`(\mathcal{A}_{0}, \mathcal{B}_{0})` predicted by the linear theory of
+:mod:`python_codes.linear_theory` are computed once on a log-spaced grid of the non-dimensional numbers
+:math:`(kH, \mathcal{F}, kL_{B}, kz_{0})`, stored on disk, and then interpolated. During the construction,
+the exact solution is also computed at the center of every grid cell, which gives an estimate of the interpolation
+error returned with each query.
+
+Examples
+--------
+>>> import numpy as np
+>>> table = build_table(np.logspace(-1.5, 1, 20), np.logspace(-2, 2.5, 20), np.logspace(-2, 1, 20), np.array([1e-4, 1e-3]))
+>>> save_table('hydro_coeff_table.npz', table)
+>>> table = load_table('hydro_coeff_table.npz')
+>>> A, B, err_A, err_B = query_table(table, 0.5, 1.2, 0.3, 5e-4)
+
+"""
+
+import numpy as np
+from scipy.interpolate import RegularGridInterpolator
+from python_codes.linear_theory import solve_many
+
+#: Names of the table axes, in order.
+AXES = ('kH', 'Froude', 'kLB', 'kz0')
+
+
+def _solve_on_grid(axes, max_z_ratio, Kappa, **kwargs):
+    kH, Froude, kLB, kz0 = np.meshgrid(*axes, indexing='ij')
+    return solve_many(kH, kz0, kLB, Froude, max_z_ratio*kH, Kappa=Kappa, **kwargs)
+
+
+def _interpolators(table, method):
+    log_axes = tuple(np.log10(table[ax]) for ax in AXES)
+    return [RegularGridInterpolator(log_axes, table[key], method=method, bounds_error=False, fill_value=np.nan)
+            for key in ('A', 'B')]
+
+
+def build_table(kH, Froude, kLB, kz0, max_z_ratio=0.9999, Kappa=0.4, method='linear', **kwargs):
+    r"""Compute the hydrodynamic coefficients on a grid of non-dimensional numbers.
+
+    Parameters
+    ----------
+    kH : np.array
+        At least two increasing, log-spaced values of the non dimensional boundary layer height :math:`k H`.
+    Froude : np.array
+        At least two increasing, log-spaced values of the Froude number.
+    kLB : np.array
+        At least two increasing, log-spaced values of the non dimensional stratification length :math:`k L_{B}`.
+    kz0 : np.array
+        At least two increasing, log-spaced values of the non dimensional hydrodynamic roughness :math:`k z_{0}`.
+    max_z_ratio : float, optional
+        The boundary conditions are applied at `max_z_ratio` times :math:`k H` (the default is 0.9999).
+    Kappa : float, optional
+        Von Karmàn constant (the default is 0.4).
+    method : str, optional
+        Interpolation method used to estimate the interpolation error, see :func:`query_table` (the default is 'linear').
+    **kwargs :
+        `kwargs` are passed to :func:`solve_many <python_codes.linear_theory.solve_many>`.
+
+    Returns
+    -------
+    dict
+        The table, with the keys:
+            - 'kH', 'Froude', 'kLB', 'kz0': the grid axes.
+            - 'A', 'B': the hydrodynamic coefficients on the grid.
+            - 'err_A', 'err_B': the interpolation errors at the cell centers, one value per grid cell.
+            - 'max_z_ratio', 'Kappa', 'method': the parameters used to build the table.
+
+    """
+    axes = [np.asarray(ax, dtype=float) for ax in (kH, Froude, kLB, kz0)]
+    table = {name: ax for name, ax in zip(AXES, axes)}
+    table['A'], table['B'] = _solve_on_grid(axes, max_z_ratio, Kappa, **kwargs)
+    table.update(max_z_ratio=max_z_ratio, Kappa=Kappa, method=method)
+    #
+    # exact solution at the cell centers, where the interpolation error is expected to be the largest
+    centers = [np.sqrt(ax[1:]*ax[:-1]) for ax in axes]
+    A_exact, B_exact = _solve_on_grid(centers, max_z_ratio, Kappa, **kwargs)
+    points = np.stack(np.meshgrid(*[np.log10(c) for c in centers], indexing='ij'), axis=-1)
+    interp_A, interp_B = _interpolators(table, method)
+    table['err_A'] = np.abs(interp_A(points) - A_exact)
+    table['err_B'] = np.abs(interp_B(points) - B_exact)
+    return table
+
+
+def save_table(path, table):
+    """Save a table built by :func:`build_table` in a compressed `.npz` file.
+
+    Parameters
+    ----------
+    path : str
+        Path of the output file.
+    table : dict
+        Table built by :func:`build_table`.
+
+    """
+    np.savez_compressed(path, **table)
+
+
+def load_table(path):
+    """Load a table saved by :func:`save_table`.
+
+    Parameters
+    ----------
+    path : str
+        Path of the table file.
+
+    Returns
+    -------
+    dict
+        The table, see :func:`build_table`.
+
+    """
+    with np.load(path) as data:
+        table = {key: data[key] for key in data.files}
+    for key in ('max_z_ratio', 'Kappa'):
+        table[key] = float(table[key])
+    table['method'] = str(table['method'])
+    return table
+
+
+def query_table(table, kH, Froude, kLB, kz0, method=None):
+    r"""Interpolate the hydrodynamic coefficients from a precomputed table.
+
+    Parameters
+    ----------
+    table : dict
+        Table built by :func:`build_table` or loaded by :func:`load_table`.
+    kH : scalar, np.array
+        Non dimensional boundary layer height :math:`k H`.
+    Froude : scalar, np.array
+        Froude number.
+    kLB : scalar, np.array
+        Non dimensional stratification length :math:`k L_{B}`.
+    kz0 : scalar, np.array
+        Non dimensional hydrodynamic roughness :math:`k z_{0}`.
+    method : str, optional
+        Interpolation method in the log-space of the non-dimensional numbers, any method accepted by
+        :class:`scipy.interpolate.RegularGridInterpolator` ('linear', 'cubic', 'pchip', ...). If None (default),
+        the method used to build the table, for which the error estimate is computed.
+
+    Returns
+    -------
+    A : np.array
+        Interpolated in-phase hydrodynamic coefficient, NaN outside of the table.
+    B : np.array
+        Interpolated in-quadrature hydrodynamic coefficient, NaN outside of the table.
+    err_A : np.array
+        Estimate of the interpolation error on `A`, i.e. the error against the exact solver at the center of the grid cell containing the query point.
+    err_B : np.array
+        Estimate of the interpolation error on `B`.
+
+    """
+    method = table['method'] if method is None else method
+    inputs = np.broadcast_arrays(*[np.log10(np.asarray(x, dtype=float)) for x in (kH, Froude, kLB, kz0)])
+    points = np.stack(inputs, axis=-1)
+    interp_A, interp_B = _interpolators(table, method)
+    #
+    # index of the grid cell containing each point
+    inside = ~np.isnan(points).any(axis=-1)
+    cells = []
+    for i, name in enumerate(AXES):
+        log_ax = np.log10(table[name])
+        inside &= (points[..., i] >= log_ax[0]) & (points[..., i] <= log_ax[-1])
+        cells.append(np.clip(np.searchsorted(log_ax, np.nan_to_num(points[..., i]), side='right') - 1, 0, table['err_A'].shape[i] - 1))
+    err_A = np.where(inside, table['err_A'][tuple(cells)], np.nan)
+    err_B = np.where(inside, table['err_B'][tuple(cells)], np.nan)
+    shape = inside.shape
+    return interp_A(points).reshape(shape), interp_B(points).reshape(shape), err_A, err_B
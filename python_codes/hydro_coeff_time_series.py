@@ -0,0 +1,119 @@
+r"""
+Parallel computation of time series of hydrodynamic coefficients.
+
+The time steps are split into chunks that are solved with :func:`solve_many <python_codes.linear_theory.solve_many>`
+in a pool of processes. Every finished chunk is immediately written to an on-disk store (a directory containing one
+`.npy` file per chunk, in a sub-directory named after the digest of the inputs and solver settings), so that an
+interrupted computation resumes from the completed chunks.
+
+Examples
+--------
+>>> import numpy as np
+>>> kH = np.random.random((2000,))*3
+>>> A, B = compute_hydro_coeffs(kH, 1e-4, 0.5, 0.8, 0.9999*kH, 'hydro_coeffs_store', chunk_size=100)
+
+"""
+
+import os
+import time
+import hashlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from python_codes.linear_theory import solve_many
+
+
+def _chunk_path(store, i):
+    return os.path.join(store, 'chunk_{:05d}.npy'.format(i))
+
+
+def _save_atomic(path, array):
+    # writing first to a temporary file, so that a chunk file is either complete or absent
+    tmp = path + '.tmp.npy'
+    np.save(tmp, array)
+    os.replace(tmp, path)
+
+
+def _check_store(store, parameters, chunk_size, Kappa, kwargs):
+    r"""Create the store of the computation, or check that an existing one has the same chunk size, and return its path."""
+    settings = repr((float(Kappa), sorted(kwargs.items()))).encode()
+    digest = hashlib.sha1(settings + np.ascontiguousarray(parameters).tobytes()).hexdigest()
+    store = os.path.join(store, digest[:16])
+    path_meta = os.path.join(store, 'metadata.npy')
+    os.makedirs(store, exist_ok=True)
+    if os.path.isfile(path_meta):
+        meta = np.load(path_meta, allow_pickle=True).item()
+        if meta['chunk_size'] != chunk_size:
+            raise ValueError('The store {} was created with a chunk size of {:d}.'.format(store, meta['chunk_size']))
+    else:
+        _save_atomic(path_meta, np.array({'digest': digest, 'chunk_size': chunk_size, 'size': parameters.shape[1]}))
+    return store
+
+
+def _solve_chunk(i, parameters, Kappa, kwargs):
+    return i, np.array(solve_many(*parameters, Kappa=Kappa, **kwargs))
+
+
+def compute_hydro_coeffs(eta_H, eta_0, eta_B, Fr, max_z, store, chunk_size=500, n_workers=None, Kappa=0.4, verbose=True, **kwargs):
+    r"""Calculate time series of the hydrodynamic coefficients in parallel, with checkpoints.
+
+    Parameters
+    ----------
+    eta_H : scalar, np.array
+        Non dimensional boundary layer height :math:`k H`.
+    eta_0 : scalar, np.array
+        Non dimensional hydrodyamic roughness :math:`k z_{0}`.
+    eta_B :  scalar, np.array
+        Non dimensional stratification length :math:`k L_{B}`.
+    Fr : scalar, np.array
+        Froude number
+    max_z : scalar, np.array
+        Maximum vertical position where the system is solved, see :func:`calculate_solution <python_codes.linear_theory.calculate_solution>`.
+    store : str
+        Directory where the finished chunks are written, in a sub-directory specific to the inputs, `Kappa` and `kwargs`.
+        If it already contains chunks of the same computation, only the missing ones are calculated.
+    chunk_size : int, optional
+        Number of time steps per chunk (the default is 500).
+    n_workers : int, None, optional
+        Number of processes. If None (default), the number of processors of the machine.
+    Kappa : float, optional
+        Von Karmàn constant (the default is 0.4).
+    verbose : bool, optional
+        If True (default), print the progress and the throughput after each chunk.
+    **kwargs :
+        `kwargs` are passed to :func:`solve_many <python_codes.linear_theory.solve_many>`.
+
+    Returns
+    -------
+    A : np.array
+        In-phase hydrodynamic coefficient, with the broadcasted shape of the inputs.
+    B : np.array
+        In-quadrature hydrodynamic coefficient, with the broadcasted shape of the inputs.
+
+    """
+    inputs = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in (eta_H, eta_0, eta_B, Fr, max_z)])
+    shape = inputs[0].shape
+    parameters = np.array([x.ravel() for x in inputs])
+    if parameters.shape[1] == 0:
+        return np.empty(shape), np.empty(shape)
+    store = _check_store(store, parameters, chunk_size, Kappa, kwargs)
+    #
+    n_chunks = int(np.ceil(parameters.shape[1]/chunk_size))
+    todo = [i for i in range(n_chunks) if not os.path.isfile(_chunk_path(store, i))]
+    if verbose:
+        print('{:d}/{:d} chunks already computed'.format(n_chunks - len(todo), n_chunks))
+    #
+    start = time.perf_counter()
+    n_solved = 0
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = [executor.submit(_solve_chunk, i, parameters[:, i*chunk_size:(i + 1)*chunk_size], Kappa, kwargs)
+                   for i in todo]
+        for n_done, future in enumerate(as_completed(futures), start=1):
+            i, coeffs = future.result()
+            _save_atomic(_chunk_path(store, i), coeffs)
+            n_solved += coeffs.shape[1]
+            if verbose:
+                elapsed = time.perf_counter() - start
+                print('chunk {:d} done -- {:d}/{:d} chunks, {:.1f} time steps/s'.format(i, n_done, len(todo), n_solved/elapsed))
+    #
+    coeffs = np.concatenate([np.load(_chunk_path(store, i)) for i in range(n_chunks)], axis=1)
+    return coeffs[0].reshape(shape), coeffs[1].reshape(shape)
@@ -13,11 +13,22 @@ References
 
 """
 
+import math
 import numpy as np
+from functools import lru_cache
+from scipy import fft
 from scipy.integrate import solve_ivp
+from scipy.linalg import lu_factor, lu_solve
+from scipy.optimize import OptimizeResult
+from scipy.spatial import cKDTree
 from python_codes.general import cosd, sind
 from python_codes.meteo_analysis import mu
 
+try:
+    from numba import njit
+except ImportError:  # numba is optional, the pure python kernel is used instead
+    njit = None
+
 # %%
 # Geometrical model
 # -----------------
@@ -186,6 +197,156 @@ def Cisaillement_basal_rotated_wind(x, y, alpha, A0, B0, AR, theta):
     return cosd(theta)*Taux - sind(theta)*Tauy,  Taux*sind(theta) + Tauy*cosd(theta)
 
 
+def Cisaillement_basal_rotated_wind_batch(x, y, alpha, A0, B0, AR, theta, dtype=np.float64, out=None):
+    r"""Calculate the basal shear stress of :func:`Cisaillement_basal_rotated_wind` for many wind directions and
+    coefficient sets at once.
+
+    The phase of the topography in the rotated frame only differs from :math:`\cos\alpha\,x + \sin\alpha\,y` by its sign,
+    so that its cosine and sine are calculated once for all parameter sets. Each shear stress component is then an affine
+    combination of these two arrays.
+
+    Parameters
+    ----------
+    x : array
+        Streamwise coordinate, non-dimensional (:math:`kx`).
+    y : array
+        Spanwise coordinate, non-dimensional (:math:`ky`).
+    alpha : scalar
+        Dune orientation with respect to the perpendicular to the flow direction (in degree).
+    A0 : array, scalar
+        value of the in-phase hydrodynamic coefficient for :math:`\alpha = 0`.
+    B0 : array, scalar
+        value of the in-quadrature hydrodynamic coefficient for :math:`\alpha = 0`.
+    AR : array, scalar
+        dune aspect ratio, :math:`k\xi`.
+    theta : array, scalar
+        Wind direction, in degree, in the trigonometric convention.
+    dtype : data-type, optional
+        Data type of the output, e.g. `np.float32` to halve the memory (the default is `np.float64`). The phase is always
+        calculated in double precision.
+    out : np.array, optional
+        Array of shape (2, n) + `x.shape` where the result is written, `n` being the broadcasted size of `A0`, `B0`, `AR` and `theta`.
+
+    Returns
+    -------
+    Taux : np.array
+        Streamwise component of the non-dimensional shear stress, shape (n, ) + `x.shape`.
+    Tauy : np.array
+        Spanwise component of the non-dimensional shear stress, shape (n, ) + `x.shape`.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> X, Y = np.meshgrid(np.linspace(-12, 12, 1000), np.linspace(-3, 3, 1000))
+    >>> Taux, Tauy = Cisaillement_basal_rotated_wind_batch(X, Y, 30, 3.5, 1.5, 0.1, np.arange(0, 360, 2), dtype=np.float32)
+
+    """
+    x, y = np.broadcast_arrays(x, y)
+    A0, B0, AR, theta = [np.ravel(p) for p in np.broadcast_arrays(A0, B0, AR, theta)]
+    if out is None:
+        out = np.empty((2, theta.size) + x.shape, dtype=dtype)
+    elif out.shape != (2, theta.size) + x.shape:
+        raise ValueError('out must have the shape {}.'.format((2, theta.size) + x.shape))
+    phase = cosd(alpha)*x + sind(alpha)*y
+    C, S = np.cos(phase).astype(out.dtype), np.sin(phase).astype(out.dtype)
+    del phase
+    #
+    alpha_rot = ((alpha - theta + 90) % 180) - 90
+    # the phase in the rotated frame is the phase above with the sign (-1)**m, where alpha_rot + theta - alpha = -180 m
+    sign = 1 - 2*(np.round((alpha - alpha_rot - theta)/180) % 2)
+    cx, cy = (Ax(alpha_rot, A0) + 1j*Bx(alpha_rot, B0))*AR, (Ay(alpha_rot, A0) + 1j*By(alpha_rot, B0))*AR
+    # Re(c exp(+-i phase)) = Re(c) cos(phase) -+ Im(c) sin(phase), before rotation back to the original frame
+    cos_t, sin_t = cosd(theta), sind(theta)
+    coeffs_x = cos_t*cx - sin_t*cy
+    coeffs_y = sin_t*cx + cos_t*cy
+    for i in range(theta.size):
+        for tau, offset, c in zip(out[:, i], (cos_t[i], sin_t[i]), (coeffs_x[i], coeffs_y[i])):
+            np.multiply(C, c.real, out=tau, casting='unsafe')
+            tau -= (sign[i]*c.imag)*S
+            tau += offset
+    return out[0], out[1]
+
+
+def Cisaillement_basal_fft(topo, dx, theta, A0, B0, dy=None):
+    r"""Calculate the basal shear stress over an arbitrary topography, for one or several wind directions.
+
+    The topography is decomposed in Fourier modes, and the geometrical model is applied to each of them: for a mode of
+    wavevector :math:`\boldsymbol{k}`, whose components along and across the wind are :math:`k_{\parallel}` and :math:`k_{\perp}`,
+
+    .. math::
+
+        \hat{\tau}_{\parallel} = \frac{k_{\parallel}^{2}}{|\boldsymbol{k}|}(\mathcal{A}_{0} + i\,{\rm sgn}(k_{\parallel})\mathcal{B}_{0})\hat{Z}, \quad
+        \hat{\tau}_{\perp} = \frac{k_{\parallel}k_{\perp}}{2|\boldsymbol{k}|}(\mathcal{A}_{0} + i\,{\rm sgn}(k_{\parallel})\mathcal{B}_{0})\hat{Z},
+
+    which reduces to :func:`Cisaillement_basal_rotated_wind` for a sinusoidal topography. The Fourier transform of the
+    topography is computed once for all wind directions, and both components of the shear stress are obtained from a
+    single inverse transform per direction. This requires the response of each mode to be the complex conjugate of that
+    of the opposite mode, which does not hold for the Nyquist modes of a grid of even size (their wavevector has no
+    opposite on the grid, so that the sign of :math:`k_{\parallel}` is undefined): these unresolved modes are discarded.
+    The topography is assumed periodic, so that it should be detrended beforehand (as `Data_DEM[station]['topo']`).
+
+    Parameters
+    ----------
+    topo : np.array
+        Topography, shape (ny, nx), `topo[i, j]` being the elevation at :math:`x = j\,dx`, :math:`y = i\,dy` [m].
+    dx : float
+        Grid spacing along :math:`x` [m].
+    theta : scalar, np.array
+        Wind direction(s), in degree, in the trigonometric convention (with respect to the :math:`x`-axis).
+    A0 : scalar, function
+        In-phase hydrodynamic coefficient for :math:`\alpha = 0`, or function returning it for an array of wavenumbers
+        :math:`|\boldsymbol{k}|` [1/m].
+    B0 : scalar, function
+        In-quadrature hydrodynamic coefficient for :math:`\alpha = 0`, or function returning it for an array of wavenumbers
+        :math:`|\boldsymbol{k}|` [1/m].
+    dy : float, None, optional
+        Grid spacing along :math:`y`. If None (default), equal to `dx` [m].
+
+    Returns
+    -------
+    Taux : np.array
+        :math:`x`-component of the non-dimensional shear stress, shape (ny, nx), or (`theta.size`, ny, nx) if `theta` is an array.
+    Tauy : np.array
+        :math:`y`-component of the non-dimensional shear stress, same shape as `Taux`.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> Data_DEM = np.load('static/data/processed_data/Data_DEM.npy', allow_pickle=True).item()
+    >>> topo, step = Data_DEM['South_Namib_Station']['topo'], Data_DEM['South_Namib_Station']['km_step']*1e3
+    >>> Taux, Tauy = Cisaillement_basal_fft(topo, step, np.arange(0, 360, 10), 3.5, 1.5)
+
+    """
+    dy = dx if dy is None else dy
+    thetas = np.atleast_1d(theta)
+    Z_hat = fft.fft2(topo)
+    if topo.shape[0] % 2 == 0:
+        Z_hat[topo.shape[0]//2, :] = 0
+    if topo.shape[1] % 2 == 0:
+        Z_hat[:, topo.shape[1]//2] = 0
+    kx = 2*np.pi*fft.fftfreq(topo.shape[1], d=dx)[None, :]
+    ky = 2*np.pi*fft.fftfreq(topo.shape[0], d=dy)[:, None]
+    k = np.hypot(kx, ky)
+    k[0, 0] = 1  # mean elevation, without effect on the shear stress
+    A = A0(k) if callable(A0) else A0
+    B = B0(k) if callable(B0) else B0
+    #
+    Taux = np.empty(thetas.shape + topo.shape)
+    Tauy = np.empty(thetas.shape + topo.shape)
+    for i, th in enumerate(thetas):
+        k_para = kx*cosd(th) + ky*sind(th)
+        k_perp = ky*cosd(th) - kx*sind(th)
+        response = (A + 1j*np.sign(k_para)*B)*Z_hat*k_para/k
+        # both components being real, they are the real and imaginary parts of the inverse transform of
+        # exp(i theta)(tau_para + i tau_perp)
+        tau = fft.ifft2(np.exp(1j*np.radians(th))*response*(k_para + 0.5j*k_perp))
+        Taux[i] = cosd(th) + tau.real
+        Tauy[i] = sind(th) + tau.imag
+    if np.ndim(theta) == 0:
+        return Taux[0], Tauy[0]
+    return Taux, Tauy
+
+
 # %%
 # Hydrodynamic coefficients approximation Fourriere 2011
 # -----------------
@@ -318,9 +479,80 @@ def _S_delta(eta, eta_H, eta_0, Kappa):
     return np.array([-eta*_mu_prime(eta, eta_0, Kappa)/(2*eta_H**2*tp), 0, 0, 0])
 
 
+def _dP_deta_H(eta, eta_H, eta_0, Kappa):
+    r"""Derivative of the :math:`P` matrix with respect to :math:`\eta_{H}`.
+
+    Parameters
+    ----------
+    eta : scalar, np.array
+        Non dimensional height :math:`k z`.
+    eta_H : scalar, np.array
+        Non dimensional boundary layer height :math:`k H`.
+    eta_0 : scalar, np.array
+        Non dimensional hydrodyamic roughness :math:`k z_{0}`.
+    Kappa : float
+        Von Karmàn constant.
+
+    Returns
+    -------
+    np.array
+        The derivative, of shape the shape of `eta` + (4, 4).
+
+    """
+    eta = np.asarray(eta, dtype=float)
+    tp = (1 - eta/eta_H)
+    dtp = eta/eta_H**2
+    mup = _mu_prime(eta, eta_0, Kappa)
+    dP = np.zeros(eta.shape + (4, 4), dtype=complex)
+    dP[..., 0, 2] = -mup*dtp/(2*tp**2)
+    dP[..., 2, 0] = 4*dtp/mup
+    return dP
+
+
+def _dS_deta_H(eta, eta_H, eta_0, Kappa):
+    # derivative of the first (and only non-zero) component of the S vector with respect to eta_H
+    return _mu_prime(eta, eta_0, Kappa)/(2*eta_H**2)
+
+
 def _q1(eta_B):
     return np.piecewise(eta_B + 0j, [eta_B > 1, eta_B <= 1],
-                        [lambda x: -np.sqrt(1 - 1/x**2), lambda x: 1j*np.sqrt(1/eta_B**2 - 1)])
+                        [lambda x: -np.sqrt(1 - 1/x**2), lambda x: 1j*np.sqrt(1/x**2 - 1)])
+
+
+def _dq1(eta_B):
+    # derivative of _q1 with respect to eta_B, singular at eta_B = 1
+    return np.piecewise(eta_B + 0j, [eta_B > 1, eta_B <= 1],
+                        [lambda x: -1/(x**3*np.sqrt(1 - 1/x**2)), lambda x: -1j/(x**3*np.sqrt(1/x**2 - 1))])
+
+
+def _boundary_vector(max_z, eta_H, eta_0, eta_B, Fr, Kappa):
+    r"""Right-hand side of the boundary conditions applied at `max_z`.
+
+    Parameters
+    ----------
+    max_z : scalar, np.array
+        Vertical position where the boundary conditions are applied.
+    eta_H : scalar, np.array
+        Non dimensional boundary layer height :math:`k H`.
+    eta_0 : scalar, np.array
+        Non dimensional hydrodyamic roughness :math:`k z_{0}`.
+    eta_B :  scalar, np.array
+        Non dimensional stratification length :math:`k L_{B}`.
+    Fr : scalar, np.array
+        Froude number
+    Kappa : float
+        Von Karmàn constant.
+
+    Returns
+    -------
+    np.array
+        Array of shape (3, ) + the broadcasted shape of the inputs.
+
+    """
+    W = 1j*mu(max_z, eta_0, Kappa)  # W(eta_H) = i*mu(eta_H)*delta
+    St = 1/max_z  # St(eta_H) = delta/eta_H
+    Sn = mu(max_z, eta_0, Kappa)**2*(_q1(eta_B) + 1/(eta_H*Fr**2))  # Sn(eta_H) = mu(eta_H)**2*(q1 - 1/(eta_H*Fr**2))*delta
+    return np.array(np.broadcast_arrays(W, St, Sn), dtype=complex)
 
 
 def _func(eta, X, eta_H, eta_0, Kappa):
@@ -347,27 +579,360 @@ def _func_delta(eta, X, eta_H, eta_0, Kappa):
         return _P(eta, eta_H, eta_0, Kappa).dot(X) + np.transpose(np.tile(_S_delta(eta, eta_H, eta_0, Kappa), (X.shape[1], 1)))
 
 
-def _solve_system(eta_0, eta_H, Kappa=0.4, max_z=None, method='DOP853', dense_output=True, **kwargs):
+def _rhs_kernel(eta, X, eta_H, eta_0, Kappa, source, n_source, out):
+    r"""Right-hand side :math:`P X + S` written element-wise into `out`, without building :math:`P`.
+
+    Parameters
+    ----------
+    eta : float
+        Non dimensional height :math:`k z`.
+    X : np.array
+        State, shape (4, m), each column being a solution.
+    eta_H : float
+        Non dimensional boundary layer height :math:`k H`.
+    eta_0 : float
+        Non dimensional hydrodyamic roughness :math:`k z_{0}`.
+    Kappa : float
+        Von Karmàn constant.
+    source : int
+        Source term: 0 for none, 1 for :math:`S`, 2 for :math:`S_{\delta}`.
+    n_source : int
+        The source term is added to the first `n_source` columns only.
+    out : np.array
+        Output array, same shape as `X`.
+
+    Returns
+    -------
+    np.array
+        `out`.
+
+    """
+    tp = 1 - eta/eta_H
+    mup = 1/(Kappa*(eta + eta_0))
+    mu_val = math.log(1 + eta/eta_0)/Kappa
+    p02 = mup/(2*tp)
+    p20 = 1j*mu_val + 4*tp/mup
+    if source == 1:
+        s0 = Kappa*mup**2 - mup/(2*eta_H)
+    elif source == 2:
+        s0 = -eta*mup/(2*eta_H**2*tp)
+    else:
+        s0 = 0.
+    for j in range(X.shape[1]):
+        x0, x1, x2, x3 = X[0, j], X[1, j], X[2, j], X[3, j]
+        out[0, j] = -1j*x1 + p02*x2 + (s0 if j < n_source else 0.)
+        out[1, j] = -1j*x0
+        out[2, j] = p20*x0 + mup*x1 + 1j*x3
+        out[3, j] = -1j*mu_val*x1 + 1j*x2
+    return out
+
+
+_rhs_kernel_compiled = _rhs_kernel if njit is None else njit(cache=True)(_rhs_kernel)
+
+
+def _make_rhs(eta_H, eta_0, Kappa, n_columns=1, source=0, n_source=1, jit=True):
+    r"""Build a right-hand side function for :func:`scipy.integrate.solve_ivp` based on `_rhs_kernel`.
+
+    Parameters
+    ----------
+    eta_H : float
+        Non dimensional boundary layer height :math:`k H`.
+    eta_0 : float
+        Non dimensional hydrodyamic roughness :math:`k z_{0}`.
+    Kappa : float
+        Von Karmàn constant.
+    n_columns : int, optional
+        Number of solutions stored as the columns of the (flattened) state (the default is 1).
+    source : int, optional
+        Source term: 0 for none, 1 for :math:`S`, 2 for :math:`S_{\delta}` (the default is 0).
+    n_source : int, optional
+        The source term is added to the first `n_source` columns only (the default is 1).
+    jit : bool, optional
+        If True (default), use the kernel compiled with numba when it is installed.
+
+    Returns
+    -------
+    function
+        The right-hand side, taking `eta` and the flattened state as arguments.
+
+    """
+    kernel = _rhs_kernel_compiled if jit else _rhs_kernel
+    shape = (4, n_columns)
+    eta_H, eta_0, Kappa = float(eta_H), float(eta_0), float(Kappa)
+
+    def fun(eta, X):
+        # solve_ivp keeps references to previous evaluations, so that the output can not be reused between calls
+        out = np.empty(shape, dtype=complex)
+        kernel(float(eta), X.reshape(shape), eta_H, eta_0, Kappa, source, n_source, out)
+        return out.reshape(X.shape)
+    return fun
+
+
+def _func_augmented(eta, Y, eta_H, eta_0, Kappa):
+    # the columns of Y are the solutions started from the vectors of X0_vec, the first one being the particular solution
+    Y = Y.reshape((4, -1))
+    dY = _P(eta, eta_H, eta_0, Kappa).dot(Y)
+    dY[:, 0] += _S(eta, eta_H, eta_0, Kappa)
+    return dY.ravel()
+
+
+def _column_result(Result, i, n_columns=4):
+    # view of the i-th column of an augmented integration, exposing the same attributes as a solve_ivp output. The
+    # columns beyond the n_columns integrated ones are the solution started from zero, which stays zero.
+    if i < n_columns:
+        y = Result.y[i::n_columns]
+        sol = None if Result.sol is None else (lambda eta: Result.sol(eta)[i::n_columns])
+    else:
+        y = np.zeros((4, Result.t.size), dtype=complex)
+        sol = None if Result.sol is None else (lambda eta: np.zeros((4, ) + np.shape(eta), dtype=complex))
+    return OptimizeResult(t=Result.t, y=y, sol=sol, t_events=Result.t_events, y_events=Result.y_events,
+                          nfev=Result.nfev, njev=Result.njev, nlu=Result.nlu, status=Result.status,
+                          message=Result.message, success=Result.success)
+
+
+def _jac(eta, eta_H, eta_0, Kappa, n_columns=1):
+    # the system is linear, its Jacobian is the P matrix acting on every column of the state
+    P = _P(eta, eta_H, eta_0, Kappa)
+    return P if n_columns == 1 else np.kron(P, np.eye(n_columns))
+
+
+#: Methods of :func:`scipy.integrate.solve_ivp` that use the Jacobian, and which are run on the real and imaginary parts of the state.
+_IMPLICIT_METHODS = ('Radau', 'BDF', 'LSODA')
+
+
+def _complex_result(Result, n):
+    # complex view of a solve_ivp output obtained on the real and imaginary parts of a state of size n
+    sol = None if Result.sol is None else (lambda eta: Result.sol(eta)[:n] + 1j*Result.sol(eta)[n:])
+    return OptimizeResult(t=Result.t, y=Result.y[:n] + 1j*Result.y[n:], sol=sol, t_events=Result.t_events,
+                          y_events=Result.y_events, nfev=Result.nfev, njev=Result.njev, nlu=Result.nlu,
+                          status=Result.status, message=Result.message, success=Result.success)
+
+
+def _integrate(fun, jac, eta_span, X0, method, dense_output, **kwargs):
+    # solve_ivp, with the implicit methods run on the real and imaginary parts of the state with the analytic Jacobian
+    if method not in _IMPLICIT_METHODS:
+        return solve_ivp(fun, eta_span, X0, method=method, dense_output=dense_output, **kwargs)
+    n = X0.size
+
+    def fun_real(eta, y):
+        f = fun(eta, y[:n] + 1j*y[n:])
+        return np.concatenate([f.real, f.imag])
+
+    def jac_real(eta, y):
+        J = jac(eta)
+        return np.block([[J.real, -J.imag], [J.imag, J.real]])
+
+    Result = solve_ivp(fun_real, eta_span, np.concatenate([X0.real, X0.imag]), method=method, jac=jac_real,
+                       dense_output=dense_output, **kwargs)
+    return _complex_result(Result, n)
+
+
+def _singular_series(eta_H, eta_0, Kappa, n_terms):
+    r"""Taylor coefficients of the system written in the vicinity of the top of the boundary layer.
+
+    With :math:`t = 1 - \eta/\eta_{H}`, the system becomes :math:`t\,\textup{d}X/\textup{d}t = M(t)X + F(t)`, where
+    :math:`M = -\eta_{H} t P` and :math:`F = -\eta_{H} t S` are analytic at :math:`t = 0`.
+
+    Parameters
+    ----------
+    eta_H : float
+        Non dimensional boundary layer height :math:`k H`.
+    eta_0 : float
+        Non dimensional hydrodyamic roughness :math:`k z_{0}`.
+    Kappa : float
+        Von Karmàn constant.
+    n_terms : int
+        Number of Taylor coefficients.
+
+    Returns
+    -------
+    M : np.array
+        Taylor coefficients of :math:`M`, shape (n_terms, 4, 4).
+    F : np.array
+        Taylor coefficients of :math:`F`, shape (n_terms, 4).
+
+    """
+    k = np.arange(n_terms)
+    c = eta_H + eta_0
+    r = c/eta_H  # radius of convergence, given by the singularity of the law of the wall at eta = -eta_0
+    mup_k = r**(-k)/(Kappa*c)
+    mup2_k = (k + 1)*r**(-k)/(Kappa*c)**2
+    mu_k = np.concatenate([[np.log(c/eta_0)/Kappa], -r**(-k[1:])/(k[1:]*Kappa)])
+    p20_k = 1j*mu_k + 4*Kappa*np.where(k == 1, c, 0) - 4*Kappa*np.where(k == 2, eta_H, 0)
+    #
+    # coefficients of t*P, regular entries being shifted by one order
+    tP = np.zeros((n_terms, 4, 4), dtype=complex)
+    tP[:, 0, 2] = mup_k/2
+    tP[1, 0, 1] = -1j
+    tP[1, 1, 0] = -1j
+    tP[1:, 2, 0] = p20_k[:-1]
+    tP[1:, 2, 1] = mup_k[:-1]
+    tP[1, 2, 3] = 1j
+    tP[1:, 3, 1] = -1j*mu_k[:-1]
+    tP[1, 3, 2] = 1j
+    F = np.zeros((n_terms, 4), dtype=complex)
+    F[1:, 0] = -eta_H*(Kappa*mup2_k[:-1] - mup_k[:-1]/(2*eta_H))
+    return -eta_H*tP, F
+
+
+def _frobenius_coefficients(M, F, a0, source):
+    r"""Coefficients of the expansion :math:`X = \sum_{k}(a_{k} + b_{k}\ln t)t^{k}` of the solutions close to the top of the boundary layer.
+
+    :math:`M_{0}` being nilpotent, the indicial equation has a single root, and the solutions only involve first powers of
+    :math:`\ln t`. The free coefficients :math:`a_{0}` are the values of the regular components at :math:`\eta = \eta_{H}`.
+
+    Parameters
+    ----------
+    M : np.array
+        Taylor coefficients of :math:`M`, shape (n_terms, 4, 4), see `_singular_series`.
+    F : np.array
+        Taylor coefficients of :math:`F`, shape (n_terms, 4), see `_singular_series`.
+    a0 : np.array
+        Free coefficients, shape (4, m), one column per solution.
+    source : np.array
+        Weight of the source term for each solution, shape (m, ).
+
+    Returns
+    -------
+    a : np.array
+        Shape (n_terms, 4, m).
+    b : np.array
+        Shape (n_terms, 4, m).
+
+    """
+    n_terms = M.shape[0]
+    a = np.zeros((n_terms, ) + a0.shape, dtype=complex)
+    b = np.zeros((n_terms, ) + a0.shape, dtype=complex)
+    a[0] = a0
+    b[0] = M[0] @ a0
+    for k in range(1, n_terms):
+        inv = np.linalg.inv(k*np.eye(4) - M[0])
+        b[k] = inv @ np.einsum('jpq,jqm->pm', M[1:k + 1], b[k - 1::-1])
+        a[k] = inv @ (np.einsum('jpq,jqm->pm', M[1:k + 1], a[k - 1::-1]) + F[k][:, None]*source - b[k])
+    return a, b
+
+
+def _frobenius_eval(a, b, t):
+    # value of the expansion at t > 0, shape (4, m) + t.shape. At t = 0, the logarithmically diverging first component is NaN.
+    t = np.asarray(t, dtype=float)
+    k = np.arange(a.shape[0]).reshape((-1, ) + (1, )*t.ndim)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        powers = t**k
+        log_powers = np.where(t > 0, powers*np.log(t), 0)
+    X = np.einsum('k...,kpm->pm...', powers, a) + np.einsum('k...,kpm->pm...', log_powers, b)
+    X[0] = np.where(t > 0, X[0], np.nan)
+    return X
+
+
+def _expanded_result(Result, a, b, eta_s, eta_H):
+    # solution given by the numerical integration below eta_s, and by the local expansion above
+    def sol(eta):
+        eta = np.asarray(eta, dtype=float)
+        X_num = Result.sol(np.minimum(eta, eta_s))
+        X_series = _frobenius_eval(a, b, 1 - eta/eta_H)[:, 0]
+        return np.where(eta > eta_s, X_series, X_num)
+    return OptimizeResult(t=Result.t, y=Result.y, sol=sol, t_events=Result.t_events, y_events=Result.y_events,
+                          nfev=Result.nfev, njev=Result.njev, nlu=Result.nlu, status=Result.status,
+                          message=Result.message, success=Result.success)
+
+
+def _apply_expansion(Results, eta_0, eta_H, Kappa, eta_s, sources, n_terms=30):
+    # matching of the numerical solutions at eta_s with the local expansion at the top of the boundary layer
+    M, F = _singular_series(eta_H, eta_0, Kappa, n_terms)
+    t_s = 1 - eta_s/eta_H
+    a_basis, b_basis = _frobenius_coefficients(M, F, np.hstack([np.eye(4), np.zeros((4, 1))]), np.array([0, 0, 0, 0, 1]))
+    X_basis = _frobenius_eval(a_basis, b_basis, t_s)
+    Expanded = []
+    for Result, source in zip(Results, sources):
+        a0 = np.linalg.solve(X_basis[:, :4], Result.sol(eta_s) - source*X_basis[:, 4])
+        weights = np.append(a0, source)
+        Expanded.append(_expanded_result(Result, a_basis @ weights[:, None], b_basis @ weights[:, None], eta_s, eta_H))
+    return Expanded
+
+
+def _solve_system(eta_0, eta_H, Kappa=0.4, max_z=None, method='DOP853', dense_output=True, mode='separate', kernel=False,
+                  expansion=None, **kwargs):
     eta_span_tp = [0, eta_H] if max_z is None else [0, max_z]
+    if expansion is not None and eta_span_tp[1] > eta_H*(1 - expansion):
+        # integration stopped at a relative distance `expansion` below eta_H, the local expansion carrying the solutions above
+        eta_s = eta_H*(1 - expansion)
+        Results = _solve_system(eta_0, eta_H, Kappa=Kappa, max_z=eta_s, method=method, dense_output=True, mode=mode,
+                                kernel=kernel, **kwargs)
+        return _apply_expansion(Results, eta_0, eta_H, Kappa, eta_s, [1, 0, 0, 0])
     # eta_val = np.linspace(0, eta_H, 100)
     X0_vec = [np.array([-_mu_prime(0, eta_0, Kappa), 0*1j, 0, 0], dtype='complex_'),
               np.array([0, 0*1j, 1, 0], dtype='complex_'),
               np.array([0, 0*1j, 0, 1], dtype='complex_'),
               np.array([0, 0, 0, 0], dtype='complex_')]
+    if mode == 'augmented':
+        # the non-zero solutions integrated as the columns of a single system, sharing the P matrix at each step, the
+        # last one, started from zero, being added back by _column_result
+        Y0 = np.array(X0_vec[:3]).T
+        if kernel:
+            fun = _make_rhs(eta_H, eta_0, Kappa, n_columns=3, source=1)
+        else:
+            fun = lambda eta, Y: _func_augmented(eta, Y, eta_H, eta_0, Kappa)
+        Result = _integrate(fun, lambda eta: _jac(eta, eta_H, eta_0, Kappa, n_columns=3), eta_span_tp, Y0.ravel(),
+                            method, dense_output, **kwargs)
+        return [_column_result(Result, i, n_columns=3) for i in range(len(X0_vec))]
     Results = []
     for i, X0 in enumerate(X0_vec):
         # print(i)
         if i == 0:
-            test = solve_ivp(_func1, eta_span_tp, X0, args=(eta_H, eta_0, Kappa), method=method, dense_output=dense_output, **kwargs)
+            func, source = _func1, 1
         elif i == 4:
-            test = solve_ivp(_func_delta, eta_span_tp, X0, args=(eta_H, eta_0, Kappa), method=method, dense_output=dense_output, **kwargs)
+            func, source = _func_delta, 2
         else:
-            test = solve_ivp(_func, eta_span_tp, X0, args=(eta_H, eta_0, Kappa), method=method, dense_output=dense_output, **kwargs)
+            func, source = _func, 0
+        if kernel:
+            fun = _make_rhs(eta_H, eta_0, Kappa, source=source)
+        else:
+            fun = lambda eta, X, func=func: func(eta, X, eta_H, eta_0, Kappa)
+        test = _integrate(fun, lambda eta: _jac(eta, eta_H, eta_0, Kappa), eta_span_tp, X0, method, dense_output, **kwargs)
         Results.append(test)
     return Results
 
 
-def calculate_solution(eta, eta_H, eta_0, eta_B, Fr, max_z, Kappa=0.4, output='simple', **kwargs):
+def _fundamental_solutions(eta_0, eta_H, Kappa, max_z, solver_kwargs):
+    # solutions of _solve_system and their values at max_z, where the boundary conditions are applied
+    Results = _solve_system(eta_0, eta_H, Kappa=Kappa, max_z=max_z, **dict(solver_kwargs))
+    To_apply = np.array([X.y[1:, -1] if X.sol is None else X.sol(max_z)[1:] for X in Results]).T
+    return Results, To_apply
+
+
+@lru_cache(maxsize=256)
+def _fundamental_solutions_cached(eta_0, eta_H, Kappa, max_z, solver_kwargs):
+    Results, To_apply = _fundamental_solutions(eta_0, eta_H, Kappa, max_z, solver_kwargs)
+    To_apply.flags.writeable = False  # shared between calls
+    return Results, To_apply
+
+
+def _get_fundamental_solutions(eta_0, eta_H, Kappa, max_z, cache, **kwargs):
+    solver_kwargs = tuple(sorted(kwargs.items()))
+    if cache:
+        return _fundamental_solutions_cached(float(eta_0), float(eta_H), float(Kappa), float(max_z), solver_kwargs)
+    return _fundamental_solutions(eta_0, eta_H, Kappa, max_z, solver_kwargs)
+
+
+def fundamental_cache_info():
+    """Statistics of the cache of fundamental solutions used by :func:`calculate_solution` and :func:`solve_sweep`.
+
+    Returns
+    -------
+    namedtuple
+        The hits, misses, maximum size and current size of the cache, see :func:`functools.lru_cache`.
+
+    """
+    return _fundamental_solutions_cached.cache_info()
+
+
+def fundamental_cache_clear():
+    """Empty the cache of fundamental solutions and reset its statistics."""
+    _fundamental_solutions_cached.cache_clear()
+
+
+def calculate_solution(eta, eta_H, eta_0, eta_B, Fr, max_z, Kappa=0.4, output='simple', cache=False, engine='shooting',
+                       profile_degree=None, chunk_size=65536, sensitivities=False, **kwargs):
     r"""Solve the system and apply the boundary conditions.
 
     Parameters
@@ -388,31 +953,861 @@ def calculate_solution(eta, eta_H, eta_0, eta_B, Fr, max_z, Kappa=0.4, output='s
         Von Karmàn constant (the default is 0.4).
     output : string, optional
         changes what returns the function (default is 'simple').
+    cache : bool, optional
+        If True, the fundamental solutions, which only depend on `eta_0`, `eta_H` and `max_z`, are stored in a
+        least-recently-used cache and reused by later calls with different `eta_B` and `Fr` (the default is False).
+        See :func:`fundamental_cache_info`.
+    engine : str, optional
+        'shooting' (default) integrates the fundamental solutions from the bottom and combines them to satisfy the boundary
+        conditions. 'spectral' solves the boundary value problem directly by Chebyshev collocation, which remains accurate when
+        the shooting becomes ill-conditioned (large `eta_H`). Its degree can be set with the keyword argument `n` (the default is 96),
+        and values of `eta` outside of [0, `max_z`] are then NaN.
+    profile_degree : int, None, optional
+        With `output='lean'` and the 'shooting' engine, degree of the Chebyshev representation of the profiles that is kept.
+        If None (default), only the boundary values are kept.
+    chunk_size : int, optional
+        Number of positions `eta` evaluated at once with `output='simple'` or `'full'` (the default is 65536).
+    sensitivities : bool, optional
+        If True, the derivatives of the fundamental solutions with respect to `eta_H` are integrated along with them, and the
+        derivatives of the hydrodynamic coefficients with respect to `eta_H` (`max_z` being scaled along with it), `Fr` and
+        `eta_B` are also returned (the default is False). Only available with the 'shooting' engine and `output` 'simple' or
+        'full', the cache and the `mode`, `kernel` and `expansion` options being then ignored.
+    **kwargs :
+        With the 'shooting' engine, `kwargs` are passed to `_solve_system`, and then to :func:`scipy.integrate.solve_ivp`. In particular, `mode='augmented'`
+        integrates all the solutions as a single system, which shares the evaluation of the :math:`P` matrix between them
+        (the default `mode='separate'` integrates them one by one), and `kernel=True` evaluates the right-hand side
+        element-wise without building the :math:`P` matrix, compiled with numba if it is installed. The implicit methods
+        'Radau', 'BDF' and 'LSODA' are supplied with the exact Jacobian (the :math:`P` matrix). They are however not
+        recommended: the system is singular at :math:`\eta = \eta_{H}` rather than stiff, 'Radau' and 'BDF' are much
+        slower than 'DOP853', and at the same tolerances all three are less accurate (relative errors on the coefficients
+        up to about 1e-3 for 'LSODA' and 1e-6 for 'BDF' at `atol=rtol=1e-10`). Close to the top of the boundary layer,
+        `expansion` should be used instead: `expansion=t_s` stops the integration at :math:`\eta = (1 - t_{s})\eta_{H}`, the solutions above being given by
+        their local (Frobenius) expansion around the singular point :math:`\eta = \eta_{H}`. `max_z` can then be set to `eta_H`,
+        so that the boundary conditions are applied exactly at the top of the boundary layer.
 
     Returns
     -------
     np.array, list
         If `output` is 'simple', return an array with the solution in every vertical step specified by `eta`. If `output` is 'full', return a list whose elements are:
         - the array with the solution in every vertical step specified by `eta`.
-        - the output of `_solve_system`.
+        - the output of `_solve_system` (or the 'lean' output described below for the 'spectral' engine).
         - the coefficients of the linear decomposition of the solution.
 
+        If `output` is 'lean', no dense output is kept and `eta` is ignored. A dictionnary is returned, with the keys:
+        - 'coeffs': the coefficients of the linear decomposition of the solution.
+        - 'bottom', 'top': the solution at the bottom and at `max_z` (the first component is not returned at `max_z` with the 'shooting' engine).
+        - 'chebyshev': Chebyshev coefficients of the profiles, shape (`profile_degree` + 1, 4), to be evaluated with :func:`evaluate_profile`, or None.
+        - 'eta_H', 'eta_0', 'max_z': the parameters of the vertical mapping of the Chebyshev representation.
+
+        If `sensitivities` is True, a tuple is returned, whose first element is the output described above and the second one
+        a dictionnary with the keys 'dA_dkH', 'dB_dkH', 'dA_dFr', 'dB_dFr', 'dA_dkLB' and 'dB_dkLB'.
+
     """
-    Results = _solve_system(eta_0, eta_H, Kappa=0.4, max_z=max_z, atol=1e-10, rtol=1e-10, **kwargs)
+    if sensitivities and (output == 'lean' or engine != 'shooting'):
+        raise ValueError("sensitivities are only available with the 'shooting' engine and output 'simple' or 'full'.")
+    if output == 'lean':
+        return _lean_solution(eta_H, eta_0, eta_B, Fr, max_z, Kappa, engine, profile_degree, **kwargs)
+    if engine == 'spectral':
+        lean = _lean_solution(eta_H, eta_0, eta_B, Fr, max_z, Kappa, engine, None, **kwargs)
+        Sol = evaluate_profile(lean, eta, chunk_size=chunk_size)
+        return Sol if output == 'simple' else [Sol, lean, lean['coeffs']]
+    if sensitivities:
+        for option in ('mode', 'kernel', 'expansion'):
+            kwargs.pop(option, None)
+        Results, To_apply, dT = _variational_solutions(eta_0, eta_H, Kappa, max_z, atol=1e-10, rtol=1e-10, **kwargs)
+    else:
+        Results, To_apply = _get_fundamental_solutions(eta_0, eta_H, Kappa, max_z, cache, atol=1e-10, rtol=1e-10, **kwargs)
     # Defining boundary conditions
-    To_apply = np.array([X.sol(max_z)[1:] for X in Results]).T
-    #
-    b = np.array([1j*mu(max_z, eta_0, Kappa),  # W(eta_H) = i*mu(eta_H)*delta
-                  1/max_z,                     # St(eta_H) = delta/eta_H
-                  mu(max_z, eta_0, Kappa)**2*(complex(_q1(eta_B)) + 1/(eta_H*Fr**2))])  # Sn(eta_H) = mu(eta_H)**2*(q1 - 1/(eta_H*Fr**2))*delta
+    b = _boundary_vector(max_z, eta_H, eta_0, eta_B, Fr, Kappa)
     # Applying boundary condition
-    pars = np.dot(np.linalg.inv(To_apply[:, :-1]), b - To_apply[:, -1])
+    pars = np.linalg.solve(To_apply[:, :-1], b - To_apply[:, -1])
     coeffs = np.array([1, pars[1]/pars[0], pars[2]/pars[0], 1/pars[0]])
-    coeffs_expanded = np.expand_dims(coeffs, (1, ) + tuple(np.arange(len(np.array(eta).shape)) + 2))
     # returning solutions in eta
     if output == 'simple':
-        return np.sum(np.array([X.sol(eta) for X in Results])*coeffs_expanded, axis=0)
+        result = _combine_solutions(Results, coeffs, eta, chunk_size)
     elif output == 'full':
-        return [np.sum(np.array([X.sol(eta) for X in Results])*coeffs_expanded, axis=0),
-                Results,
-                coeffs]
+        result = [_combine_solutions(Results, coeffs, eta, chunk_size),
+                  Results,
+                  coeffs]
+    if sensitivities:
+        derivatives = _coeff_sensitivities(To_apply[:, :-1], dT[:, :-1], pars, max_z, eta_H, eta_0, eta_B, Fr, Kappa)
+        return result, _split_sensitivities(derivatives)
+    return result
+
+
+def _combine_solutions(Results, coeffs, eta, chunk_size):
+    # linear combination of the solutions evaluated by chunks of eta, to bound the size of the intermediate arrays
+    eta = np.asarray(eta, dtype=float)
+    Sol = np.empty((4, eta.size), dtype=complex)
+    eta_flat = eta.ravel()
+    for start in range(0, max(eta.size, 1), chunk_size):
+        chunk = eta_flat[start:start + chunk_size]
+        Sol[:, start:start + chunk_size] = sum(coeff*X.sol(chunk) for coeff, X in zip(coeffs, Results))
+    return Sol.reshape((4, ) + eta.shape)
+
+
+def _profile_nodes(eta_H, eta_0, max_z, n):
+    # Chebyshev nodes of the profiles, in the vertical mapping of the spectral engine
+    x, w = _chebyshev_nodes(n)
+    return x, np.clip(_spectral_map(x, eta_H, eta_0, max_z)[0], 0, max_z)
+
+
+def _chebyshev_coefficients(x, values):
+    # Chebyshev coefficients, shape (n + 1, 4), of the profiles given at the nodes x
+    return np.linalg.solve(np.polynomial.chebyshev.chebvander(x, x.size - 1), values.T)
+
+
+def _lean_solution(eta_H, eta_0, eta_B, Fr, max_z, Kappa, engine, profile_degree, **kwargs):
+    # boundary values, coefficients, and optionally Chebyshev coefficients of the profiles, without keeping any dense output
+    lean = {'eta_H': eta_H, 'eta_0': eta_0, 'max_z': max_z, 'chebyshev': None}
+    if engine == 'spectral':
+        solution = _spectral_solve(eta_H, eta_0, eta_B, Fr, max_z, Kappa=Kappa, **kwargs)
+        lean['coeffs'] = np.array([1, solution['Y'][2, 0], solution['Y'][3, 0], solution['delta']])
+        lean['bottom'], lean['top'] = solution['Y'][:, 0], solution['Y'][:, -1]
+        lean['chebyshev'] = _chebyshev_coefficients(solution['x'], solution['Y'])
+        return lean
+    #
+    if profile_degree is not None:
+        x, kwargs['t_eval'] = _profile_nodes(eta_H, eta_0, max_z, profile_degree)
+    Results, To_apply = _get_fundamental_solutions(eta_0, eta_H, Kappa, max_z, False, atol=1e-10, rtol=1e-10,
+                                                   dense_output=False, **kwargs)
+    b = _boundary_vector(max_z, eta_H, eta_0, eta_B, Fr, Kappa)
+    pars = np.linalg.solve(To_apply[:, :-1], b - To_apply[:, -1])
+    coeffs = np.array([1, pars[1]/pars[0], pars[2]/pars[0], 1/pars[0]])
+    lean['coeffs'] = coeffs
+    lean['bottom'] = np.array([-_mu_prime(0, eta_0, Kappa), 0, coeffs[1], coeffs[2]])
+    lean['top'] = np.append(np.nan, coeffs[3]*b)  # the first component would require the whole profile
+    if profile_degree is not None:
+        nodes_values = sum(coeff*(X.y if X.sol is None else X.sol(kwargs['t_eval'])) for coeff, X in zip(coeffs, Results))
+        lean['top'] = nodes_values[:, -1]
+        lean['chebyshev'] = _chebyshev_coefficients(x, nodes_values)
+    return lean
+
+
+def evaluate_profile(lean, eta, chunk_size=65536, out=None):
+    r"""Evaluate the vertical profiles stored by :func:`calculate_solution` with `output='lean'`.
+
+    Parameters
+    ----------
+    lean : dict
+        Output of :func:`calculate_solution` with `output='lean'` and `profile_degree` set (or `engine='spectral'`).
+    eta : scalar, np.array
+        Vertical non dimensional positions :math:`k z` where to evaluate the profiles.
+    chunk_size : int, optional
+        Number of positions evaluated at once (the default is 65536). The memory used, apart from the output,
+        only depends on this number.
+    out : np.array, optional
+        Complex array of shape (4, ) + `eta.shape` where the result is written, for instance a :class:`numpy.memmap`.
+
+    Returns
+    -------
+    np.array
+        The solution at the positions `eta`, NaN outside of [0, `max_z`].
+
+    """
+    eta = np.asarray(eta, dtype=float)
+    out = np.empty((4, ) + eta.shape, dtype=complex) if out is None else out
+    out_flat, eta_flat = out.reshape((4, -1)), eta.ravel()
+    for start in range(0, eta.size, chunk_size):
+        chunk = eta_flat[start:start + chunk_size]
+        x = _spectral_inverse_map(chunk, lean['eta_H'], lean['eta_0'], lean['max_z'])
+        inside = (chunk >= 0) & (chunk <= lean['max_z'])
+        out_flat[:, start:start + chunk_size] = np.where(inside, np.polynomial.chebyshev.chebval(np.where(inside, x, 0), lean['chebyshev']), np.nan)
+    return out
+
+
+def solve_sweep(eta_H, eta_0, eta_B, Fr, max_z, Kappa=0.4, engine='shooting', **kwargs):
+    r"""Calculate the hydrodynamic coefficients for many values of `eta_B` and `Fr` at fixed `eta_H`, `eta_0` and `max_z`.
+
+    The fundamental solutions are taken from the cache of :func:`calculate_solution` (or computed and cached),
+    so that each point of the sweep only costs the resolution of the boundary conditions.
+
+    Parameters
+    ----------
+    eta_H : scalar
+        Non dimensional boundary layer height :math:`k H`.
+    eta_0 : scalar
+        Non dimensional hydrodyamic roughness :math:`k z_{0}`.
+    eta_B :  scalar, np.array
+        Non dimensional stratification length :math:`k L_{B}`.
+    Fr : scalar, np.array
+        Froude number
+    max_z : scalar
+        Maximum vertical position where the system is solved, and also where the boundary conditons are applied.
+    Kappa : float, optional
+        Von Karmàn constant (the default is 0.4).
+    engine : str, optional
+        'shooting' (default) or 'spectral', see :func:`calculate_solution`. The 'spectral' engine factorizes
+        the collocation system once for the whole sweep.
+    **kwargs :
+        `kwargs` are passed to `_solve_system` or `_spectral_solve`, depending on `engine`.
+
+    Returns
+    -------
+    A : np.array
+        In-phase hydrodynamic coefficient, with the broadcasted shape of `eta_B` and `Fr`.
+    B : np.array
+        In-quadrature hydrodynamic coefficient, with the broadcasted shape of `eta_B` and `Fr`.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> Fr = np.logspace(-2, 2, 100)
+    >>> A, B = solve_sweep(1.5, 1e-4, 0.5, Fr, 0.9999*1.5)
+
+    """
+    if engine == 'spectral':
+        coeffs = _spectral_solve(eta_H, eta_0, eta_B, Fr, max_z, Kappa=Kappa, **kwargs)['Y'][2, 0]
+        return np.real(coeffs), np.imag(coeffs)
+    _, To_apply = _get_fundamental_solutions(eta_0, eta_H, Kappa, max_z, True, atol=1e-10, rtol=1e-10, **kwargs)
+    b = _boundary_vector(max_z, eta_H, eta_0, np.asarray(eta_B, dtype=float), np.asarray(Fr, dtype=float), Kappa)
+    shape = b.shape[1:]
+    pars = np.linalg.solve(To_apply[:, :-1], b.reshape((3, -1)) - To_apply[:, -1:]).reshape(b.shape)
+    coeffs = pars[1]/pars[0]
+    return np.real(coeffs).reshape(shape), np.imag(coeffs).reshape(shape)
+
+
+# %%
+# Sensitivities
+# -----------------
+# The derivatives of the fundamental solutions with respect to eta_H are integrated along with them (forward
+# sensitivity equations), while eta_B and Fr only enter the boundary conditions.
+
+
+def _func_variational(eta, Y, eta_H, eta_0, Kappa):
+    # the first 4 columns of Y are the solutions of _func_augmented, the last 4 their derivatives with respect to eta_H
+    Y = Y.reshape((4, 8))
+    dY = _P(eta, eta_H, eta_0, Kappa).dot(Y)
+    dY[:, 0] += _S(eta, eta_H, eta_0, Kappa)
+    dY[:, 4:] += _dP_deta_H(eta, eta_H, eta_0, Kappa).dot(Y[:, :4])
+    dY[0, 4] += _dS_deta_H(eta, eta_H, eta_0, Kappa)
+    return dY.ravel()
+
+
+def _jac_variational(eta, eta_H, eta_0, Kappa):
+    coupling = np.zeros((8, 8))
+    coupling[4:, :4] = np.eye(4)
+    return np.kron(_P(eta, eta_H, eta_0, Kappa), np.eye(8)) + np.kron(_dP_deta_H(eta, eta_H, eta_0, Kappa), coupling)
+
+
+def _variational_solutions(eta_0, eta_H, Kappa, max_z, method='DOP853', dense_output=True, **kwargs):
+    # fundamental solutions, their values at max_z, and the derivatives of these values with respect to eta_H,
+    # max_z being scaled along with eta_H
+    Y0 = np.zeros((4, 8), dtype=complex)
+    Y0[0, 0] = -_mu_prime(0, eta_0, Kappa)
+    Y0[2, 1], Y0[3, 2] = 1, 1
+    Result = _integrate(lambda eta, Y: _func_variational(eta, Y, eta_H, eta_0, Kappa),
+                        lambda eta: _jac_variational(eta, eta_H, eta_0, Kappa), [0, max_z], Y0.ravel(), method,
+                        dense_output, **kwargs)
+    Y_top = (Result.y[:, -1] if Result.sol is None else Result.sol(max_z)).reshape((4, 8))
+    dY_top = _func_variational(max_z, Y_top.ravel(), eta_H, eta_0, Kappa).reshape((4, 8))
+    To_apply = Y_top[1:, :4]
+    dT = Y_top[1:, 4:] + dY_top[1:, :4]*max_z/eta_H
+    return [_column_result(Result, i, n_columns=8) for i in range(4)], To_apply, dT
+
+
+def _coeff_sensitivities(To_apply, dT, pars, max_z, eta_H, eta_0, eta_B, Fr, Kappa):
+    r"""Derivatives of :math:`\mathcal{A}_{0} + i\mathcal{B}_{0} = p_{1}/p_{0}` with respect to the non-dimensional numbers.
+
+    Parameters
+    ----------
+    To_apply : np.array
+        Matrices of the boundary systems :math:`T p = b`, shape (..., 3, 3).
+    dT : np.array
+        Derivatives of `To_apply` with respect to `eta_H`, `max_z` being scaled along with `eta_H`, shape (..., 3, 3).
+    pars : np.array
+        Solutions of the boundary systems, shape (..., 3).
+    max_z, eta_H, eta_0, eta_B, Fr : scalar, np.array
+        Parameters of the resolution, see :func:`calculate_solution`.
+    Kappa : float
+        Von Karmàn constant.
+
+    Returns
+    -------
+    dict
+        Complex derivatives, with the keys 'kH', 'Fr' and 'kLB'.
+
+    """
+    ratio = max_z/eta_H
+    mu_top, mup_top = mu(max_z, eta_0, Kappa), _mu_prime(max_z, eta_0, Kappa)
+    stratification = _q1(eta_B) + 1/(eta_H*Fr**2)
+    db = {'kH': [1j*mup_top*ratio, -ratio/max_z**2, 2*mu_top*mup_top*ratio*stratification - mu_top**2/(eta_H**2*Fr**2)],
+          'Fr': [0, 0, -2*mu_top**2/(eta_H*Fr**3)],
+          'kLB': [0, 0, mu_top**2*_dq1(eta_B)]}
+    coeffs = pars[..., 1]/pars[..., 0]
+    derivatives = {}
+    for name, rhs in db.items():
+        rhs = np.stack(np.broadcast_arrays(*rhs), axis=-1).astype(complex)
+        if name == 'kH':
+            rhs = rhs - (dT @ pars[..., None])[..., 0]
+        dp = np.linalg.solve(To_apply, rhs[..., None])[..., 0]
+        derivatives[name] = (dp[..., 1] - coeffs*dp[..., 0])/pars[..., 0]
+    return derivatives
+
+
+def _split_sensitivities(derivatives):
+    # derivatives of A and B from the complex derivatives of A + iB
+    split = {}
+    for name, derivative in derivatives.items():
+        split['dA_d' + name], split['dB_d' + name] = np.real(derivative), np.imag(derivative)
+    return split
+
+
+# %%
+# Batched resolution
+# -----------------
+
+
+def _P_batch(eta, eta_H, eta_0, Kappa):
+    """Stacked :math:`P` matrices, one per member of a batch.
+
+    Parameters
+    ----------
+    eta : np.array
+        Non dimensional heights :math:`k z`, shape (N, ).
+    eta_H : np.array
+        Non dimensional boundary layer heights :math:`k H`, shape (N, ).
+    eta_0 : np.array
+        Non dimensional hydrodyamic roughnesses :math:`k z_{0}`, shape (N, ).
+    Kappa : float
+        Von Karmàn constant.
+
+    Returns
+    -------
+    np.array
+        The :math:`P` matrices, shape (N, 4, 4).
+
+    """
+    tp = (1 - eta/eta_H)
+    mup = _mu_prime(eta, eta_0, Kappa)
+    mu_val = mu(eta, eta_0, Kappa)
+    P = np.zeros(eta.shape + (4, 4), dtype=complex)
+    P[:, 0, 1] = -1j
+    P[:, 0, 2] = mup/(2*tp)
+    P[:, 1, 0] = -1j
+    P[:, 2, 0] = 1j*mu_val + 4*tp/mup
+    P[:, 2, 1] = mup
+    P[:, 2, 3] = 1j
+    P[:, 3, 1] = -1j*mu_val
+    P[:, 3, 2] = 1j
+    return P
+
+
+def _S_batch(eta, eta_H, eta_0, Kappa):
+    """Stacked :math:`S` vectors, one per member of a batch.
+
+    Parameters
+    ----------
+    eta : np.array
+        Non dimensional heights :math:`k z`, shape (N, ).
+    eta_H : np.array
+        Non dimensional boundary layer heights :math:`k H`, shape (N, ).
+    eta_0 : np.array
+        Non dimensional hydrodyamic roughnesses :math:`k z_{0}`, shape (N, ).
+    Kappa : float
+        Von Karmàn constant.
+
+    Returns
+    -------
+    np.array
+        The :math:`S` vectors, shape (N, 4).
+
+    """
+    S = np.zeros(eta.shape + (4, ), dtype=complex)
+    S[:, 0] = Kappa*_mu_prime(eta, eta_0, Kappa)**2 - _mu_prime(eta, eta_0, Kappa)/(2*eta_H)
+    return S
+
+
+def _func_batch(s, Y, max_z, eta_H, eta_0, Kappa):
+    # Y holds, for each member, the particular solution and the two non-trivial
+    # homogeneous solutions as the columns of a (4, 3) matrix. The vertical
+    # coordinate is rescaled by max_z so that all members share the span [0, 1].
+    Y = Y.reshape(max_z.shape + (4, 3))
+    eta = s*max_z
+    dY = np.matmul(_P_batch(eta, eta_H, eta_0, Kappa), Y)
+    dY[:, :, 0] += _S_batch(eta, eta_H, eta_0, Kappa)
+    return (max_z[:, None, None]*dY).ravel()
+
+
+def _func_batch_variational(s, Y, max_z, eta_H, eta_0, Kappa):
+    # same as _func_batch, the last 3 columns of each member being the derivatives of the first 3 with respect to eta_H
+    Y = Y.reshape(max_z.shape + (4, 6))
+    eta = s*max_z
+    dY = np.matmul(_P_batch(eta, eta_H, eta_0, Kappa), Y)
+    dY[:, :, 0] += _S_batch(eta, eta_H, eta_0, Kappa)
+    dY[:, :, 3:] += np.matmul(_dP_deta_H(eta, eta_H, eta_0, Kappa), Y[:, :, :3])
+    dY[:, 0, 3] += _dS_deta_H(eta, eta_H, eta_0, Kappa)
+    return (max_z[:, None, None]*dY).ravel()
+
+
+def _solve_batch(eta_H, eta_0, eta_B, Fr, max_z, Kappa, method, sensitivities=False, **kwargs):
+    N = eta_H.size
+    n_columns = 6 if sensitivities else 3
+    Y0 = np.zeros((N, 4, n_columns), dtype=complex)
+    Y0[:, 0, 0] = -_mu_prime(0, eta_0, Kappa)
+    Y0[:, 2, 1] = 1
+    Y0[:, 3, 2] = 1
+    fun = _func_batch_variational if sensitivities else _func_batch
+    sol = solve_ivp(fun, [0, 1], Y0.ravel(), args=(max_z, eta_H, eta_0, Kappa), method=method, **kwargs)
+    Y_top = sol.y[:, -1].reshape((N, 4, n_columns))
+    To_apply = Y_top[:, 1:, :3]
+    b = _boundary_vector(max_z, eta_H, eta_0, eta_B, Fr, Kappa).T
+    pars = np.linalg.solve(To_apply, b[..., None])[..., 0]
+    # the solution at the bottom is given by the coefficient of the first homogeneous solution
+    coeffs = pars[:, 1]/pars[:, 0]
+    if not sensitivities:
+        return coeffs, _amplification(To_apply, pars, coeffs), None
+    # total derivative of the boundary values, max_z being scaled along with eta_H
+    dY_top = np.matmul(_P_batch(max_z, eta_H, eta_0, Kappa), Y_top[:, :, :3])
+    dY_top[:, :, 0] += _S_batch(max_z, eta_H, eta_0, Kappa)
+    dT = Y_top[:, 1:, 3:] + dY_top[:, 1:]*(max_z/eta_H)[:, None, None]
+    derivatives = _coeff_sensitivities(To_apply, dT, pars, max_z, eta_H, eta_0, eta_B, Fr, Kappa)
+    return coeffs, _amplification(To_apply, pars, coeffs), derivatives
+
+
+def _amplification(To_apply, pars, coeffs):
+    r"""Error on the coefficients caused by a unit relative error on the boundary values of the fundamental solutions.
+
+    First order (Skeel) bound: a componentwise relative error :math:`\epsilon` on the matrix :math:`T` of the boundary
+    system :math:`T p = b` changes :math:`p` by at most :math:`\epsilon |T^{-1}| |T| |p|`, and the coefficient
+    :math:`p_{1}/p_{0}` accordingly.
+
+    Parameters
+    ----------
+    To_apply : np.array
+        Matrices of the boundary systems, shape (N, 3, 3).
+    pars : np.array
+        Solutions of the boundary systems, shape (N, 3).
+    coeffs : np.array
+        Coefficients :math:`p_{1}/p_{0}`, shape (N, ).
+
+    Returns
+    -------
+    np.array
+        Amplification factors, shape (N, ).
+
+    """
+    dp = np.abs(np.linalg.inv(To_apply)) @ (np.abs(To_apply) @ np.abs(pars)[..., None])
+    return (dp[:, 1, 0] + np.abs(coeffs)*dp[:, 0, 0])/np.abs(pars[:, 0])
+
+
+def _nearest_neighbour_order(points):
+    r"""Order of the points along a greedy nearest-neighbour path.
+
+    Parameters
+    ----------
+    points : np.array
+        Coordinates of the points, shape (N, d).
+
+    Returns
+    -------
+    np.array
+        Indexes of the points along the path, which starts from the point with the smallest first coordinate.
+
+    """
+    N = points.shape[0]
+    order = np.empty(N, dtype=int)
+    if N == 0:
+        return order
+    tree = cKDTree(points)
+    visited = np.zeros(N, dtype=bool)
+    current = int(np.argmin(points[:, 0]))
+    for i in range(N):
+        order[i], visited[current] = current, True
+        if i == N - 1:
+            break
+        k = 8
+        while True:  # the number of queried neighbours grows until an unvisited one is found
+            _, neighbours = tree.query(points[current], k=min(k, N))
+            neighbours = np.atleast_1d(neighbours)[~visited[np.atleast_1d(neighbours)]]
+            if neighbours.size > 0:
+                current = int(neighbours[0])
+                break
+            k *= 4
+    return order
+
+
+def solve_many(eta_H, eta_0, eta_B, Fr, max_z, Kappa=0.4, chunk_size=64, method='DOP853', atol=1e-10, rtol=1e-10,
+               sensitivities=False, reorder=False, **kwargs):
+    r"""Calculate the hydrodynamic coefficients for many sets of non-dimensional parameters at once.
+
+    All members of a chunk are integrated together as a single system, whose right-hand side builds the
+    stacked :math:`P` matrices and :math:`S` vectors of every member at each step. The vertical coordinate
+    is rescaled by `max_z` so that members with different boundary layer heights share the same integration span.
+
+    Parameters
+    ----------
+    eta_H : scalar, np.array
+        Non dimensional boundary layer height :math:`k H`.
+    eta_0 : scalar, np.array
+        Non dimensional hydrodyamic roughness :math:`k z_{0}`.
+    eta_B :  scalar, np.array
+        Non dimensional stratification length :math:`k L_{B}`.
+    Fr : scalar, np.array
+        Froude number
+    max_z : scalar, np.array
+        Maximum vertical position where the system is solved, and also where the boundary conditons are applied (see :func:`calculate_solution`).
+    Kappa : float, optional
+        Von Karmàn constant (the default is 0.4).
+    chunk_size : int, optional
+        Number of members integrated together (the default is 64). As the error control of the integrator
+        is shared by all members of a chunk, very large chunks slightly loosen the accuracy of individual members.
+    method : str, optional
+        Integration method passed to :func:`scipy.integrate.solve_ivp` (the default is 'DOP853').
+    atol, rtol : float, optional
+        Absolute and relative tolerances of the integration (the default is 1e-10).
+    sensitivities : bool, optional
+        If True, the derivatives with respect to `eta_H` are integrated along with the solutions (roughly doubling the cost),
+        and the derivatives of the coefficients are also returned, see :func:`calculate_solution` (the default is False).
+    reorder : bool, optional
+        If True, the parameter sets are ordered along a nearest-neighbour path in the log-space of `eta_H`, `eta_0` and
+        `max_z`, the only parameters the fundamental solutions depend on, before being split into chunks. The members of a
+        chunk are then similar, and their shared integration needs fewer steps (9 to 17% fewer right-hand side evaluations
+        for the synthetic hourly series of benchmarks/bench_solve_many_order.py). The results are returned in the input order (the default
+        is False).
+    **kwargs :
+        `kwargs` are passed to :func:`scipy.integrate.solve_ivp`.
+
+    Returns
+    -------
+    A : np.array
+        In-phase hydrodynamic coefficient, with the broadcasted shape of the inputs. NaN where one of the inputs is NaN.
+    B : np.array
+        In-quadrature hydrodynamic coefficient, with the broadcasted shape of the inputs. NaN where one of the inputs is NaN.
+    dict
+        Only if `sensitivities` is True, derivatives of `A` and `B` with the keys 'dA_dkH', 'dB_dkH', 'dA_dFr',
+        'dB_dFr', 'dA_dkLB' and 'dB_dkLB'.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> eta_H = np.linspace(0.5, 2, 10)
+    >>> A, B = solve_many(eta_H, 1e-4, 0.5, 0.8, 0.9999*eta_H)
+    >>> A, B, derivatives = solve_many(eta_H, 1e-4, 0.5, 0.8, 0.9999*eta_H, sensitivities=True)
+    >>> eta_H = np.random.random(1000)*2 + 0.5
+    >>> A, B = solve_many(eta_H, 1e-4, 0.5, 0.8, 0.9999*eta_H, reorder=True)
+
+    """
+    inputs = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in (eta_H, eta_0, eta_B, Fr, max_z)])
+    shape = inputs[0].shape
+    eta_H, eta_0, eta_B, Fr, max_z = [x.ravel() for x in inputs]
+    #
+    coeffs = np.full(eta_H.shape, complex(np.nan, np.nan))
+    derivatives = {name: np.full(eta_H.shape, complex(np.nan, np.nan)) for name in ('kH', 'Fr', 'kLB')}
+    valid = np.flatnonzero(~np.isnan([eta_H, eta_0, eta_B, Fr, max_z]).any(axis=0))
+    if reorder:
+        valid = valid[_nearest_neighbour_order(np.log(np.array([eta_H[valid], eta_0[valid], max_z[valid]]).T))]
+    for start in range(0, valid.size, chunk_size):
+        inds = valid[start:start + chunk_size]
+        coeffs[inds], _, chunk_derivatives = _solve_batch(eta_H[inds], eta_0[inds], eta_B[inds], Fr[inds], max_z[inds], Kappa,
+                                                          method, sensitivities=sensitivities, atol=atol, rtol=rtol, **kwargs)
+        if sensitivities:
+            for name, derivative in chunk_derivatives.items():
+                derivatives[name][inds] = derivative
+    if sensitivities:
+        split = {name: derivative.reshape(shape) for name, derivative in _split_sensitivities(derivatives).items()}
+        return np.real(coeffs).reshape(shape), np.imag(coeffs).reshape(shape), split
+    return np.real(coeffs).reshape(shape), np.imag(coeffs).reshape(shape)
+
+
+def solve_adaptive(eta_H, eta_0, eta_B, Fr, max_z, Kappa=0.4, bound=1e-3, tolerances=(1e-6, 1e-8, 1e-10), chunk_size=64,
+                   method='DOP853', **kwargs):
+    r"""Calculate the hydrodynamic coefficients for many sets of parameters, with the loosest sufficient tolerance.
+
+    All parameter sets are first solved as in :func:`solve_many` with the loosest tolerance. The error on the coefficients is
+    then estimated from the conditioning of the boundary system, as the tolerance times the amplification of a relative error on
+    the boundary values of the fundamental solutions (a first-order, conservative bound). Only the sets whose estimated error
+    exceeds `bound` are solved again with the next tolerance, and so on.
+
+    Parameters
+    ----------
+    eta_H : scalar, np.array
+        Non dimensional boundary layer height :math:`k H`.
+    eta_0 : scalar, np.array
+        Non dimensional hydrodyamic roughness :math:`k z_{0}`.
+    eta_B :  scalar, np.array
+        Non dimensional stratification length :math:`k L_{B}`.
+    Fr : scalar, np.array
+        Froude number
+    max_z : scalar, np.array
+        Maximum vertical position where the system is solved, and also where the boundary conditons are applied (see :func:`calculate_solution`).
+    Kappa : float, optional
+        Von Karmàn constant (the default is 0.4).
+    bound : float, optional
+        Maximum estimated error on :math:`\mathcal{A}_{0} + i\mathcal{B}_{0}` (the default is 1e-3).
+    tolerances : tuple, optional
+        Decreasing tolerances (`atol` and `rtol`) of the integration (the default is (1e-6, 1e-8, 1e-10)).
+    chunk_size : int, optional
+        Number of members integrated together, see :func:`solve_many` (the default is 64).
+    method : str, optional
+        Integration method passed to :func:`scipy.integrate.solve_ivp` (the default is 'DOP853').
+    **kwargs :
+        `kwargs` are passed to :func:`scipy.integrate.solve_ivp`.
+
+    Returns
+    -------
+    A : np.array
+        In-phase hydrodynamic coefficient, with the broadcasted shape of the inputs. NaN where one of the inputs is NaN.
+    B : np.array
+        In-quadrature hydrodynamic coefficient, with the broadcasted shape of the inputs. NaN where one of the inputs is NaN.
+    tol : np.array
+        Tolerance used for each parameter set.
+    err : np.array
+        Estimated error on :math:`\mathcal{A}_{0} + i\mathcal{B}_{0}`, which can still exceed `bound` for badly conditioned
+        sets solved with the tightest tolerance.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> eta_H = np.linspace(0.5, 2, 10)
+    >>> A, B, tol, err = solve_adaptive(eta_H, 1e-4, 0.5, 0.8, 0.9999*eta_H, bound=1e-2)
+
+    """
+    inputs = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in (eta_H, eta_0, eta_B, Fr, max_z)])
+    shape = inputs[0].shape
+    eta_H, eta_0, eta_B, Fr, max_z = [x.ravel() for x in inputs]
+    #
+    coeffs = np.full(eta_H.shape, complex(np.nan, np.nan))
+    tol, err = np.full(eta_H.shape, np.nan), np.full(eta_H.shape, np.nan)
+    todo = np.flatnonzero(~np.isnan([eta_H, eta_0, eta_B, Fr, max_z]).any(axis=0))
+    for tolerance in tolerances:
+        for start in range(0, todo.size, chunk_size):
+            inds = todo[start:start + chunk_size]
+            coeffs[inds], amplification, _ = _solve_batch(eta_H[inds], eta_0[inds], eta_B[inds], Fr[inds], max_z[inds], Kappa,
+                                                          method, atol=tolerance, rtol=tolerance, **kwargs)
+            tol[inds], err[inds] = tolerance, tolerance*amplification
+        todo = todo[~(err[todo] <= bound)]
+    return np.real(coeffs).reshape(shape), np.imag(coeffs).reshape(shape), tol.reshape(shape), err.reshape(shape)
+
+
+# %%
+# Spectral collocation
+# -----------------
+# The boundary value problem is solved directly by Chebyshev collocation, in the variable
+# zeta = log((eta + eta_0)/(eta_H - eta)) that stretches both the roughness layer and the vicinity of the top of the boundary layer.
+
+
+def _chebyshev_nodes(n):
+    # Chebyshev points of the second kind, increasing order, and their barycentric weights
+    x = -np.cos(np.pi*np.arange(n + 1)/n)
+    w = (-1.)**np.arange(n + 1)
+    w[[0, -1]] /= 2
+    return x, w
+
+
+def _barycentric_matrix(x, w, y):
+    # matrix interpolating values at the nodes x onto the points y
+    y = np.asarray(y, dtype=float).ravel()
+    diff = y[:, None] - x[None, :]
+    exact = diff == 0
+    diff[exact] = 1
+    C = w[None, :]/diff
+    C /= C.sum(axis=1, keepdims=True)
+    rows = exact.any(axis=1)
+    C[rows] = exact[rows]
+    return C
+
+
+def _chebyshev_differentiation(x, w):
+    # differentiation matrix at the nodes x
+    diff = x[:, None] - x[None, :] + np.eye(x.size)
+    D = (w[None, :]/w[:, None])/diff
+    D -= np.diag(D.sum(axis=1))
+    return D
+
+
+def _spectral_map(x, eta_H, eta_0, max_z):
+    # heights corresponding to x in [-1, 1], and derivative d(eta)/dx
+    zeta_0, zeta_1 = np.log(eta_0/eta_H), np.log((max_z + eta_0)/(eta_H - max_z))
+    zeta = zeta_0 + (x + 1)*(zeta_1 - zeta_0)/2
+    eta = (eta_H*np.exp(zeta) - eta_0)/(1 + np.exp(zeta))
+    return eta, (eta + eta_0)*(eta_H - eta)/(eta_H + eta_0)*(zeta_1 - zeta_0)/2
+
+
+def _spectral_inverse_map(eta, eta_H, eta_0, max_z):
+    zeta_0, zeta_1 = np.log(eta_0/eta_H), np.log((max_z + eta_0)/(eta_H - max_z))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        zeta = np.log((eta + eta_0)/(eta_H - eta))
+    return 2*(zeta - zeta_0)/(zeta_1 - zeta_0) - 1
+
+
+@lru_cache(maxsize=8)
+def _collocation_matrices(n):
+    # collocation points, and matrices interpolating and differentiating the values at the Chebyshev nodes onto them
+    x, w = _chebyshev_nodes(n)
+    y = -np.cos(np.pi*(2*np.arange(n) + 1)/(2*n))
+    R = _barycentric_matrix(x, w, y)
+    RD = R @ _chebyshev_differentiation(x, w)
+    for array in (y, R, RD):
+        array.flags.writeable = False  # shared between calls
+    return y, R, RD
+
+
+def _spectral_system(eta_H, eta_0, max_z, Kappa, n):
+    r"""Collocation system of :func:`_spectral_solve`.
+
+    Parameters
+    ----------
+    eta_H : float
+        Non dimensional boundary layer height :math:`k H`.
+    eta_0 : float
+        Non dimensional hydrodyamic roughness :math:`k z_{0}`.
+    max_z : float
+        Vertical position where the boundary conditions are applied.
+    Kappa : float
+        Von Karmàn constant.
+    n : int
+        Degree of the Chebyshev representation.
+
+    Returns
+    -------
+    M : np.array
+        Matrix of the system, shape (4(n + 1) + 1, 4(n + 1) + 1), the last column (that of the displacement
+        :math:`\delta`, which depends on `eta_B` and `Fr`) being zero.
+    r : np.array
+        Right-hand side of the system, shape (4(n + 1) + 1, ).
+
+    """
+    y, R, RD = _collocation_matrices(n)
+    eta_y, J = _spectral_map(y, eta_H, eta_0, max_z)
+    JP = J[:, None, None]*_P_batch(eta_y, np.full(n, eta_H), np.full(n, eta_0), Kappa)
+    JS = J[:, None]*_S_batch(eta_y, np.full(n, eta_H), np.full(n, eta_0), Kappa)
+    #
+    size = 4*(n + 1) + 1
+    M = np.zeros((size, size), dtype=complex)
+    r = np.zeros(size, dtype=complex)
+    for c in range(4):
+        rows = slice(c*n, (c + 1)*n)
+        for q in range(4):
+            M[rows, q*(n + 1):(q + 1)*(n + 1)] = (c == q)*RD - JP[:, c, q][:, None]*R
+        r[rows] = JS[:, c]
+    # boundary conditions at the bottom: Y_0(0) = -mu'(0), Y_1(0) = 0
+    M[4*n, 0], r[4*n] = 1, -_mu_prime(0, eta_0, Kappa)
+    M[4*n + 1, n + 1] = 1
+    # boundary conditions at max_z: Y_c(max_z) = delta*b_c for c = 1, 2, 3
+    top_rows = 4*n + 2 + np.arange(3)
+    M[top_rows, np.arange(1, 4)*(n + 1) + n] = 1
+    return M, r
+
+
+def _spectral_solve(eta_H, eta_0, eta_B, Fr, max_z, Kappa=0.4, n=96):
+    r"""Solve the boundary value problem by rectangular Chebyshev collocation.
+
+    The solution :math:`Y` is represented by its values at `n + 1` Chebyshev points, and the equations are collocated at `n`
+    Chebyshev points of the first kind, leaving room for the two boundary conditions at the bottom, the three at `max_z`,
+    and the displacement :math:`\delta` of the top of the boundary layer as an additional unknown. As `eta_B` and `Fr`
+    only enter the column of :math:`\delta`, the system is factorized once for a reference value, and the other values are
+    obtained by rank-one (Sherman-Morrison) updates.
+
+    Parameters
+    ----------
+    eta_H : float
+        Non dimensional boundary layer height :math:`k H`.
+    eta_0 : float
+        Non dimensional hydrodyamic roughness :math:`k z_{0}`.
+    eta_B :  scalar, np.array
+        Non dimensional stratification length :math:`k L_{B}`.
+    Fr : scalar, np.array
+        Froude number
+    max_z : float
+        Vertical position where the boundary conditions are applied, strictly smaller than `eta_H`.
+    Kappa : float, optional
+        Von Karmàn constant (the default is 0.4).
+    n : int, optional
+        Degree of the Chebyshev representation (the default is 96).
+
+    Returns
+    -------
+    dict
+        Dictionnary with the keys:
+            - 'x', 'w': Chebyshev nodes and barycentric weights.
+            - 'eta': the corresponding heights.
+            - 'Y': values of the solution at the nodes, shape (4, n + 1) + broadcasted shape of `eta_B` and `Fr`.
+            - 'delta': displacement of the top of the boundary layer, with the broadcasted shape of `eta_B` and `Fr`.
+            - 'eta_H', 'eta_0', 'max_z': the parameters of the vertical mapping.
+
+    """
+    x, w = _chebyshev_nodes(n)
+    M, r = _spectral_system(eta_H, eta_0, max_z, Kappa, n)
+    size = r.size
+    top_rows = 4*n + 2 + np.arange(3)
+    #
+    b = _boundary_vector(max_z, eta_H, eta_0, np.asarray(eta_B, dtype=float), np.asarray(Fr, dtype=float), Kappa)
+    shape = b.shape[1:]
+    b = b.reshape((3, -1))
+    b_ref = b[:, 0]
+    M[top_rows, -1] = -b_ref
+    lu = lu_factor(M)
+    E = np.zeros((size, 3), dtype=complex)
+    E[top_rows, np.arange(3)] = 1
+    z, W = lu_solve(lu, r), lu_solve(lu, E)
+    # rank-one corrections for the other values of the delta column
+    v = -W @ (b - b_ref[:, None])
+    u = z[:, None] - v*z[-1]/(1 + v[-1])
+    return {'x': x, 'w': w, 'eta': _spectral_map(x, eta_H, eta_0, max_z)[0],
+            'Y': u[:-1].reshape((4, n + 1) + shape), 'delta': u[-1].reshape(shape),
+            'eta_H': eta_H, 'eta_0': eta_0, 'max_z': max_z}
+
+
+def solve_spectrum(k, H, u_star, N, delta_theta, z0, max_z_ratio=0.9999, Kappa=0.4, g=9.81, n=96):
+    r"""Calculate the hydrodynamic coefficients as a function of the wavenumber, for one atmospheric state.
+
+    The non-dimensional numbers are built as in the processing of the meteorological data: :math:`\eta_{H} = kH`,
+    :math:`\eta_{0} = kz_{0}`, :math:`\eta_{B} = k U/N` and :math:`\mathcal{F} = U/\sqrt{g H \Delta\theta/\theta_{0}}`, with
+    :math:`U = u_{*}\mu(H)` the velocity at the top of the boundary layer. The problem is solved by Chebyshev collocation
+    (see :func:`calculate_solution` with `engine='spectral'`), which remains accurate at the large values of :math:`kH` reached
+    by short wavelengths, for which the shooting is ill-conditioned. As the heights scale with :math:`k`, the stretched vertical
+    coordinate of the collocation does not depend on the wavenumber, so that all wavenumbers share the same collocation heights
+    and matrices, and only the coefficients of the system are rebuilt for each wavenumber.
+
+    Parameters
+    ----------
+    k : scalar, np.array
+        Wavenumbers [1/m].
+    H : float
+        Boundary layer height [m].
+    u_star : float
+        Shear velocity [m/s].
+    N : float
+        Brunt-Väisälä frequency of the free atmosphere [1/s].
+    delta_theta : float
+        Relative potential temperature jump :math:`\Delta\theta/\theta_{0}` at the top of the boundary layer.
+    z0 : float
+        Hydrodynamic roughness [m].
+    max_z_ratio : float, optional
+        The boundary conditions are applied at `max_z_ratio` times :math:`k H` (the default is 0.9999).
+    Kappa : float, optional
+        Von Karmàn constant (the default is 0.4).
+    g : float, optional
+        Gravitational acceleration (the default is 9.81) [m/s2].
+    n : int, optional
+        Degree of the Chebyshev representation (the default is 96).
+
+    Returns
+    -------
+    A : np.array
+        In-phase hydrodynamic coefficient, with the shape of `k`.
+    B : np.array
+        In-quadrature hydrodynamic coefficient, with the shape of `k`.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> k = 2*np.pi/np.logspace(1, 5, 200)
+    >>> A, B = solve_spectrum(k, 1500, 0.3, 0.01, 0.01, 1e-3)
+
+    """
+    k = np.asarray(k, dtype=float)
+    U = u_star*mu(H, z0, Kappa)
+    Fr = U/np.sqrt(g*H*delta_theta)
+    L_B = U/N
+    #
+    wavenumbers, inverse = np.unique(k.ravel(), return_inverse=True)
+    coeffs = np.empty(wavenumbers.shape, dtype=complex)
+    top_rows = 4*n + 2 + np.arange(3)
+    for i, kk in enumerate(wavenumbers):
+        M, r = _spectral_system(kk*H, kk*z0, max_z_ratio*kk*H, Kappa, n)
+        M[top_rows, -1] = -_boundary_vector(max_z_ratio*kk*H, kk*H, kk*z0, kk*L_B, Fr, Kappa)
+        coeffs[i] = lu_solve(lu_factor(M, check_finite=False), r, check_finite=False)[2*(n + 1)]
+    coeffs = coeffs[inverse.ravel()].reshape(k.shape)
+    return np.real(coeffs), np.imag(coeffs)
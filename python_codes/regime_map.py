@@ -0,0 +1,238 @@
+r"""
+Maps of the hydrodynamic coefficients over the regime diagram.
+
+The coefficients :math:`(\mathcal{A}_{0}, \mathcal{B}_{0})` predicted by the linear theory of :mod:`python_codes.linear_theory`
+are computed on a grid of the non-dimensional numbers :math:`(\mathcal{F}, kH, kL_{B})`, at fixed :math:`kz_{0}`. The grid
+is split into chunks solved in parallel and stored in a directory, one compressed `.npz` file per chunk along with the
+coordinates, so that an interrupted computation resumes from the finished chunks. A subregion can later be refined: the refined
+map is stored in a sub-directory of the store, and only its new nodes are calculated.
+
+Examples
+--------
+>>> import numpy as np
+>>> regime = build_map('regime_map', np.logspace(-2, 2.5, 46), np.logspace(-1.5, 1, 26), np.logspace(-2, 1, 31))
+>>> refined = refine_map('regime_map', Froude=(0.1, 1), kH=(0.1, 1), factor=4)
+>>> regime = load_map('regime_map')
+
+"""
+
+import os
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from python_codes.linear_theory import solve_many
+
+#: Names of the map axes, in order.
+AXES = ('Froude', 'kH', 'kLB')
+
+
+def _chunk_path(store, index):
+    return os.path.join(store, 'chunk_' + '_'.join('{:03d}'.format(i) for i in index) + '.npz')
+
+
+def _save_atomic(path, **arrays):
+    # writing first to a temporary file, so that a chunk file is either complete or absent
+    tmp = path + '.tmp.npz'
+    np.savez_compressed(tmp, **arrays)
+    os.replace(tmp, path)
+
+
+def _chunk_slices(shape, chunks):
+    # index and slices of every chunk of an array of the given shape
+    ranges = [range(0, n, c) for n, c in zip(shape, chunks)]
+    for starts in itertools.product(*ranges):
+        index = tuple(start//c for start, c in zip(starts, chunks))
+        yield index, tuple(slice(start, start + c) for start, c in zip(starts, chunks))
+
+
+def _check_coords(store, coords):
+    r"""Create the store, or check that an existing one has the same coordinates."""
+    path = os.path.join(store, 'coords.npz')
+    os.makedirs(store, exist_ok=True)
+    if os.path.isfile(path):
+        with np.load(path) as stored:
+            if any(not np.array_equal(stored[key], coords[key]) for key in coords):
+                raise ValueError('The store {} was created for different coordinates.'.format(store))
+    else:
+        _save_atomic(path, **coords)
+
+
+def _solve_chunk(index, axes, known_A, known_B, kz0, max_z_ratio, Kappa, kwargs):
+    # coefficients on the chunk, only calculated where they are not already known
+    Froude, kH, kLB = np.meshgrid(*axes, indexing='ij')
+    A, B = known_A.copy(), known_B.copy()
+    todo = np.isnan(A)
+    A[todo], B[todo] = solve_many(kH[todo], kz0, kLB[todo], Froude[todo], max_z_ratio*kH[todo], Kappa=Kappa, **kwargs)
+    return index, A, B
+
+
+def _compute(store, axes, known_A, known_B, kz0, max_z_ratio, Kappa, chunks, n_workers, verbose, kwargs):
+    shape = tuple(ax.size for ax in axes)
+    todo = [(index, slices) for index, slices in _chunk_slices(shape, chunks)
+            if not os.path.isfile(_chunk_path(store, index))]
+    if verbose:
+        n_chunks = int(np.prod([np.ceil(n/c) for n, c in zip(shape, chunks)]))
+        print('{:d}/{:d} chunks already computed'.format(n_chunks - len(todo), n_chunks))
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = [executor.submit(_solve_chunk, index, [ax[s] for ax, s in zip(axes, slices)], known_A[slices],
+                                   known_B[slices], kz0, max_z_ratio, Kappa, kwargs)
+                   for index, slices in todo]
+        for n_done, future in enumerate(as_completed(futures), start=1):
+            index, A, B = future.result()
+            _save_atomic(_chunk_path(store, index), A=A, B=B)
+            if verbose:
+                print('chunk {} done -- {:d}/{:d}'.format(index, n_done, len(todo)))
+
+
+def build_map(store, Froude, kH, kLB, kz0=1e-4, max_z_ratio=0.9999, chunks=(8, 8, 8), n_workers=None, Kappa=0.4,
+              verbose=True, **kwargs):
+    r"""Compute the hydrodynamic coefficients on a grid of the regime diagram, in parallel.
+
+    Parameters
+    ----------
+    store : str
+        Directory where the coordinates and the finished chunks are written. If it already contains chunks of the same map,
+        only the missing ones are calculated.
+    Froude : np.array
+        Increasing values of the Froude number, usually log-spaced.
+    kH : np.array
+        Increasing values of the non dimensional boundary layer height :math:`k H`, usually log-spaced.
+    kLB : np.array
+        Increasing values of the non dimensional stratification length :math:`k L_{B}`, usually log-spaced.
+    kz0 : float, optional
+        Non dimensional hydrodynamic roughness :math:`k z_{0}` (the default is 1e-4).
+    max_z_ratio : float, optional
+        The boundary conditions are applied at `max_z_ratio` times :math:`k H` (the default is 0.9999).
+    chunks : tuple, optional
+        Number of nodes of a chunk along each axis (the default is (8, 8, 8)).
+    n_workers : int, None, optional
+        Number of processes. If None (default), the number of processors of the machine.
+    Kappa : float, optional
+        Von Karmàn constant (the default is 0.4).
+    verbose : bool, optional
+        If True (default), print the progress.
+    **kwargs :
+        `kwargs` are passed to :func:`solve_many <python_codes.linear_theory.solve_many>`.
+
+    Returns
+    -------
+    dict
+        The map, see :func:`load_map`.
+
+    """
+    axes = [np.asarray(ax, dtype=float) for ax in (Froude, kH, kLB)]
+    coords = {name: ax for name, ax in zip(AXES, axes)}
+    coords.update(kz0=kz0, max_z_ratio=max_z_ratio, Kappa=Kappa, chunks=np.array(chunks))
+    _check_coords(store, coords)
+    unknown = np.full(tuple(ax.size for ax in axes), np.nan)
+    _compute(store, axes, unknown, unknown, kz0, max_z_ratio, Kappa, chunks, n_workers, verbose, kwargs)
+    return load_map(store)
+
+
+def load_map(store):
+    r"""Load a map computed by :func:`build_map`, and its refinements.
+
+    Parameters
+    ----------
+    store : str
+        Directory of the map.
+
+    Returns
+    -------
+    dict
+        The map, with the keys:
+            - 'Froude', 'kH', 'kLB': the grid axes.
+            - 'A', 'B': the hydrodynamic coefficients on the grid, of shape (`Froude.size`, `kH.size`, `kLB.size`), NaN in the chunks not computed yet.
+            - 'kz0', 'max_z_ratio', 'Kappa', 'chunks': the parameters used to build the map.
+            - 'refinements': the list of the refined maps computed by :func:`refine_map`, in the same format.
+
+    """
+    with np.load(os.path.join(store, 'coords.npz')) as data:
+        regime = {key: data[key] for key in data.files}
+    for key in ('kz0', 'max_z_ratio', 'Kappa'):
+        regime[key] = float(regime[key])
+    regime['chunks'] = tuple(int(c) for c in regime['chunks'])
+    #
+    shape = tuple(regime[name].size for name in AXES)
+    regime['A'], regime['B'] = np.full(shape, np.nan), np.full(shape, np.nan)
+    for index, slices in _chunk_slices(shape, regime['chunks']):
+        path = _chunk_path(store, index)
+        if os.path.isfile(path):
+            with np.load(path) as chunk:
+                regime['A'][slices], regime['B'][slices] = chunk['A'], chunk['B']
+    #
+    path_refinements = os.path.join(store, 'refinements')
+    names = sorted(os.listdir(path_refinements)) if os.path.isdir(path_refinements) else []
+    regime['refinements'] = [load_map(os.path.join(path_refinements, name)) for name in names]
+    return regime
+
+
+def _refine_axis(ax, bounds, factor):
+    # nodes of ax within bounds, with factor - 1 log-spaced nodes inserted between consecutive ones
+    if bounds is None:
+        inside = np.arange(ax.size)
+    else:  # relative tolerance, so that bounds given at the nodes include them
+        inside = np.flatnonzero((ax >= bounds[0]*(1 - 1e-9)) & (ax <= bounds[1]*(1 + 1e-9)))
+    if inside.size == 0:
+        raise ValueError('No node of the map within the bounds {}.'.format(bounds))
+    nodes = ax[inside]
+    if nodes.size == 1:
+        return nodes, inside, np.array([0])
+    refined = np.exp(np.concatenate([np.linspace(np.log(a), np.log(b), factor + 1)[:-1] for a, b in zip(nodes[:-1], nodes[1:])]
+                                    + [np.log(nodes[-1:])]))
+    refined[::factor] = nodes  # exact values of the existing nodes
+    return refined, inside, np.arange(0, refined.size, factor)
+
+
+def refine_map(store, Froude=None, kH=None, kLB=None, factor=2, chunks=None, n_workers=None, verbose=True, **kwargs):
+    r"""Refine a subregion of a map computed by :func:`build_map`.
+
+    The refined grid contains the nodes of the map within the subregion, with `factor` - 1 log-spaced nodes inserted
+    between consecutive ones. The coefficients at the existing nodes are copied from the map, and only the new nodes are
+    calculated. The refined map is stored in the sub-directory `refinements` of `store`, and can itself be refined.
+
+    Parameters
+    ----------
+    store : str
+        Directory of the map to refine.
+    Froude, kH, kLB : tuple, None, optional
+        Bounds (min, max) of the subregion along each axis. If None (default), the whole axis.
+    factor : int, optional
+        Refinement factor of the grid spacing (the default is 2).
+    chunks : tuple, None, optional
+        Number of nodes of a chunk along each axis. If None (default), the chunks of the map.
+    n_workers : int, None, optional
+        Number of processes. If None (default), the number of processors of the machine.
+    verbose : bool, optional
+        If True (default), print the progress.
+    **kwargs :
+        `kwargs` are passed to :func:`solve_many <python_codes.linear_theory.solve_many>`.
+
+    Returns
+    -------
+    dict
+        The refined map, see :func:`load_map`.
+
+    """
+    regime = load_map(store)
+    refined = [_refine_axis(regime[name], bounds, factor) for name, bounds in zip(AXES, (Froude, kH, kLB))]
+    axes = [ax for ax, _, _ in refined]
+    chunks = regime['chunks'] if chunks is None else chunks
+    #
+    # the refinement with the same coordinates is resumed, otherwise a new one is created
+    coords = {name: ax for name, ax in zip(AXES, axes)}
+    coords.update(kz0=regime['kz0'], max_z_ratio=regime['max_z_ratio'], Kappa=regime['Kappa'], chunks=np.array(chunks))
+    path_refinements = os.path.join(store, 'refinements')
+    names = sorted(os.listdir(path_refinements)) if os.path.isdir(path_refinements) else []
+    matching = [name for name, sub in zip(names, regime['refinements'])
+                if all(np.array_equal(sub[key], coords[key]) for key in AXES) and sub['chunks'] == tuple(chunks)]
+    sub_store = os.path.join(path_refinements, matching[0] if matching else '{:03d}'.format(len(names)))
+    _check_coords(sub_store, coords)
+    #
+    known_A, known_B = np.full(tuple(ax.size for ax in axes), np.nan), np.full(tuple(ax.size for ax in axes), np.nan)
+    parent = np.ix_(*[inside for _, inside, _ in refined])
+    existing = np.ix_(*[position for _, _, position in refined])
+    known_A[existing], known_B[existing] = regime['A'][parent], regime['B'][parent]
+    _compute(sub_store, axes, known_A, known_B, regime['kz0'], regime['max_z_ratio'], regime['Kappa'], chunks, n_workers,
+             verbose, kwargs)
+    return load_map(sub_store)
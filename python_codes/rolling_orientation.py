@@ -0,0 +1,125 @@
+r"""
+Time series of the dune orientations predicted over sliding time windows.
+
+The angular distribution of the sediment flux is calculated in windows of fixed duration (e.g. 30 days) shifted by a
+fixed step (e.g. 1 day). Instead of calculating the distribution of each window from scratch, the histogram is updated
+incrementally from one window to the next, by adding the samples entering the window and subtracting those leaving it,
+so that the cost of the histograms is proportional to the length of the time series. The dune orientations of the
+windows are then calculated by blocks, with the FFT method of :mod:`python_codes.CourrechDuPont2014`.
+
+Examples
+--------
+>>> import numpy as np
+>>> time = np.datetime64('2015-01-01') + np.arange(3*365*24)*np.timedelta64(1, 'h')
+>>> orientation, flux = np.random.random((time.size, ))*360, np.random.random((time.size, ))
+>>> centers, alpha_BI, alpha_F = rolling_orientations(time, orientation, flux, window=np.timedelta64(30, 'D'))
+
+"""
+
+import numpy as np
+from python_codes.CourrechDuPont2014 import Bed_Instability_Orientation, Elongation_direction
+
+
+def _window_bounds(time, window, step, start):
+    # start times of the windows contained in the time series, and indices of their first and last + 1 samples
+    start = time[0] if start is None else np.datetime64(start, 's')
+    n_windows = int((time[-1] - start - window)//step) + 1
+    starts = start + step*np.arange(max(n_windows, 0))
+    return starts, np.searchsorted(time, starts, side='left'), np.searchsorted(time, starts + window, side='left')
+
+
+def rolling_orientations(time, orientation, flux, window=np.timedelta64(30, 'D'), step=np.timedelta64(1, 'D'), gamma=1.6,
+                         bin_edges=np.linspace(0, 360, 361), start=None, min_count=1, block_size=256):
+    r"""Calculate the dune orientations predicted in sliding time windows.
+
+    Parameters
+    ----------
+    time : numpy array
+        Times of the samples, as `datetime` objects or `numpy.datetime64`.
+    orientation : numpy array
+        Orientation of the sediment flux of each sample, in degrees.
+    flux : numpy array
+        Sediment flux of each sample, with the samples along the last axis. Leading dimensions (e.g. transport laws or grain
+        sizes) give independent flux series sharing the same orientations.
+    window : numpy.timedelta64
+        Duration of the windows (the default is 30 days).
+    step : numpy.timedelta64
+        Shift between consecutive windows (the default is 1 day).
+    gamma : scalar, numpy array
+        Flux-up ratio :math:`\gamma`, broadcastable against the leading dimensions of `flux` (the default is 1.6).
+    bin_edges : numpy array
+        Regularly spaced bins in orientation, spanning 360 degrees, used to calculate the angular distributions of the
+        sediment flux (the default is np.linspace(0, 360, 361)).
+    start : datetime, numpy.datetime64, None
+        Start of the first window. If None (default), the time of the first sample.
+    min_count : int
+        Minimum number of valid samples in a window for the dune orientations to be calculated, otherwise NaN (the default is 1).
+    block_size : int
+        Number of windows whose orientations are calculated together (the default is 256).
+
+    Returns
+    -------
+    centers : numpy array
+        Central times of the windows, as `numpy.datetime64`.
+    alpha_BI : numpy array
+        Dune orientation of the bed instability (see :func:`Bed_Instability_Orientation <python_codes.CourrechDuPont2014.Bed_Instability_Orientation>`)
+        in each window, of shape (number of windows, ) followed by the broadcasted leading dimensions of `flux` and `gamma`.
+    alpha_F : numpy array
+        Elongation direction (see :func:`Elongation_direction <python_codes.CourrechDuPont2014.Elongation_direction>`)
+        in each window, same shape as `alpha_BI`.
+
+    """
+    time = np.asarray(time, dtype='datetime64[s]')
+    window, step = np.timedelta64(window, 's'), np.timedelta64(step, 's')
+    orientation, flux = np.asarray(orientation, dtype=float), np.asarray(flux, dtype=float)
+    order = np.argsort(time, kind='stable')
+    time, orientation, flux = time[order], orientation[order], flux[..., order]
+    #
+    # bin of each sample, NaN orientations being discarded and NaN fluxes counted as zero
+    n_bins = bin_edges.size - 1
+    valid = ~np.isnan(orientation)
+    bins = np.clip(np.searchsorted(bin_edges, np.mod(orientation, 360), side='right') - 1, 0, n_bins - 1)
+    bins = np.where(valid, bins, n_bins)  # extra bin, dropped, for the invalid samples
+    lead_shape = flux.shape[:-1]
+    if np.ndim(gamma) > len(lead_shape):
+        raise ValueError('gamma must have at most as many dimensions as the leading dimensions of flux.')
+    weights = np.nan_to_num(flux.reshape((-1, flux.shape[-1])))
+    bin_centers = bin_edges[1:] - (bin_edges[1] - bin_edges[0])/2
+    #
+    starts, first, last = _window_bounds(time, window, step, start)
+    out_shape = (starts.size, ) + np.broadcast_shapes(lead_shape, np.shape(gamma))
+    alpha_BI, alpha_F = np.full(out_shape, np.nan), np.full(out_shape, np.nan)
+    #
+    hist = np.zeros((weights.shape[0], n_bins + 1))
+    magnitude = np.zeros_like(hist)  # sum of the absolute values added and subtracted, bounding the round-off errors
+    counts = np.zeros(n_bins + 1, dtype=int)
+    lo, hi = 0, 0
+    for block_start in range(0, starts.size, block_size):
+        block = slice(block_start, min(block_start + block_size, starts.size))
+        hists = np.empty((block.stop - block.start, ) + hist.shape)
+        n_valid = np.empty(block.stop - block.start, dtype=int)
+        for i, (new_lo, new_hi) in enumerate(zip(first[block], last[block])):
+            # entering samples [hi, new_hi), leaving samples [lo, new_lo)
+            for samples, sign in ((slice(hi, new_hi), 1), (slice(lo, new_lo), -1)):
+                np.add.at(hist, (slice(None), bins[samples]), sign*weights[:, samples])
+                np.add.at(magnitude, (slice(None), bins[samples]), np.abs(weights[:, samples]))
+                np.add.at(counts, bins[samples], sign)
+            # no accumulated round-off in the empty bins, or in those whose content cancelled out
+            cancelled = (np.abs(hist) <= 1e-12*magnitude) | (counts == 0)
+            hist[cancelled], magnitude[cancelled] = 0, 0
+            lo, hi = new_lo, new_hi
+            hists[i], n_valid[i] = hist, counts[:-1].sum()
+        #
+        # normalized distributions, as Make_angular_PDF
+        hists = hists[..., :-1].reshape((hists.shape[0], ) + lead_shape + (n_bins, ))
+        total = hists.sum(axis=-1, keepdims=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            PDF = hists/(total*(bin_edges[1] - bin_edges[0]))
+        ok = (n_valid >= min_count)[(slice(None), ) + (None, )*len(lead_shape)] & (total[..., 0] > 0)
+        g = np.expand_dims(gamma, -1)
+        shape = (hists.shape[0], ) + out_shape[1:]
+        BI = np.reshape(Bed_Instability_Orientation(bin_centers, np.nan_to_num(PDF), gamma=g, method='fft'), shape)
+        F = np.reshape(Elongation_direction(bin_centers, np.nan_to_num(PDF), gamma=g, method='fft'), shape)
+        ok = np.broadcast_to(ok, shape)
+        alpha_BI[block], alpha_F[block] = np.where(ok, BI, np.nan), np.where(ok, F, np.nan)
+    return starts + window//2, alpha_BI, alpha_F
@@ -0,0 +1,122 @@
+r"""
+Persistent cache of the hydrodynamic coefficients predicted by the linear theory.
+
+The non-dimensional parameters :math:`(\eta_{H}, \eta_{0}, \eta_{B}, \mathcal{F}, \eta_{\rm max})` are rounded to a relative tolerance
+(i.e. quantized in log-space), and the corresponding coefficients are stored in an on-disk SQLite database, addressed by
+a hash of the rounded parameters and of the solver settings. Near-duplicate parameter sets, within a batch or between
+runs, are therefore solved only once.
+
+Examples
+--------
+>>> import numpy as np
+>>> kH = np.random.random((2000,))*3
+>>> A, B, stats = cached_solve_many(kH, 1e-4, 0.5, 0.8, 0.9999*kH, 'hydro_coeffs_cache.sqlite', rtol=1e-4)
+
+"""
+
+import sqlite3
+import hashlib
+import numpy as np
+from python_codes.linear_theory import solve_many
+
+#: Version of the cache entries, to be increased when the solver changes the results.
+CACHE_VERSION = 1
+
+
+def _quantize(parameters, rtol):
+    # sign, and integer index of the absolute value on a log-spaced grid of relative step rtol
+    magnitude = np.abs(parameters)
+    index = np.round(np.log(magnitude, out=np.zeros_like(magnitude), where=magnitude > 0)/np.log1p(rtol))
+    return np.concatenate([np.sign(parameters), index], axis=1).astype(np.int64)
+
+
+def _keys(quantized, rtol, Kappa, kwargs):
+    settings = repr((CACHE_VERSION, float(rtol), float(Kappa), sorted(kwargs.items()))).encode()
+    return [hashlib.sha1(settings + row.tobytes()).hexdigest() for row in quantized]
+
+
+def _connect(path):
+    connection = sqlite3.connect(path, timeout=60)
+    connection.execute('CREATE TABLE IF NOT EXISTS coeffs (key TEXT PRIMARY KEY, A REAL, B REAL)')
+    return connection
+
+
+def cached_solve_many(eta_H, eta_0, eta_B, Fr, max_z, path, rtol=1e-6, Kappa=0.4, solver=solve_many, verbose=True, **kwargs):
+    r"""Calculate the hydrodynamic coefficients, reusing those already stored in a persistent cache.
+
+    The parameter sets are first deduplicated after rounding, then looked up in the cache, and only the missing ones are
+    passed to `solver`. Each missing set is solved with the exact parameters of its first occurrence.
+
+    Parameters
+    ----------
+    eta_H : scalar, np.array
+        Non dimensional boundary layer height :math:`k H`.
+    eta_0 : scalar, np.array
+        Non dimensional hydrodyamic roughness :math:`k z_{0}`.
+    eta_B :  scalar, np.array
+        Non dimensional stratification length :math:`k L_{B}`.
+    Fr : scalar, np.array
+        Froude number
+    max_z : scalar, np.array
+        Maximum vertical position where the system is solved, see :func:`calculate_solution <python_codes.linear_theory.calculate_solution>`.
+    path : str
+        Path of the SQLite database storing the cache. It is created if needed.
+    rtol : float, optional
+        Relative tolerance below which parameters are considered identical (the default is 1e-6).
+    Kappa : float, optional
+        Von Karmàn constant (the default is 0.4).
+    solver : function, optional
+        Function with the signature of :func:`solve_many <python_codes.linear_theory.solve_many>` used for the missing
+        parameter sets, for instance :func:`compute_hydro_coeffs <python_codes.hydro_coeff_time_series.compute_hydro_coeffs>`
+        with its `store` argument set (the default is :func:`solve_many <python_codes.linear_theory.solve_many>`).
+    verbose : bool, optional
+        If True (default), print how many resolutions were saved.
+    **kwargs :
+        `kwargs` are passed to `solver`, and are part of the cache key.
+
+    Returns
+    -------
+    A : np.array
+        In-phase hydrodynamic coefficient, with the broadcasted shape of the inputs. NaN where one of the inputs is NaN.
+    B : np.array
+        In-quadrature hydrodynamic coefficient, with the broadcasted shape of the inputs. NaN where one of the inputs is NaN.
+    stats : dict
+        Numbers of valid parameter sets ('total'), of distinct ones after rounding ('unique'), of those found in the cache
+        ('cached'), of resolutions actually done ('solved') and saved ('saved').
+
+    """
+    inputs = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in (eta_H, eta_0, eta_B, Fr, max_z)])
+    shape = inputs[0].shape
+    parameters = np.array([x.ravel() for x in inputs]).T
+    A, B = np.full(parameters.shape[0], np.nan), np.full(parameters.shape[0], np.nan)
+    valid = np.flatnonzero(~np.isnan(parameters).any(axis=1))
+    #
+    # deduplication after rounding
+    quantized = _quantize(parameters[valid], rtol)
+    _, first, inverse = np.unique(quantized, axis=0, return_index=True, return_inverse=True)
+    inverse = inverse.ravel()
+    keys = _keys(quantized[first], rtol, Kappa, kwargs)
+    #
+    connection = _connect(path)
+    with connection:
+        stored = {}
+        for start in range(0, len(keys), 500):  # bounded number of SQL variables
+            batch = keys[start:start + 500]
+            query = 'SELECT key, A, B FROM coeffs WHERE key IN ({})'.format(','.join('?'*len(batch)))
+            stored.update({key: (a, b) for key, a, b in connection.execute(query, batch)})
+        missing = np.array([i for i, key in enumerate(keys) if key not in stored], dtype=int)
+        if missing.size > 0:
+            A_new, B_new = solver(*parameters[valid[first[missing]]].T, Kappa=Kappa, **kwargs)
+            new = {keys[i]: (a, b) for i, a, b in zip(missing, np.atleast_1d(A_new), np.atleast_1d(B_new))}
+            connection.executemany('INSERT OR REPLACE INTO coeffs VALUES (?, ?, ?)',
+                                   [(key, float(a), float(b)) for key, (a, b) in new.items()])
+            stored.update(new)
+    connection.close()
+    #
+    unique_coeffs = np.array([stored[key] for key in keys]).reshape((-1, 2))
+    A[valid], B[valid] = unique_coeffs[inverse, 0], unique_coeffs[inverse, 1]
+    stats = {'total': valid.size, 'unique': len(keys), 'cached': len(keys) - missing.size, 'solved': missing.size,
+             'saved': valid.size - missing.size}
+    if verbose:
+        print('{total:d} parameter sets, {unique:d} distinct, {cached:d} found in the cache: {solved:d} solved, {saved:d} resolutions saved'.format(**stats))
+    return A.reshape(shape), B.reshape(shape), stats
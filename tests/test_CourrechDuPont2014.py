@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from python_codes.general import Make_angular_PDF
+from python_codes.CourrechDuPont2014 import (Bed_Instability_Orientation, Elongation_direction, Elongation_direction_roots,
+                                             Growth_rate, Growth_rate_fft, Resultant_flux_perp_crest_at_crest,
+                                             Resultant_flux_perp_crest_at_crest_fft)
+
+alpha_bins = np.linspace(0, 360, 361)
+
+
+def _flux_roses(shape, seed=0):
+    # angular PDFs of the sediment flux for bimodal wind regimes, shape shape + (360, )
+    rng = np.random.default_rng(seed)
+    n = 2000
+    main = rng.random(shape + (1, ))*360
+    orientations = np.where(rng.random(shape + (n, )) < 0.7, rng.normal(main, 20, shape + (n, )),
+                            rng.normal(main + 100, 30, shape + (n, ))) % 360
+    return Make_angular_PDF(orientations, rng.random(shape + (n, ))**3)
+
+
+def test_fft_kernels():
+    PDF, theta = _flux_roses((3, ))
+    gamma = np.array([0.5, 1.6, 10])[:, None]
+    direct_growth = Growth_rate(alpha_bins[:, None, None], theta[None, None, :], PDF[None], gamma=gamma[None])
+    direct_flux = Resultant_flux_perp_crest_at_crest(alpha_bins[:, None, None], theta[None, None, :], PDF[None],
+                                                     gamma=gamma[None])
+    np.testing.assert_allclose(Growth_rate_fft(theta, PDF, gamma=gamma), direct_growth, atol=1e-12)
+    np.testing.assert_allclose(Resultant_flux_perp_crest_at_crest_fft(theta, PDF, gamma=gamma), direct_flux, atol=1e-12)
+
+
+@pytest.mark.parametrize('gamma', [1.6, np.array([0.1, 1.6, 10])[:, None, None, None]])
+def test_orientations_fft(gamma):
+    # broadcasting as in Figure09
+    PDF, theta = _flux_roses((2, 4))
+    for func in (Bed_Instability_Orientation, Elongation_direction):
+        np.testing.assert_array_equal(func(theta[None, None, None, :], PDF[None], gamma=gamma, method='fft'),
+                                      func(theta[None, None, None, :], PDF[None], gamma=gamma, method='direct'))
+
+
+@pytest.mark.parametrize('method', ['direct', 'fft'])
+def test_orientations_chunked(method):
+    PDF, theta = _flux_roses((3, 5))
+    gamma = np.array([0.5, 1.6])[:, None, None, None]
+    for func in (Bed_Instability_Orientation, Elongation_direction):
+        reference = func(theta[None, None, None, :], PDF[None], gamma=gamma, method=method)
+        for n_workers in (1, 3):
+            np.testing.assert_array_equal(func(theta[None, None, None, :], PDF[None], gamma=gamma, method=method,
+                                               max_bytes=2e5, n_workers=n_workers), reference)
+
+
+def test_elongation_direction_roots():
+    PDF, theta = _flux_roses((6, ))
+    PDF[1] = 0  # without flux, no elongation direction
+    theta_nan = np.where(np.arange(360) == 17, np.nan, theta)  # missing orientation, ignored
+    roots = Elongation_direction_roots(theta_nan[None, :], PDF, xtol=1e-6)
+    assert roots.shape[1:] == (6, )
+    assert np.isnan(roots[:, 1]).all()
+    PDF[:, 17] = 0
+    for i in (0, 2, 3, 4, 5):
+        found = roots[~np.isnan(roots[:, i]), i]
+        # the crest-normal flux vanishes at the roots
+        flux = Resultant_flux_perp_crest_at_crest(found[:, None], theta[None, :], PDF[i][None, :])
+        assert np.all(np.abs(flux) < 1e-6*np.sum(PDF[i]))
+        # the grid solution of Elongation_direction is one of them, within the grid step
+        grid = Elongation_direction(theta, PDF[i])
+        assert np.min(np.abs((found - grid + 180) % 360 - 180)) <= 1
@@ -0,0 +1,49 @@
+import numpy as np
+from python_codes.bootstrap import _block_indices, bootstrap_orientations
+from python_codes.general import Make_angular_PDF
+from python_codes.CourrechDuPont2014 import Bed_Instability_Orientation, Elongation_direction
+
+
+def _winds(n, seed=0):
+    # two wind sources and two transport laws, the second law without flux for the second source
+    rng = np.random.default_rng(seed)
+    orientation = np.array([np.mod(rng.normal(200, 40, n), 360), np.mod(rng.normal(120, 60, n), 360)])
+    orientation[0, rng.random(n) < 0.05] = np.nan
+    u = rng.random(n)
+    flux = np.array([u**2, u**4])[:, None, :]*np.ones((1, 2, 1))
+    flux[1, 1] = 0
+    return orientation, flux
+
+
+def test_block_indices():
+    index = _block_indices(np.random.default_rng(0), 1000, 24)
+    assert index.size == 1000 and index.min() >= 0 and index.max() < 1000
+    # consecutive time steps within the blocks, the last one being truncated
+    assert np.all(np.diff(index[:984].reshape((-1, 24)), axis=1) == 1)
+    assert np.all(np.diff(index[984:]) == 1)
+
+
+def test_bootstrap_orientations():
+    orientation, flux = _winds(24*120)
+    gamma = np.array([0.5, 1.6])[:, None, None]
+    alpha_BI, alpha_F, CI_BI, CI_F = bootstrap_orientations(orientation, flux, gamma=gamma, n_resamples=60, block_length=48,
+                                                            seed=3, chunk_size=25)
+    assert alpha_BI.shape == (2, 2, 2) and CI_BI.shape == CI_F.shape == (2, 2, 2, 2)
+    # estimates from the whole series
+    with np.errstate(invalid='ignore'):
+        PDF, angles = Make_angular_PDF(orientation*np.ones(flux.shape), flux)
+    valid = np.isfinite(PDF).all(axis=-1)
+    BI = Bed_Instability_Orientation(angles[None, None, None, :], np.nan_to_num(PDF)[None], gamma=gamma[..., None], method='fft')
+    F = Elongation_direction(angles[None, None, None, :], np.nan_to_num(PDF)[None], gamma=gamma[..., None], method='fft')
+    np.testing.assert_array_equal(alpha_BI, np.where(valid, BI, np.nan))
+    np.testing.assert_array_equal(alpha_F, np.where(valid, F, np.nan))
+    # intervals around the estimates, NaN without flux
+    assert np.isnan(CI_BI[:, :, 1, 1]).all() and np.isnan(CI_F[:, :, 1, 1]).all()
+    for estimate, CI in ((alpha_BI, CI_BI), (alpha_F, CI_F)):
+        finite = ~np.isnan(estimate)
+        assert np.all((CI[0][finite] <= estimate[finite]) & (estimate[finite] <= CI[1][finite]))
+    # reproducible, and independent of the number of processes
+    results = bootstrap_orientations(orientation, flux, gamma=gamma, n_resamples=60, block_length=48, seed=3, chunk_size=25,
+                                     n_workers=2)
+    for a, b in zip(results, (alpha_BI, alpha_F, CI_BI, CI_F)):
+        np.testing.assert_array_equal(a, b)
@@ -0,0 +1,35 @@
+import numpy as np
+from python_codes.coeff_inversion import fit_hydro_coeffs
+from python_codes.linear_theory import Cisaillement_basal_rotated_wind
+
+
+def _in_situ(theta_era, u_era, A0, B0, alpha, AR, x):
+    # in situ winds predicted by the linear theory at a station on the dune flank
+    taux, tauy = Cisaillement_basal_rotated_wind(x, 0, alpha, A0, B0, AR, theta_era)
+    return np.degrees(np.arctan2(tauy, taux)), u_era*np.sqrt(np.hypot(taux, tauy))
+
+
+def test_fit_hydro_coeffs():
+    rng = np.random.default_rng(0)
+    theta_era, u_era = rng.random(500)*360, 0.1 + 0.3*rng.random(500)
+    theta_insitu, u_insitu = _in_situ(theta_era, u_era, 4.2, 1.1, -50, 0.1, 1)
+    theta_era[3], u_insitu[7] = np.nan, np.nan
+    A0, B0, result = fit_hydro_coeffs(theta_era, u_era, theta_insitu, u_insitu, alpha=-50, AR=0.1, x=1)
+    assert result.success
+    np.testing.assert_allclose([A0, B0], [4.2, 1.1], rtol=1e-4)
+
+
+def test_fit_hydro_coeffs_groups():
+    rng = np.random.default_rng(1)
+    groups = np.repeat([0, 1, 2], 300)
+    A0_true, B0_true = np.array([2.5, 3.5, 6])[groups], np.array([0.5, 1.5, 3])[groups]
+    theta_era, u_era = rng.random(groups.size)*360, 0.1 + 0.3*rng.random(groups.size)
+    theta_insitu, u_insitu = _in_situ(theta_era, u_era, A0_true, B0_true, 30, 0.1, 1)
+    groups = np.append(groups, 3)  # group without valid time step
+    theta_era, u_era, theta_insitu, u_insitu = [np.append(x, np.nan) for x in (theta_era, u_era, theta_insitu, u_insitu)]
+    A0, B0, result = fit_hydro_coeffs(theta_era, u_era, theta_insitu, u_insitu, alpha=30, AR=0.1, x=1, groups=groups)
+    np.testing.assert_array_equal(result.groups, [0, 1, 2, 3])
+    np.testing.assert_array_equal(result.counts, [300, 300, 300, 0])
+    np.testing.assert_allclose(A0[:3], [2.5, 3.5, 6], rtol=1e-3)
+    np.testing.assert_allclose(B0[:3], [0.5, 1.5, 3], rtol=1e-3)
+    assert np.isnan(A0[3]) and np.isnan(B0[3])
@@ -0,0 +1,82 @@
+import numpy as np
+from python_codes.flux_map import flux_maps
+from python_codes.linear_theory import Cisaillement_basal_fft
+from python_codes.meteo_analysis import quadratic_transport_law
+
+rho_g, rho_f, g, d = 2.65e3, 1, 9.81, 180e-6
+
+
+def law(theta):
+    return quadratic_transport_law(theta, 0.005, 8)
+
+
+def _hourly_flux_maps(topo, dx, orientation, shear_velocity, periods, A0, B0):
+    # average over each period of the flux fields calculated for every time step
+    Q = np.sqrt((rho_g - rho_f)*g*d/rho_f)*d
+    labels = np.unique(periods)
+    q = np.zeros((labels.size, 2) + topo.shape)
+    for theta, u, m in zip(orientation, shear_velocity, np.searchsorted(labels, periods)):
+        taux, tauy = Cisaillement_basal_fft(topo, dx, theta, A0, B0)
+        tau = np.hypot(taux, tauy)
+        flux = Q*law(rho_f/((rho_g - rho_f)*g*d)*u**2*tau)
+        q[m] += flux*np.array([taux/tau, tauy/tau])
+    return labels, q/np.bincount(np.searchsorted(labels, periods))[:, None, None, None]
+
+
+def _topography(shape, dx):
+    # smooth random topography, with Nyquist modes, of about 1/10 aspect ratio
+    rng = np.random.default_rng(0)
+    kx = 2*np.pi*np.fft.fftfreq(shape[1], dx)[None, :]
+    ky = 2*np.pi*np.fft.fftfreq(shape[0], dx)[:, None]
+    topo = np.fft.ifft2(np.fft.fft2(rng.standard_normal(shape))*np.exp(-(kx**2 + ky**2)*(4*dx)**2)).real
+    return topo*(0.1*8*dx/(2*np.pi))/topo.std()
+
+
+def test_flux_maps_binned_exact():
+    # time steps on the bin centers: the binning is exact
+    rng = np.random.default_rng(1)
+    dx, n = 10, 500
+    topo = _topography((24, 32), dx)
+    orientation = 5*rng.integers(0, 72, n)
+    speeds = np.array([0.05, 0.15, 0.25, 0.4])  # one per speed bin
+    shear_velocity = speeds[rng.integers(0, 4, n)]
+    periods = rng.integers(0, 3, n)
+    labels, q = flux_maps(topo, dx, orientation, shear_velocity, law, 3.5, 1.5, periods=periods, n_speed_bins=4)
+    labels_ref, q_ref = _hourly_flux_maps(topo, dx, orientation, shear_velocity, periods, 3.5, 1.5)
+    np.testing.assert_array_equal(labels, labels_ref)
+    np.testing.assert_allclose(q, q_ref, rtol=1e-10, atol=1e-12*np.abs(q_ref).max())
+
+
+def test_flux_maps_binned_continuous():
+    # continuous time series: the binning error decreases with the bin size
+    rng = np.random.default_rng(2)
+    dx, n = 10, 2000
+    topo = _topography((32, 32), dx)
+    orientation = np.mod(rng.normal(120, 40, n), 360)
+    shear_velocity = 0.45*rng.random(n)
+    _, q_ref = _hourly_flux_maps(topo, dx, orientation, shear_velocity, np.zeros(n), 3.5, 1.5)
+    errors = []
+    for direction_bin, n_speed_bins in ((10, 16), (2, 64)):
+        _, q = flux_maps(topo, dx, orientation, shear_velocity, law, 3.5, 1.5, direction_bin=direction_bin,
+                         n_speed_bins=n_speed_bins)
+        errors.append(np.abs(q - q_ref).max()/np.abs(q_ref).max())
+    assert errors[1] < errors[0]
+    assert errors[1] < 1e-2
+
+
+def test_flux_maps_missing_data():
+    # periods without valid time steps give NaN maps, and do not change the others
+    rng = np.random.default_rng(3)
+    dx, n = 10, 200
+    topo = _topography((16, 16), dx)
+    orientation, shear_velocity = 360*rng.random(n), 0.4*rng.random(n)
+    periods = np.repeat([0, 1], n//2)
+    orientation[periods == 1] = np.nan
+    labels, q = flux_maps(topo, dx, orientation, shear_velocity, law, 3.5, 1.5, periods=periods)
+    _, q_ref = flux_maps(topo, dx, orientation[:n//2], shear_velocity[:n//2], law, 3.5, 1.5)
+    np.testing.assert_array_equal(labels, [0, 1])
+    np.testing.assert_array_equal(q[0], q_ref[0])
+    assert np.isnan(q[1]).all()
+    # only missing data
+    labels, q = flux_maps(topo, dx, orientation[periods == 1], shear_velocity[periods == 1], law, 3.5, 1.5)
+    assert q.shape == (1, 2) + topo.shape and np.isnan(q).all()
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from python_codes.hydro_coeff_table import build_table, load_table, query_table, save_table
+from python_codes.linear_theory import solve_many
+
+
+@pytest.fixture(scope='module')
+def table():
+    return build_table(np.logspace(-0.5, 0.5, 3), np.logspace(-1, 0, 3), np.array([0.3, 1]), np.array([1e-4, 1e-3]))
+
+
+def test_query_table_nodes(table):
+    # the interpolation is exact at the grid nodes
+    kH, Froude, kLB, kz0 = table['kH'][1], table['Froude'][2], table['kLB'][0], table['kz0'][1]
+    A, B, err_A, err_B = query_table(table, kH, Froude, kLB, kz0)
+    A_ref, B_ref = solve_many(kH, kz0, kLB, Froude, 0.9999*kH)
+    np.testing.assert_allclose([A, B], [A_ref, B_ref], rtol=1e-8)
+    assert np.isfinite(err_A) and np.isfinite(err_B)
+
+
+def test_query_table_error(table):
+    # at the cell centers, the error estimate is the actual interpolation error
+    centers = [np.sqrt(table[ax][1:]*table[ax][:-1]) for ax in ('kH', 'Froude', 'kLB', 'kz0')]
+    kH, Froude, kLB, kz0 = np.meshgrid(*centers, indexing='ij')
+    A, B, err_A, err_B = query_table(table, kH, Froude, kLB, kz0)
+    A_ref, B_ref = solve_many(kH, kz0, kLB, Froude, 0.9999*kH)
+    np.testing.assert_allclose(np.abs(A - A_ref), err_A, rtol=1e-8, atol=1e-12)
+    np.testing.assert_allclose(np.abs(B - B_ref), err_B, rtol=1e-8, atol=1e-12)
+    # outside of the table
+    A, B, err_A, err_B = query_table(table, 10, 0.5, 0.5, 5e-4)
+    assert np.isnan([A, B, err_A, err_B]).all()
+
+
+def test_table_save_load(table, tmp_path):
+    path = str(tmp_path / 'table.npz')
+    save_table(path, table)
+    loaded = load_table(path)
+    point = (0.8, 0.4, 0.5, 5e-4)
+    np.testing.assert_array_equal(query_table(loaded, *point), query_table(table, *point))
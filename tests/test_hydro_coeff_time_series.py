@@ -0,0 +1,45 @@
+import os
+import pytest
+import numpy as np
+from python_codes.hydro_coeff_time_series import compute_hydro_coeffs
+from python_codes.linear_theory import solve_many
+
+
+def test_compute_hydro_coeffs(tmp_path):
+    eta_H = np.linspace(0.5, 2, 12).reshape((3, 4))
+    eta_B = np.linspace(0.2, 1, 12).reshape((3, 4))
+    eta_H[1, 2] = np.nan
+    A_ref, B_ref = solve_many(eta_H, 1e-3, eta_B, 0.8, 0.9*eta_H)
+    A, B = compute_hydro_coeffs(eta_H, 1e-3, eta_B, 0.8, 0.9*eta_H, str(tmp_path), chunk_size=5, n_workers=2, verbose=False)
+    assert A.shape == eta_H.shape
+    np.testing.assert_allclose(A, A_ref, rtol=1e-6)
+    np.testing.assert_allclose(B, B_ref, rtol=1e-6)
+    assert np.isnan(A[1, 2]) and np.isnan(B[1, 2])
+    # resuming after the loss of a chunk
+    store, = [os.path.join(tmp_path, d) for d in os.listdir(tmp_path)]
+    os.remove(os.path.join(store, 'chunk_00001.npy'))
+    A_resumed, B_resumed = compute_hydro_coeffs(eta_H, 1e-3, eta_B, 0.8, 0.9*eta_H, str(tmp_path), chunk_size=5,
+                                                n_workers=1, verbose=False)
+    np.testing.assert_array_equal(A_resumed, A)
+    np.testing.assert_array_equal(B_resumed, B)
+
+
+def test_compute_hydro_coeffs_empty(tmp_path):
+    A, B = compute_hydro_coeffs(np.array([]), 1e-3, 0.5, 0.8, np.array([]), str(tmp_path), verbose=False)
+    assert A.shape == (0, ) and B.shape == (0, )
+
+
+def test_compute_hydro_coeffs_settings(tmp_path):
+    # a store filled with other solver settings must not be reused
+    eta_H = np.array([0.5, 1, 2])
+    A_04, _ = compute_hydro_coeffs(eta_H, 1e-3, 0.5, 0.8, 0.9*eta_H, str(tmp_path), n_workers=1, verbose=False)
+    A_03, B_03 = compute_hydro_coeffs(eta_H, 1e-3, 0.5, 0.8, 0.9*eta_H, str(tmp_path), n_workers=1, Kappa=0.3, verbose=False)
+    A_ref, B_ref = solve_many(eta_H, 1e-3, 0.5, 0.8, 0.9*eta_H, Kappa=0.3)
+    np.testing.assert_allclose(A_03, A_ref, rtol=1e-6)
+    np.testing.assert_allclose(B_03, B_ref, rtol=1e-6)
+    assert np.all(np.abs(A_03 - A_04) > 1e-3*np.abs(A_04))
+    compute_hydro_coeffs(eta_H, 1e-3, 0.5, 0.8, 0.9*eta_H, str(tmp_path), n_workers=1, rtol=1e-8, verbose=False)
+    assert len(os.listdir(tmp_path)) == 3
+    # but a different chunk size on the same store is an error
+    with pytest.raises(ValueError):
+        compute_hydro_coeffs(eta_H, 1e-3, 0.5, 0.8, 0.9*eta_H, str(tmp_path), chunk_size=2, n_workers=1, verbose=False)
@@ -0,0 +1,183 @@
+import numpy as np
+import pytest
+from python_codes import linear_theory
+from python_codes.linear_theory import (Cisaillement_basal_fft, Cisaillement_basal_rotated_wind,
+                                        Cisaillement_basal_rotated_wind_batch, calculate_solution,
+                                        mu, solve_adaptive, solve_many, solve_spectrum, solve_sweep)
+
+
+def _modal_shear_stress(topo, dx, theta, A0, B0):
+    # sum of the shear stresses of Cisaillement_basal_rotated_wind over the resolved Fourier modes of the topography
+    ny, nx = topo.shape
+    Z_hat = np.fft.fft2(topo)/topo.size
+    x, y = np.meshgrid(np.arange(nx)*dx, np.arange(ny)*dx)
+    Taux, Tauy = np.full(topo.shape, np.cos(np.radians(theta))), np.full(topo.shape, np.sin(np.radians(theta)))
+    for p in range(ny):
+        for q in range(nx):
+            kx, ky = 2*np.pi*np.fft.fftfreq(nx, dx)[q], 2*np.pi*np.fft.fftfreq(ny, dx)[p]
+            # each pair of opposite modes once, Nyquist modes excluded
+            if (nx % 2 == 0 and q == nx//2) or (ny % 2 == 0 and p == ny//2) or (ky, kx) <= (0, 0):
+                continue
+            k, alpha, phase = np.hypot(kx, ky), np.arctan2(ky, kx), np.angle(Z_hat[p, q])
+            # topography 2|Z_hat| cos(kx x + ky y + phase), shifted along the wavevector
+            X, Y = k*x + np.cos(alpha)*phase, k*y + np.sin(alpha)*phase
+            tx, ty = Cisaillement_basal_rotated_wind(X, Y, np.degrees(alpha), A0, B0, 2*k*np.abs(Z_hat[p, q]), theta)
+            Taux += tx - np.cos(np.radians(theta))
+            Tauy += ty - np.sin(np.radians(theta))
+    return Taux, Tauy
+
+
+@pytest.mark.parametrize('n', [16, 17])
+@pytest.mark.parametrize('theta', [0, 37, 200])
+def test_fft_shear_stress_random_topography(n, theta):
+    topo = 0.01*np.random.default_rng(n).standard_normal((n, n + 2))
+    Taux, Tauy = Cisaillement_basal_fft(topo, 2., theta, 3.5, 1.5)
+    Taux_ref, Tauy_ref = _modal_shear_stress(topo, 2., theta, 3.5, 1.5)
+    np.testing.assert_allclose(Taux, Taux_ref, atol=1e-10)
+    np.testing.assert_allclose(Tauy, Tauy_ref, atol=1e-10)
+
+
+@pytest.mark.parametrize('Kappa', [0.4, 0.35])
+def test_hydro_coeffs_engines_agree(Kappa):
+    eta_H, eta_0, eta_B, Fr, max_z = 1.0, 1e-3, 0.5, 0.5, 0.9
+    reference = calculate_solution(0, eta_H, eta_0, eta_B, Fr, max_z, Kappa=Kappa, output='full')[2][1]
+    lean = calculate_solution(0, eta_H, eta_0, eta_B, Fr, max_z, Kappa=Kappa, output='lean')['coeffs'][1]
+    cached = calculate_solution(0, eta_H, eta_0, eta_B, Fr, max_z, Kappa=Kappa, output='full', cache=True)[2][1]
+    spectral = calculate_solution(0, eta_H, eta_0, eta_B, Fr, max_z, Kappa=Kappa, output='lean', engine='spectral')['coeffs'][1]
+    A_sweep, B_sweep = solve_sweep(eta_H, eta_0, eta_B, np.array([Fr, 2*Fr]), max_z, Kappa=Kappa)
+    A_many, B_many = solve_many(np.array([eta_H, 2*eta_H]), eta_0, eta_B, Fr, np.array([max_z, 2*max_z]), Kappa=Kappa)
+    for value in (lean, cached):
+        assert value == reference
+    np.testing.assert_allclose(spectral, reference, rtol=1e-7)
+    np.testing.assert_allclose(A_sweep[0] + 1j*B_sweep[0], reference, rtol=1e-8)
+    np.testing.assert_allclose(A_many[0] + 1j*B_many[0], reference, rtol=1e-6)
+
+
+def test_augmented_mode():
+    eta_H, eta_0, eta_B, Fr, max_z = 1.0, 1e-3, 0.5, 0.5, 0.9
+    eta = np.linspace(0, max_z, 50)
+    profile, _, coeffs = calculate_solution(eta, eta_H, eta_0, eta_B, Fr, max_z, output='full')
+    profile_augmented, Results, coeffs_augmented = calculate_solution(eta, eta_H, eta_0, eta_B, Fr, max_z, output='full',
+                                                                      mode='augmented')
+    np.testing.assert_allclose(coeffs_augmented, coeffs, rtol=1e-8)
+    np.testing.assert_allclose(profile_augmented, profile, rtol=1e-6, atol=1e-8*np.abs(profile).max())
+    # the solution started from zero is not integrated
+    assert Results[0].y.shape[0] == 4 and not Results[3].y.any() and not Results[3].sol(eta).any()
+
+
+@pytest.mark.parametrize('jit', [True, False])
+@pytest.mark.parametrize('mode', ['separate', 'augmented'])
+def test_rhs_kernel(mode, jit, monkeypatch):
+    eta_H, eta_0, eta_B, Fr, max_z = 1.0, 1e-3, 0.5, 0.5, 0.9
+    eta = np.linspace(0, max_z, 50)
+    profile, _, coeffs = calculate_solution(eta, eta_H, eta_0, eta_B, Fr, max_z, output='full', mode=mode)
+    if not jit:
+        monkeypatch.setattr(linear_theory, '_rhs_kernel_compiled', linear_theory._rhs_kernel)
+    profile_kernel, _, coeffs_kernel = calculate_solution(eta, eta_H, eta_0, eta_B, Fr, max_z, output='full', mode=mode,
+                                                          kernel=True)
+    np.testing.assert_allclose(coeffs_kernel, coeffs, rtol=1e-12)
+    np.testing.assert_allclose(profile_kernel, profile, rtol=1e-12, atol=1e-14*np.abs(profile).max())
+
+
+@pytest.mark.parametrize('eta_H, eta_0, eta_B, Fr, rtol', [(1.5, 1e-4, 0.5, 0.8, 1e-6), (6.3, 1.6e-5, 0.37, 12.3, 2e-5),
+                                                     (0.1, 1e-3, 3, 0.05, 1e-6)])
+def test_top_expansion(eta_H, eta_0, eta_B, Fr, rtol):
+    # boundary conditions at eta_H with the local expansion, against the integration up to very close to eta_H, within the
+    # error of the latter given by benchmarks/bench_singular_expansion.py
+    coeffs = calculate_solution(0, eta_H, eta_0, eta_B, Fr, (1 - 1e-6)*eta_H, output='full')[2]
+    for t_s in (0.3, 0.05):
+        Results, coeffs_expansion = calculate_solution(0, eta_H, eta_0, eta_B, Fr, eta_H, output='full', expansion=t_s)[1:]
+        np.testing.assert_allclose(coeffs_expansion[1], coeffs[1], rtol=rtol)
+        # continuity of the solutions at the matching height
+        eta_s = (1 - t_s)*eta_H
+        for Result in Results:
+            np.testing.assert_allclose(Result.sol(eta_s*(1 + 1e-12)), Result.sol(eta_s), rtol=rtol, atol=1e-9)
+
+
+@pytest.mark.parametrize('method, rtol', [('Radau', 1e-8), ('BDF', 2e-6), ('LSODA', 1e-7)])
+def test_implicit_methods(method, rtol):
+    # run on the real and imaginary parts with the analytic Jacobian, against DOP853
+    eta_H, eta_0, eta_B, Fr, max_z = 1.0, 1e-3, 0.5, 0.5, 0.9
+    coeffs = calculate_solution(0, eta_H, eta_0, eta_B, Fr, max_z, output='full', mode='augmented', kernel=True)[2]
+    coeffs_implicit = calculate_solution(0, eta_H, eta_0, eta_B, Fr, max_z, output='full', mode='augmented', kernel=True,
+                                         method=method)[2]
+    np.testing.assert_allclose(coeffs_implicit, coeffs, rtol=rtol)
+
+
+@pytest.mark.parametrize('Kappa', [0.4, 0.35])
+def test_hydro_coeffs_sensitivities(Kappa):
+    eta_H, eta_0, eta_B, Fr, max_z = 1.0, 1e-3, 0.5, 0.5, 0.9
+    (_, _, coeffs), derivatives = calculate_solution(0, eta_H, eta_0, eta_B, Fr, max_z, Kappa=Kappa, output='full',
+                                                     sensitivities=True)
+    np.testing.assert_allclose(coeffs[1], calculate_solution(0, eta_H, eta_0, eta_B, Fr, max_z, Kappa=Kappa,
+                                                             output='full')[2][1], rtol=1e-8)
+    # centered finite differences, max_z being scaled with eta_H
+    h = 1e-4
+    for name, args_plus, args_minus in [('kH', (eta_H*(1 + h), eta_0, eta_B, Fr, max_z*(1 + h)),
+                                         (eta_H*(1 - h), eta_0, eta_B, Fr, max_z*(1 - h))),
+                                        ('Fr', (eta_H, eta_0, eta_B, Fr*(1 + h), max_z), (eta_H, eta_0, eta_B, Fr*(1 - h), max_z)),
+                                        ('kLB', (eta_H, eta_0, eta_B*(1 + h), Fr, max_z), (eta_H, eta_0, eta_B*(1 - h), Fr, max_z))]:
+        step = {'kH': eta_H, 'Fr': Fr, 'kLB': eta_B}[name]*2*h
+        plus = calculate_solution(0, *args_plus, Kappa=Kappa, output='full')[2][1]
+        minus = calculate_solution(0, *args_minus, Kappa=Kappa, output='full')[2][1]
+        derivative = derivatives['dA_d' + name] + 1j*derivatives['dB_d' + name]
+        np.testing.assert_allclose(derivative, (plus - minus)/step, rtol=1e-4)
+
+
+def test_solve_many_nan():
+    eta_H = np.array([1.0, np.nan, 2.0])
+    A, B, derivatives = solve_many(eta_H, 1e-3, 0.5, 0.5, 0.9*eta_H, sensitivities=True)
+    assert np.isnan(A[1]) and np.isnan(B[1])
+    assert all(np.isnan(derivative[1]) for derivative in derivatives.values())
+    for i in (0, 2):
+        coeffs = calculate_solution(0, eta_H[i], 1e-3, 0.5, 0.5, 0.9*eta_H[i], output='full')[2][1]
+        np.testing.assert_allclose(A[i] + 1j*B[i], coeffs, rtol=1e-6)
+
+
+def test_solve_many_reorder():
+    rng = np.random.default_rng(0)
+    eta_H, eta_0 = np.exp(rng.uniform(np.log(0.1), np.log(3), 40)), np.exp(rng.uniform(np.log(1e-5), np.log(1e-3), 40))
+    eta_H[7] = np.nan
+    order = linear_theory._nearest_neighbour_order(np.log(np.array([eta_H[:7], eta_0[:7]]).T))
+    np.testing.assert_array_equal(np.sort(order), np.arange(7))
+    A, B = solve_many(eta_H, eta_0, 0.5, 0.8, 0.99*eta_H, chunk_size=8)
+    A_reordered, B_reordered = solve_many(eta_H, eta_0, 0.5, 0.8, 0.99*eta_H, chunk_size=8, reorder=True)
+    np.testing.assert_allclose(A_reordered, A, rtol=1e-6)  # error control shared by other members
+    np.testing.assert_allclose(B_reordered, B, rtol=1e-6)
+    assert np.isnan(A_reordered[7]) and np.isnan(B_reordered[7])
+
+
+def test_solve_adaptive():
+    eta_H = np.array([0.5, 1.0, np.nan, 2.0])
+    A, B, tol, err = solve_adaptive(eta_H, 1e-3, 0.5, 0.5, 0.9*eta_H, bound=1e-6)
+    A_ref, B_ref = solve_many(eta_H, 1e-3, 0.5, 0.5, 0.9*eta_H)
+    assert np.isnan(A[2]) and np.isnan(B[2]) and np.isnan(tol[2])
+    valid = ~np.isnan(eta_H)
+    assert np.all(np.abs((A + 1j*B - A_ref - 1j*B_ref)[valid]) <= 10*np.maximum(err[valid], 1e-6))
+
+
+def test_solve_spectrum():
+    k, H, u_star, N, delta_theta, z0 = np.array([5e-4, 1e-3, 2e-3]), 1000, 0.3, 0.01, 0.01, 1e-3
+    A, B = solve_spectrum(k, H, u_star, N, delta_theta, z0)
+    U = u_star*mu(H, z0, 0.4)
+    for kk, a, b in zip(k, A, B):
+        args = (kk*H, kk*z0, kk*U/N, U/np.sqrt(9.81*H*delta_theta), 0.9999*kk*H)
+        shooting = calculate_solution(0, *args, output='lean')['coeffs'][1]
+        spectral = calculate_solution(0, *args, output='lean', engine='spectral')['coeffs'][1]
+        np.testing.assert_allclose(a + 1j*b, spectral, rtol=1e-10)
+        np.testing.assert_allclose(a + 1j*b, shooting, rtol=1e-5)
+
+
+def test_rotated_wind_batch():
+    X, Y = np.meshgrid(np.linspace(-6, 6, 40), np.linspace(-3, 3, 30))
+    theta = np.array([0, 45, 110, 190, 275, 359.5])
+    A0, B0 = np.linspace(2, 5, theta.size), np.linspace(0.5, 2, theta.size)
+    for alpha in (-50, 0, 30, 120):
+        Taux, Tauy = Cisaillement_basal_rotated_wind_batch(X, Y, alpha, A0, B0, 0.1, theta)
+        for i in range(theta.size):
+            taux, tauy = Cisaillement_basal_rotated_wind(X, Y, alpha, A0[i], B0[i], 0.1, theta[i])
+            np.testing.assert_allclose(Taux[i], taux, atol=1e-12)
+            np.testing.assert_allclose(Tauy[i], tauy, atol=1e-12)
+    Taux32, _ = Cisaillement_basal_rotated_wind_batch(X, Y, alpha, A0, B0, 0.1, theta, dtype=np.float32)
+    assert Taux32.dtype == np.float32
+    np.testing.assert_allclose(Taux32, Taux, atol=1e-5)
@@ -0,0 +1,31 @@
+import os
+import numpy as np
+from python_codes.linear_theory import solve_many
+from python_codes.regime_map import build_map, load_map, refine_map
+
+
+def _reference(Froude, kH, kLB, kz0=1e-4):
+    Froude, kH, kLB = np.meshgrid(Froude, kH, kLB, indexing='ij')
+    return solve_many(kH, kz0, kLB, Froude, 0.9999*kH)
+
+
+def test_build_and_refine_map(tmp_path):
+    store = str(tmp_path / 'map')
+    Froude, kH, kLB = np.logspace(-1, 0, 3), np.logspace(-0.5, 0.5, 3), np.array([0.3, 1])
+    regime = build_map(store, Froude, kH, kLB, chunks=(2, 2, 2), n_workers=2, verbose=False)
+    A_ref, B_ref = _reference(Froude, kH, kLB)
+    np.testing.assert_allclose(regime['A'], A_ref, rtol=1e-7)
+    np.testing.assert_allclose(regime['B'], B_ref, rtol=1e-7)
+    # resuming after the loss of a chunk
+    os.remove(os.path.join(store, 'chunk_001_000_000.npz'))
+    assert np.isnan(load_map(store)['A'][2, 0, 0])
+    resumed = build_map(store, Froude, kH, kLB, chunks=(2, 2, 2), n_workers=1, verbose=False)
+    np.testing.assert_allclose(resumed['A'], regime['A'], rtol=1e-7)
+    # refinement: existing nodes copied, new nodes calculated
+    refined = refine_map(store, Froude=(Froude[1], Froude[2]), factor=2, n_workers=1, verbose=False)
+    np.testing.assert_allclose(refined['Froude'][::2], Froude[1:])
+    np.testing.assert_array_equal(refined['A'][::2, ::2, ::2], resumed['A'][1:])
+    A_ref, B_ref = _reference(refined['Froude'], refined['kH'], refined['kLB'])
+    np.testing.assert_allclose(refined['A'], A_ref, rtol=1e-7)
+    np.testing.assert_allclose(refined['B'], B_ref, rtol=1e-7)
+    assert len(load_map(store)['refinements']) == 1
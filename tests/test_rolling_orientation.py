@@ -0,0 +1,33 @@
+import numpy as np
+from python_codes.general import Make_angular_PDF
+from python_codes.CourrechDuPont2014 import Bed_Instability_Orientation, Elongation_direction
+from python_codes.rolling_orientation import rolling_orientations
+
+
+def test_rolling_orientations():
+    # hourly series with gaps, NaN orientations, and periods without flux for one of the series
+    rng = np.random.default_rng(0)
+    n = 200*24
+    time = np.datetime64('2015-01-01T00:00') + np.arange(n)*np.timedelta64(1, 'h')
+    time = time[rng.random(n) > 0.1]
+    n = time.size
+    season = np.sin(2*np.pi*np.arange(n)/(80*24))
+    orientation = np.mod(rng.normal(200 + 80*season, 40), 360)
+    orientation[rng.random(n) < 0.02] = np.nan
+    flux = np.array([rng.random(n)**3, rng.random(n)**2*(season > 0)])
+    gamma = np.array([0.5, 1.6])[:, None]
+    window = np.timedelta64(30, 'D')
+    centers, alpha_BI, alpha_F = rolling_orientations(time, orientation, flux[None], window=window, gamma=gamma, min_count=24,
+                                                      block_size=16)
+    assert alpha_BI.shape == alpha_F.shape == (centers.size, 2, 2)
+    # each window calculated from scratch
+    for k in range(centers.size):
+        inside = (time >= centers[k] - window//2) & (time < centers[k] + window//2) & ~np.isnan(orientation)
+        with np.errstate(invalid='ignore'):  # NaN distributions without flux
+            PDF, angles = Make_angular_PDF(orientation[inside]*np.ones((2, 1)), flux[:, inside])
+        valid = np.isfinite(PDF).all(axis=-1) & (inside.sum() >= 24)
+        BI = Bed_Instability_Orientation(angles[None, None, :], np.nan_to_num(PDF)[None], gamma=gamma[..., None], method='fft')
+        F = Elongation_direction(angles[None, None, :], np.nan_to_num(PDF)[None], gamma=gamma[..., None], method='fft')
+        np.testing.assert_array_equal(alpha_BI[k], np.where(valid, BI, np.nan))
+        np.testing.assert_array_equal(alpha_F[k], np.where(valid, F, np.nan))
+    assert np.isnan(alpha_BI[:, :, 1]).any()  # windows without flux for the second series
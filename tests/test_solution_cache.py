@@ -0,0 +1,25 @@
+import numpy as np
+from python_codes.linear_theory import solve_many
+from python_codes.solution_cache import cached_solve_many
+
+
+def test_cached_solve_many(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    eta_H = np.array([0.5, 1.0, 1.0*(1 + 1e-9), np.nan, 2.0])
+    A_ref, B_ref = solve_many(eta_H, 1e-3, 0.5, 0.8, 0.9*eta_H)
+    A, B, stats = cached_solve_many(eta_H, 1e-3, 0.5, 0.8, 0.9*eta_H, path, verbose=False)
+    np.testing.assert_allclose(A, A_ref, rtol=1e-7)
+    np.testing.assert_allclose(B, B_ref, rtol=1e-7)
+    assert np.isnan(A[3]) and np.isnan(B[3])
+    assert stats == {'total': 4, 'unique': 3, 'cached': 0, 'solved': 3, 'saved': 1}
+    # second run, entirely from the cache
+    A_cached, B_cached, stats = cached_solve_many(eta_H, 1e-3, 0.5, 0.8, 0.9*eta_H, path, verbose=False)
+    np.testing.assert_array_equal(A_cached, A)
+    np.testing.assert_array_equal(B_cached, B)
+    assert stats['cached'] == 3 and stats['solved'] == 0
+    # the von Karman constant is part of the key
+    A_kappa, B_kappa, stats = cached_solve_many(eta_H, 1e-3, 0.5, 0.8, 0.9*eta_H, path, Kappa=0.35, verbose=False)
+    assert stats['solved'] == 3
+    A_ref, B_ref = solve_many(eta_H, 1e-3, 0.5, 0.8, 0.9*eta_H, Kappa=0.35)
+    np.testing.assert_allclose(A_kappa, A_ref, rtol=1e-7)
+    np.testing.assert_allclose(B_kappa, B_ref, rtol=1e-7)